@@ -1,9 +1,11 @@
 """Real-time AI Coach endpoints."""
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Optional
 import asyncio
 import json
 
 from services.posture_analyzer import PostureAnalyzerService
+from services.session_recorder import SessionRecorder
 
 router = APIRouter()
 
@@ -12,8 +14,8 @@ class ConnectionManager:
     def __init__(self):
         self.active: list[WebSocket] = []
 
-    async def connect(self, ws: WebSocket):
-        await ws.accept()
+    async def connect(self, ws: WebSocket, headers: Optional[list] = None):
+        await ws.accept(headers=headers)
         self.active.append(ws)
 
     def disconnect(self, ws: WebSocket):
@@ -32,10 +34,16 @@ manager = ConnectionManager()
 
 
 @router.websocket("/ws")
-async def coach_websocket(websocket: WebSocket):
-    await manager.connect(websocket)
+async def coach_websocket(websocket: WebSocket, user: Optional[str] = Query(None)):
+    """
+    Live coaching. Each connection is recorded as one session (see /api/sessions); its
+    id is in the handshake's X-Session-Id header, or sent back for a {"type": "session"} message.
+    """
     analyzer = PostureAnalyzerService.get_instance()
+    recorder = SessionRecorder.get_instance()
+    session_id = recorder.start_session(user, source="ws")
     try:
+        await manager.connect(websocket, headers=[(b"x-session-id", session_id.encode())])
         while True:
             data = await websocket.receive_text()
             msg = json.loads(data)
@@ -46,10 +54,15 @@ async def coach_websocket(websocket: WebSocket):
                     "type": "feedback",
                     **result,
                 })
+                recorder.record(session_id, result, pts)
             elif msg.get("type") == "ping":
                 await websocket.send_json({"type": "pong"})
+            elif msg.get("type") == "session":
+                await websocket.send_json({"type": "session", "session_id": session_id})
     except WebSocketDisconnect:
         manager.disconnect(websocket)
+    finally:
+        recorder.end_session(session_id)
 
 
 @router.get("/exercises")
@@ -0,0 +1,17 @@
+"""Dashboard aggregate endpoint (one request for the whole dashboard)."""
+from fastapi import APIRouter, Header, Query
+from typing import Optional
+
+from services.dashboard import build_summary
+
+router = APIRouter()
+
+
+@router.get("/summary")
+async def dashboard_summary(
+    device_id: Optional[str] = None,
+    history_limit: int = Query(50, ge=0, le=500),
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+):
+    """Health, devices, device risk, recent readings and the user's activity aggregates."""
+    return await build_summary(x_user_email, device_id, history_limit)
@@ -1,8 +1,10 @@
 """Device management and wearable connection endpoints."""
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from pydantic import BaseModel
 from typing import Optional, List
 
+from services.device_registry import DeviceRegistry
+
 router = APIRouter()
 
 
@@ -14,32 +16,28 @@ class DeviceInfo(BaseModel):
     last_seen: Optional[str] = None
 
 
-# In-memory device registry (replace with DB in production)
-_devices: dict[str, DeviceInfo] = {}
-
-
 @router.get("", response_model=List[DeviceInfo])
-def list_devices():
-    return list(_devices.values())
+def list_devices(
+    connected: Optional[bool] = None,
+    type: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    return DeviceRegistry.get_instance().list_devices(connected, type, offset, limit)
 
 
 @router.post("/register", response_model=DeviceInfo)
 def register_device(info: DeviceInfo):
-    _devices[info.id] = info
-    return info
+    return DeviceRegistry.get_instance().upsert(info.model_dump())
 
 
 @router.post("/{device_id}/disconnect")
 def disconnect_device(device_id: str):
-    if device_id in _devices:
-        d = _devices[device_id]
-        _devices[device_id] = DeviceInfo(**{**d.model_dump(), "connected": False})
+    DeviceRegistry.get_instance().set_connected(device_id, False)
     return {"ok": True}
 
 
 @router.post("/{device_id}/connect")
 def connect_device(device_id: str):
-    if device_id in _devices:
-        d = _devices[device_id]
-        _devices[device_id] = DeviceInfo(**{**d.model_dump(), "connected": True})
+    DeviceRegistry.get_instance().set_connected(device_id, True)
     return {"ok": True}
@@ -2,6 +2,8 @@
 from fastapi import APIRouter
 from datetime import datetime
 
+from db.mongo import breaker
+
 router = APIRouter()
 
 
@@ -11,4 +13,5 @@ def health_check():
         "status": "healthy",
         "service": "NeuroPosture AI",
         "timestamp": datetime.utcnow().isoformat(),
+        "database": breaker.stats(),
     }
@@ -1,11 +1,24 @@
 """IoT sensor data ingestion endpoints (ESP32/MPU6050)."""
-from fastapi import APIRouter
-from pydantic import BaseModel
+import asyncio
+import json
+import math
+import sqlite3
+from collections import Counter
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import PyMongoError
 from typing import List, Optional
 from datetime import datetime
 
 from services.iot_simulator import IoTDataStore
-from services.injury_predictor import InjuryPredictorService
+from services.dashboard import device_risk
+from services.admission import AdmissionController, MAX_BATCH, MAX_BODY_BYTES
+from services.device_registry import DeviceRegistry
+from services.sensor_export import iter_db, iter_memory, parse_time, stream_export
+from services.sensor_import import import_chunks, parse_binary, parse_csv
+from db.storage import get_storage
 
 router = APIRouter()
 
@@ -26,39 +39,164 @@ class BatchReadings(BaseModel):
     readings: List[SensorReading]
 
 
-@router.post("/ingest")
-def ingest_sensor_data(reading: SensorReading):
-    ts = reading.timestamp or datetime.utcnow().isoformat()
-    IoTDataStore.add(reading.device_id, {
-        "accel": [reading.accel_x, reading.accel_y, reading.accel_z],
-        "gyro": [reading.gyro_x, reading.gyro_y, reading.gyro_z],
-        "heart_rate": reading.heart_rate,
+async def _read_json(request: Request, device_hint: str):
+    """Reject oversized bodies from Content-Length before reading, then decode JSON (no validation yet)."""
+    admission = AdmissionController.get_instance()
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > MAX_BODY_BYTES:
+        admission.record_oversized(device_hint)
+        raise HTTPException(status_code=413, detail=f"Body exceeds {MAX_BODY_BYTES} bytes")
+    body = await request.body()
+    if len(body) > MAX_BODY_BYTES:
+        admission.record_oversized(device_hint)
+        raise HTTPException(status_code=413, detail=f"Body exceeds {MAX_BODY_BYTES} bytes")
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+
+def _admit(counts: dict):
+    wait = AdmissionController.get_instance().admit(counts)
+    if wait == math.inf:
+        raise HTTPException(status_code=413, detail="Batch larger than device burst limit")
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Device rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+def _validate(model, payload):
+    try:
+        return model.model_validate(payload)
+    except ValidationError as e:
+        # Same error shape FastAPI produces for body parameters
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def _store(r: SensorReading) -> str:
+    ts = r.timestamp or datetime.utcnow().isoformat()
+    IoTDataStore.add(r.device_id, {
+        "accel": [r.accel_x, r.accel_y, r.accel_z],
+        "gyro": [r.gyro_x, r.gyro_y, r.gyro_z],
+        "heart_rate": r.heart_rate,
         "timestamp": ts,
     })
+    return ts
+
+
+@router.post("/ingest", openapi_extra={"requestBody": {"content": {"application/json": {"schema": SensorReading.model_json_schema()}}, "required": True}})
+async def ingest_sensor_data(request: Request):
+    # Admission runs on the raw payload, before pydantic and off the threadpool
+    payload = await _read_json(request, request.headers.get("x-device-id", "unknown"))
+    device_id = payload.get("device_id") if isinstance(payload, dict) else None
+    _admit({str(device_id or request.headers.get("x-device-id", "unknown")): 1})
+    reading = _validate(SensorReading, payload)
+    # Storing may seal a compressed block and updates the gait SDFT: keep it off the event loop
+    ts = await asyncio.to_thread(_store, reading)
+    DeviceRegistry.get_instance().touch(reading.device_id)
     return {"received": True, "timestamp": ts}
 
 
-@router.post("/ingest/batch")
-def ingest_batch(readings: BatchReadings):
-    for r in readings.readings:
-        ts = r.timestamp or datetime.utcnow().isoformat()
-        IoTDataStore.add(r.device_id, {
-            "accel": [r.accel_x, r.accel_y, r.accel_z],
-            "gyro": [r.gyro_x, r.gyro_y, r.gyro_z],
-            "heart_rate": r.heart_rate,
-            "timestamp": ts,
-        })
+@router.post("/ingest/batch", openapi_extra={"requestBody": {"content": {"application/json": {"schema": BatchReadings.model_json_schema()}}, "required": True}})
+async def ingest_batch(request: Request):
+    admission = AdmissionController.get_instance()
+    hint = request.headers.get("x-device-id", "unknown")
+    payload = await _read_json(request, hint)
+    raw = payload.get("readings") if isinstance(payload, dict) else None
+    if not isinstance(raw, list):
+        raise RequestValidationError([{"loc": ("body", "readings"), "msg": "Field required", "type": "missing"}])
+    counts = Counter(str(r.get("device_id")) if isinstance(r, dict) else "unknown" for r in raw)
+    if len(raw) > MAX_BATCH:
+        for device_id, n in counts.items():
+            admission.record_oversized(device_id, n)
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH} readings")
+    _admit(counts)
+    readings = _validate(BatchReadings, payload)
+    await asyncio.to_thread(lambda: [_store(r) for r in readings.readings])
+    registry = DeviceRegistry.get_instance()
+    seen_at = datetime.utcnow().isoformat()
+    for device_id in {r.device_id for r in readings.readings}:
+        registry.touch(device_id, seen_at)
     return {"received": len(readings.readings)}
 
 
+@router.post("/import")
+async def import_sensor_log(
+    file: UploadFile = File(...),
+    device_id: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(csv|bin)$"),
+):
+    """Bulk-load an offline log (CSV or binary records). Bypasses ingest rate limits."""
+    fmt = format or ("bin" if (file.filename or "").endswith(".bin") else "csv")
+    if fmt == "bin" and not device_id:
+        raise HTTPException(status_code=400, detail="device_id is required for binary logs")
+    try:
+        import numpy, pandas  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=503, detail="Import needs numpy and pandas (not installed in light mode)")
+    try:
+        sensors = get_storage().sensors
+    except RuntimeError:
+        sensors = None
+    chunks = parse_binary(file.file, device_id) if fmt == "bin" else parse_csv(file.file, device_id)
+    try:
+        stats = await import_chunks(chunks, sensors)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse log: {e}")
+    except (PyMongoError, sqlite3.Error) as e:
+        raise HTTPException(status_code=503, detail=f"Database write failed: {e}")
+    return {**stats, "devices": list(stats["devices"])}
+
+
+@router.get("/admission")
+def admission_stats():
+    """Accepted and shed reading counts per device."""
+    return AdmissionController.get_instance().stats()
+
+
+@router.get("/store")
+def store_stats():
+    """Retained readings and compressed size per device."""
+    return IoTDataStore.stats()
+
+
 @router.get("/{device_id}/risk")
 def get_injury_risk(device_id: str):
-    predictor = InjuryPredictorService.get_instance()
-    data = IoTDataStore.get_recent(device_id)
-    result = predictor.predict_from_sensor_data(data)
-    return result
+    return device_risk(device_id)
 
 
 @router.get("/{device_id}/history")
 def get_sensor_history(device_id: str, limit: int = 100):
     return IoTDataStore.get_recent(device_id, limit)
+
+
+@router.get("/{device_id}/export")
+def export_sensor_history(
+    device_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    source: str = Query("memory", pattern="^(memory|db)$"),
+):
+    """Stream readings in [start, end) as NDJSON or CSV, from memory or persisted history."""
+    t0, t1 = parse_time(start), parse_time(end)
+    if (start and t0 is None) or (end and t1 is None):
+        raise HTTPException(status_code=400, detail="start/end must be ISO-8601 timestamps")
+    if source == "db":
+        try:
+            chunks = iter_db(get_storage().sensors, device_id, t0, t1)
+        except RuntimeError:
+            raise HTTPException(status_code=503, detail="Database not connected")
+    else:
+        chunks = iter_memory(device_id, t0, t1)
+    filename = f"{device_id}.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        stream_export(chunks, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
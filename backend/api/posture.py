@@ -1,10 +1,19 @@
 """Posture analysis from webcam/CV data. Passes bytes to analyzer (no numpy at API layer for light deploy)."""
-from fastapi import APIRouter, File, UploadFile
+from fastapi import APIRouter, File, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import base64
+import json
 
+from services import video_jobs
+from services.frame_cache import FrameCache
+from services.motion_gate import MotionGate
+from services.pose_tracker import PoseTracking
 from services.posture_analyzer import PostureAnalyzerService
+from services.session_recorder import SessionForbidden, SessionRecorder
+from services.video_jobs import VideoJobs
 
 router = APIRouter()
 
@@ -20,30 +29,149 @@ class PoseLandmarks(BaseModel):
     landmarks: List[LandmarkPoint]
 
 
+def _session(user: Optional[str], session_id: Optional[str]) -> Optional[str]:
+    """The caller's session when identified (X-User-Email or X-Session-Id)."""
+    try:
+        return SessionRecorder.get_instance().session_for(user, session_id)
+    except SessionForbidden:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+
+
+def _record(response: Response, session_id: Optional[str], result: dict, pts=None, duplicate: bool = False):
+    """Record the frame in the caller's session; a resent frame (duplicate) was already recorded."""
+    if session_id:
+        if not duplicate:
+            SessionRecorder.get_instance().record(session_id, result, pts)
+        response.headers["X-Session-Id"] = session_id
+
+
 @router.post("/analyze/image")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+    response: Response,
+    file: UploadFile = File(...),
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+    x_session_id: Optional[str] = Header(None, alias="X-Session-Id"),
+):
     contents = await file.read()
     analyzer = PostureAnalyzerService.get_instance()
-    result = await analyzer.analyze_frame(contents)
+    session_id = _session(x_user_email, x_session_id)
+    result, duplicate = await analyzer.analyze_frame(contents, session_id)
+    _record(response, session_id, result, duplicate=duplicate)
     return result
 
 
 @router.post("/analyze/landmarks")
-def analyze_landmarks(landmarks: PoseLandmarks):
+def analyze_landmarks(
+    landmarks: PoseLandmarks,
+    response: Response,
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+    x_session_id: Optional[str] = Header(None, alias="X-Session-Id"),
+):
     """Analyze pose from MediaPipe landmarks (client-side pose)."""
     analyzer = PostureAnalyzerService.get_instance()
     pts = [[p.x, p.y, p.z] for p in landmarks.landmarks]
     result = analyzer.analyze_landmarks(pts)
+    _record(response, _session(x_user_email, x_session_id), result, pts)
     return result
 
 
 @router.post("/analyze/base64")
-async def analyze_base64(data: dict):
+async def analyze_base64(
+    data: dict,
+    response: Response,
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+    x_session_id: Optional[str] = Header(None, alias="X-Session-Id"),
+):
     """Analyze frame from base64-encoded image (for webcam)."""
     img_b64 = data.get("image")
     if not img_b64:
         return {"error": "Missing 'image' field"}
     raw = base64.b64decode(img_b64)
     analyzer = PostureAnalyzerService.get_instance()
-    result = await analyzer.analyze_frame(raw)
+    session_id = _session(x_user_email, x_session_id)
+    result, duplicate = await analyzer.analyze_frame(raw, session_id)
+    _record(response, session_id, result, duplicate=duplicate)
     return result
+
+
+@router.post("/analyze/video", status_code=202)
+async def analyze_video(
+    file: UploadFile = File(...),
+    target_fps: Optional[float] = Query(None, gt=0, le=120),
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+):
+    """
+    Queue a recorded clip for server-side analysis. Poll `status_url` or subscribe to
+    `events_url` (server-sent events); the finished job's `result` summarizes each rep.
+    """
+    if not video_jobs.available():
+        raise HTTPException(status_code=503, detail="Video analysis needs opencv and mediapipe (not installed in light mode)")
+    jobs = VideoJobs.get_instance()
+    try:
+        job_id, path = jobs.new_upload(file.filename)
+    except video_jobs.QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    try:
+        await asyncio.to_thread(video_jobs.save_upload, file.file, path)
+    except ValueError as e:
+        jobs.cancel_upload(path)
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        jobs.cancel_upload(path)
+        raise
+    job = jobs.submit(job_id, path, file.filename, x_user_email, target_fps or video_jobs.TARGET_FPS)
+    base = f"/api/posture/analyze/video/{job_id}"
+    return {**_public(job), "status_url": base, "events_url": f"{base}/events"}
+
+
+def _public(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k != "user"}
+
+
+def _job(job_id: str, user: Optional[str]) -> dict:
+    """The job, only for the user who uploaded it (anonymous uploads for anonymous callers)."""
+    job = VideoJobs.get_instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Video job not found")
+    if job["user"] != (user.lower() if user else None):
+        raise HTTPException(status_code=403, detail="Video job belongs to another user")
+    return _public(job)
+
+
+@router.get("/analyze/video/{job_id}")
+def video_job(job_id: str, x_user_email: Optional[str] = Header(None, alias="X-User-Email")):
+    """Status, progress and (when done) the per-rep result of a video job."""
+    return _job(job_id, x_user_email)
+
+
+@router.get("/analyze/video/{job_id}/events")
+async def video_job_events(job_id: str, x_user_email: Optional[str] = Header(None, alias="X-User-Email")):
+    """Server-sent events: the job each time its status or progress changes, until it finishes."""
+    _job(job_id, x_user_email)
+
+    async def events():
+        last = None
+        while True:
+            job = VideoJobs.get_instance().get(job_id)
+            if job is None:
+                return
+            state = (job["status"], job["progress"]["frames"])
+            if state != last:
+                last = state
+                yield f"data: {json.dumps(_public(job))}\n\n"
+            if job["status"] in ("done", "failed"):
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/stats")
+def analyzer_stats():
+    """Frame analysis counters: duplicate frames, motion-gated reuse, keyframes vs tracked frames."""
+    return {
+        "cache": FrameCache.get_instance().stats(),
+        "video_jobs": VideoJobs.get_instance().stats(),
+        "gate": MotionGate.get_instance().stats(),
+        "tracking": PoseTracking.get_instance().stats(),
+    }
@@ -0,0 +1,82 @@
+"""Recorded workout sessions (coach WebSocket and posture endpoints)."""
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from db.mongo import DatabaseUnavailable, guarded
+from db.storage import get_storage
+from services.session_recorder import SessionRecorder, decode_chunk, summarize
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_sessions(
+    x_user_email: str = Header(..., alias="X-User-Email"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """The user's sessions, most recent first (summaries only)."""
+    sessions = get_storage().sessions
+    try:
+        docs = await guarded(lambda: sessions.list_for_user(x_user_email.lower(), limit))
+    except (asyncio.TimeoutError, DatabaseUnavailable):
+        raise HTTPException(status_code=503, detail="Session storage unavailable")
+    return [summarize(d) for d in docs]
+
+
+@router.get("/recorder")
+def recorder_stats():
+    """Open sessions and frames/chunks waiting to be written."""
+    return SessionRecorder.get_instance().stats()
+
+
+async def _load(session_id: str, user: Optional[str]) -> dict:
+    """Session summary, only for its owner (anonymous sessions for anonymous callers)."""
+    sessions = get_storage().sessions
+    try:
+        doc = await guarded(lambda: sessions.get(session_id))
+    except (asyncio.TimeoutError, DatabaseUnavailable):
+        doc = None
+    if doc is None:
+        # Not flushed yet (or storage down): fall back to the live in-memory summary
+        summary = SessionRecorder.get_instance().live_summary(session_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
+        summary = summarize(doc)
+    if summary.get("user") != (user.lower() if user else None):
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+    return summary
+
+
+@router.get("/{session_id}")
+async def get_session(session_id: str, x_user_email: Optional[str] = Header(None, alias="X-User-Email")):
+    return await _load(session_id, x_user_email)
+
+
+@router.get("/{session_id}/frames")
+async def get_session_frames(
+    session_id: str,
+    landmarks: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    x_user_email: Optional[str] = Header(None, alias="X-User-Email"),
+):
+    """Recorded frames in order. Frames from the last few seconds appear after the next flush."""
+    summary = await _load(session_id, x_user_email)
+    sessions = get_storage().sessions
+    try:
+        payloads = await guarded(lambda: sessions.chunks(session_id), timeout=10.0)
+    except (asyncio.TimeoutError, DatabaseUnavailable):
+        raise HTTPException(status_code=503, detail="Session storage unavailable")
+
+    def decode():
+        frames = []
+        for p in payloads:
+            frames.extend(decode_chunk(p, with_landmarks=landmarks))
+            if len(frames) >= offset + limit:
+                break
+        return frames[offset:offset + limit]
+
+    frames = await asyncio.to_thread(decode)
+    return {"session": summary, "offset": offset, "count": len(frames), "frames": frames}
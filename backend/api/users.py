@@ -3,9 +3,9 @@ import asyncio
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional
-from pymongo import ReturnDocument
-
-from db.mongo import get_db
+from db.mongo import DatabaseUnavailable, guarded
+from db.storage import get_storage
+from services.profile_cache import ProfileCache
 
 router = APIRouter()
 
@@ -38,36 +38,36 @@ def _user_from_doc(doc: dict) -> dict:
     out = dict(doc)
     out["id"] = str(out.pop("_id", ""))
     out.pop("password", None)
+    # Activity counters share the document but are served by the dashboard
+    out.pop("stats", None)
     return out
 
 
+@router.get("/cache/stats")
+def profile_cache_stats():
+    """Profile cache size and hit/miss counters."""
+    return ProfileCache.get_instance().stats()
+
+
 @router.post("/login")
 async def login_or_register(user: UserCreate):
     """Find or create user by email, return profile. Works without MongoDB (local fallback)."""
     default_settings = {"api_url": "http://localhost:8000", "default_device": "esp32-demo-1"}
+    cached = ProfileCache.get_instance().get(user.email)
+    if cached:
+        return cached
     try:
-        db = get_db()
-        coll = db.users
-        # Use timeout to prevent hanging
-        existing = await asyncio.wait_for(
-            coll.find_one({"email": user.email.lower()}),
-            timeout=2.0
-        )
-        if existing:
-            return _user_from_doc(dict(existing))
-        doc = {
-            "email": user.email.lower(),
+        users = get_storage().users
+        # One atomic find-or-insert: a single round trip, and concurrent first logins can't double-insert
+        doc = await guarded(lambda: users.get_or_create(user.email, {
             "name": user.name or user.email.split("@")[0],
             "settings": default_settings,
-        }
-        r = await asyncio.wait_for(
-            coll.insert_one(doc),
-            timeout=2.0
-        )
-        doc["_id"] = r.inserted_id
-        return _user_from_doc(doc)
-    except asyncio.TimeoutError:
-        # If DB is slow, use fallback
+        }))
+        profile = _user_from_doc(dict(doc))
+        ProfileCache.get_instance().put(profile["email"], profile)
+        return profile
+    except (asyncio.TimeoutError, DatabaseUnavailable):
+        # If DB is slow or known to be down, use fallback
         return {
             "id": "",
             "email": user.email.lower(),
@@ -88,15 +88,17 @@ async def login_or_register(user: UserCreate):
 @router.get("/me")
 async def get_me(x_user_email: str = Header(..., alias="X-User-Email")):
     """Get current user profile and settings."""
+    cached = ProfileCache.get_instance().get(x_user_email)
+    if cached:
+        return cached
     try:
-        db = get_db()
-        user = await asyncio.wait_for(
-            db.users.find_one({"email": x_user_email.lower()}),
-            timeout=2.0
-        )
+        users = get_storage().users
+        user = await guarded(lambda: users.find_by_email(x_user_email))
         if user:
-            return _user_from_doc(dict(user))
-    except asyncio.TimeoutError:
+            profile = _user_from_doc(dict(user))
+            ProfileCache.get_instance().put(x_user_email, profile)
+            return profile
+    except (asyncio.TimeoutError, DatabaseUnavailable):
         pass
     except Exception as e:
         print(f"DB error in get_me: {e}")
@@ -115,7 +117,7 @@ async def get_me(x_user_email: str = Header(..., alias="X-User-Email")):
 async def update_me(data: UserUpdate, x_user_email: str = Header(..., alias="X-User-Email")):
     """Update user profile. Creates the user document if it doesn't exist (upsert)."""
     try:
-        db = get_db()
+        users = get_storage().users
         update = {k: v for k, v in data.model_dump().items() if v is not None}
         if not update:
             return await get_me(x_user_email)
@@ -125,21 +127,17 @@ async def update_me(data: UserUpdate, x_user_email: str = Header(..., alias="X-U
         set_doc["email"] = email_lower
         set_doc.setdefault("name", data.name or email_lower.split("@")[0].replace(".", " ").replace("_", " ").title())
         set_doc.setdefault("settings", {"api_url": "http://localhost:8000", "default_device": "esp32-demo-1"})
-        r = await asyncio.wait_for(
-            db.users.find_one_and_update(
-                {"email": email_lower},
-                {"$set": set_doc},
-                return_document=ReturnDocument.AFTER,
-                upsert=True,
-            ),
-            timeout=2.0
-        )
+        r = await guarded(lambda: users.update(email_lower, set_doc, upsert=True))
         if r:
-            return _user_from_doc(dict(r))
-    except asyncio.TimeoutError:
+            profile = _user_from_doc(dict(r))
+            ProfileCache.get_instance().put(email_lower, profile)
+            return profile
+    except (asyncio.TimeoutError, DatabaseUnavailable):
         pass
     except Exception as e:
         print(f"DB error in update_me: {e}")
+    # Outcome of the write is unknown; drop the entry so the next read goes to the DB
+    ProfileCache.get_instance().invalidate(x_user_email)
     
     # Return updated profile even if DB fails
     return {
@@ -152,15 +150,16 @@ async def update_me(data: UserUpdate, x_user_email: str = Header(..., alias="X-U
 async def get_settings(x_user_email: str = Header(..., alias="X-User-Email")):
     """Get user settings."""
     default_settings = {"api_url": "http://localhost:8000", "default_device": "esp32-demo-1"}
+    cached = ProfileCache.get_instance().get(x_user_email)
+    if cached:
+        return cached.get("settings", default_settings)
     try:
-        db = get_db()
-        user = await asyncio.wait_for(
-            db.users.find_one({"email": x_user_email.lower()}),
-            timeout=2.0
-        )
+        users = get_storage().users
+        user = await guarded(lambda: users.find_by_email(x_user_email))
         if user:
+            ProfileCache.get_instance().put(x_user_email, _user_from_doc(dict(user)))
             return user.get("settings", default_settings)
-    except asyncio.TimeoutError:
+    except (asyncio.TimeoutError, DatabaseUnavailable):
         pass
     except Exception as e:
         print(f"DB error in get_settings: {e}")
@@ -173,24 +172,19 @@ async def update_settings(data: SettingsUpdate, x_user_email: str = Header(...,
     """Update user settings."""
     default_settings = {"api_url": "http://localhost:8000", "default_device": "esp32-demo-1"}
     try:
-        db = get_db()
+        users = get_storage().users
         update = {f"settings.{k}": v for k, v in data.model_dump().items() if v is not None}
         if not update:
             return await get_settings(x_user_email)
-        r = await asyncio.wait_for(
-            db.users.find_one_and_update(
-                {"email": x_user_email.lower()},
-                {"$set": update},
-                return_document=ReturnDocument.AFTER,
-            ),
-            timeout=2.0
-        )
+        r = await guarded(lambda: users.update(x_user_email, update))
         if r:
+            ProfileCache.get_instance().put(x_user_email, _user_from_doc(dict(r)))
             return r.get("settings", default_settings)
-    except asyncio.TimeoutError:
+    except (asyncio.TimeoutError, DatabaseUnavailable):
         pass
     except Exception as e:
         print(f"DB error in update_settings: {e}")
+    ProfileCache.get_instance().invalidate(x_user_email)
     
     # Return merged settings even if DB fails
     return {**default_settings, **{k: v for k, v in data.model_dump().items() if v is not None}}
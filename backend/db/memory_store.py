@@ -0,0 +1,113 @@
+"""Pure in-memory storage backend (tests, benchmarks, single-process demos). Lost on restart."""
+import uuid
+from copy import deepcopy
+from typing import Optional
+
+from db.repository import (
+    DeviceRepository, DuplicateUser, SensorRepository, SessionRepository, Storage, UserRepository,
+    apply_set, from_ms, to_ms, without_password,
+)
+
+
+class MemoryUsers(UserRepository):
+    def __init__(self):
+        self._by_email: dict[str, dict] = {}
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        return without_password(deepcopy(self._by_email.get(email.lower())))
+
+    async def insert(self, doc: dict) -> dict:
+        email = doc["email"].lower()
+        if email in self._by_email:
+            raise DuplicateUser(email)
+        stored = {**deepcopy(doc), "email": email, "_id": uuid.uuid4().hex}
+        self._by_email[email] = stored
+        return without_password(deepcopy(stored))
+
+    async def get_or_create(self, email: str, defaults: dict) -> dict:
+        email = email.lower()
+        doc = self._by_email.get(email)
+        if doc is None:
+            doc = self._by_email[email] = {**deepcopy(defaults), "email": email, "_id": uuid.uuid4().hex}
+        return without_password(deepcopy(doc))
+
+    async def update(self, email: str, fields: dict, upsert: bool = False) -> Optional[dict]:
+        email = email.lower()
+        doc = self._by_email.get(email)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._by_email[email] = {"_id": uuid.uuid4().hex, "email": email}
+        apply_set(doc, deepcopy(fields))
+        return without_password(deepcopy(doc))
+
+
+class MemoryDevices(DeviceRepository):
+    def __init__(self):
+        self._devices: dict[str, dict] = {}
+
+    async def all(self) -> list:
+        return [dict(d) for d in self._devices.values()]
+
+    async def upsert_many(self, docs: list):
+        for d in docs:
+            self._devices[d["id"]] = {**self._devices.get(d["id"], {}), **d}
+
+
+class MemorySensors(SensorRepository):
+    def __init__(self):
+        # device_id -> list of (ts_ms, doc); readings arrive roughly in order, so sort lazily on read
+        self._readings: dict[str, list] = {}
+
+    async def insert_many(self, docs: list):
+        for d in docs:
+            self._readings.setdefault(d["device_id"], []).append((to_ms(d["ts"]), dict(d)))
+
+    async def iter_range(self, device_id, start=None, end=None, batch_size: int = 500):
+        rows = self._readings.get(device_id, [])
+        rows.sort(key=lambda r: r[0])
+        lo, hi = to_ms(start), to_ms(end)
+        batch = []
+        for t, doc in rows:
+            if (lo is not None and t < lo) or (hi is not None and t >= hi):
+                continue
+            batch.append({**doc, "ts": from_ms(t)})
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class MemorySessions(SessionRepository):
+    def __init__(self):
+        self._meta: dict[str, dict] = {}
+        self._chunks: dict[str, dict[int, bytes]] = {}
+
+    async def save(self, session: dict):
+        self._meta[session["id"]] = deepcopy(session)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return deepcopy(self._meta.get(session_id))
+
+    async def list_for_user(self, user: str, limit: int = 50) -> list:
+        items = [s for s in self._meta.values() if s.get("user") == user]
+        items.sort(key=lambda s: s.get("started_at") or "", reverse=True)
+        return deepcopy(items[:limit])
+
+    async def append_chunk(self, session_id: str, seq: int, payload: bytes):
+        self._chunks.setdefault(session_id, {})[seq] = bytes(payload)
+
+    async def chunks(self, session_id: str) -> list:
+        parts = self._chunks.get(session_id, {})
+        return [parts[k] for k in sorted(parts)]
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self):
+        self.users = MemoryUsers()
+        self.devices = MemoryDevices()
+        self.sensors = MemorySensors()
+        self.sessions = MemorySessions()
@@ -1,11 +1,33 @@
 """MongoDB connection and utilities."""
+import asyncio
 import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import ConnectionFailure, DuplicateKeyError, ExecutionTimeout, OperationFailure
 from pydantic_settings import BaseSettings
 
+from db.repository import (
+    DeviceRepository, DuplicateUser, SensorRepository, SessionRepository, Storage, UserRepository,
+    without_password,
+)
+
+T = TypeVar("T")
+
 
 class Settings(BaseSettings):
+    # mongo | sqlite | memory
+    storage_backend: str = "mongo"
+    sqlite_path: str = "neuroposture.db"
     mongodb_uri: str = "mongodb://localhost:27017"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    # Circuit breaker: consecutive failures before failing fast, and probe interval while open
+    mongodb_breaker_threshold: int = 3
+    mongodb_probe_interval_sec: float = 5.0
     
     class Config:
         env_file = ".env"
@@ -17,16 +39,144 @@ _client: AsyncIOMotorClient | None = None
 _db = None
 
 
+class DatabaseUnavailable(Exception):
+    """Raised without touching the network while the circuit breaker is open."""
+
+
+# Errors that mean the backend itself is unreachable or stalled. Anything else
+# (duplicate keys, validation, bad queries) is an answer from a healthy server.
+_OUTAGE_ERRORS = (asyncio.TimeoutError, ConnectionFailure, ExecutionTimeout, sqlite3.OperationalError, OSError)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through; `threshold` consecutive outage errors open it.
+    Open: calls fail immediately while a background task pings the configured
+    storage backend and closes the breaker on the first successful ping.
+    """
+
+    def __init__(self, threshold: int, probe_interval: float):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self._probe: Optional[asyncio.Task] = None
+
+    @property
+    def state(self) -> str:
+        return "open" if self.opened_at is not None else "closed"
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is None and self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            print(f"Database circuit breaker open after {self.failures} failures")
+            self._start_probe()
+
+    def _start_probe(self):
+        if self._probe is None or self._probe.done():
+            try:
+                self._probe = asyncio.get_running_loop().create_task(self._probe_loop())
+            except RuntimeError:
+                pass
+
+    async def _probe_loop(self):
+        from db.storage import get_storage  # db.storage imports this module
+
+        while self.opened_at is not None:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await asyncio.wait_for(get_storage().ping(), timeout=2.0)
+            except Exception:
+                continue
+            print(f"Database reachable again after {time.monotonic() - self.opened_at:.1f}s")
+            self.opened_at = None
+            self.failures = 0
+
+    def reset(self):
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        self.failures = 0
+        self.opened_at = None
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+breaker = CircuitBreaker(_settings.mongodb_breaker_threshold, _settings.mongodb_probe_interval_sec)
+
+
+async def guarded(op: Callable[[], Awaitable[T]], timeout: float = 2.0) -> T:
+    """
+    Run a DB operation through the circuit breaker with a timeout.
+    `op` is a callable (e.g. lambda: coll.find_one(...)) so nothing is sent while the breaker is open.
+    Raises DatabaseUnavailable, asyncio.TimeoutError or the driver's error; only
+    connection / timeout errors count towards opening the breaker.
+    """
+    if not breaker.allow():
+        raise DatabaseUnavailable("Database circuit breaker is open")
+    try:
+        result = await asyncio.wait_for(op(), timeout=timeout)
+    except _OUTAGE_ERRORS:
+        breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
 async def connect_db():
     """Initialize MongoDB connection."""
     global _client, _db
     if _client is None:
         uri = os.environ.get("MONGODB_URI") or os.getenv("MONGODB_URI") or _settings.mongodb_uri
-        _client = AsyncIOMotorClient(uri, connectTimeoutMS=5000, serverSelectionTimeoutMS=5000)
+        _client = AsyncIOMotorClient(
+            uri,
+            connectTimeoutMS=5000,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=_settings.mongodb_max_pool_size,
+            minPoolSize=_settings.mongodb_min_pool_size,
+        )
         _db = _client.get_database("neuroposture")
     return _db
 
 
+async def ensure_indexes():
+    """Create the indexes queries rely on. Safe to run on every startup (no-op when present)."""
+    if _db is None:
+        return
+    specs = [
+        ("users", [("email", 1)], {"unique": True}),
+        ("devices", [("id", 1)], {"unique": True}),
+        ("sensor_readings", [("device_id", 1), ("ts", 1)], {}),
+        ("sessions", [("id", 1)], {"unique": True}),
+        ("sessions", [("user", 1), ("started_at", -1)], {}),
+        ("session_chunks", [("session_id", 1), ("seq", 1)], {"unique": True}),
+    ]
+    for coll, keys, opts in specs:
+        try:
+            await guarded(lambda: _db[coll].create_index(keys, **opts), timeout=10.0)
+        except OperationFailure as e:
+            # e.g. duplicate emails already stored; other indexes can still be built
+            print(f"Index on {coll} {keys} not created: {e}")
+        except Exception as e:
+            print(f"Skipping index creation, MongoDB unavailable: {e}")
+            return
+
+
 def get_db():
     """Get MongoDB database. Must call connect_db() first."""
     global _db
@@ -37,7 +187,127 @@ def get_db():
 
 async def close_db():
     global _client, _db
+    breaker.reset()
     if _client:
         _client.close()
         _client = None
         _db = None
+
+
+class MongoUsers(UserRepository):
+    # Everything the API returns; the password hash never leaves the DB
+    _FIELDS = {"password": 0}
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        return await get_db().users.find_one({"email": email.lower()}, self._FIELDS)
+
+    async def insert(self, doc: dict) -> dict:
+        doc = {**doc, "email": doc["email"].lower()}
+        try:
+            r = await get_db().users.insert_one(doc)
+        except DuplicateKeyError:
+            raise DuplicateUser(doc["email"])
+        doc["_id"] = r.inserted_id
+        return without_password(doc)
+
+    async def get_or_create(self, email: str, defaults: dict) -> dict:
+        email = email.lower()
+        query = {"email": email}
+        update = {"$setOnInsert": {**defaults, "email": email}}
+        try:
+            return await get_db().users.find_one_and_update(
+                query, update, projection=self._FIELDS, return_document=ReturnDocument.AFTER, upsert=True,
+            )
+        except DuplicateKeyError:
+            # Two first logins raced; the unique email index let exactly one insert win
+            return await get_db().users.find_one(query, self._FIELDS)
+
+    async def update(self, email: str, fields: dict, upsert: bool = False) -> Optional[dict]:
+        return await get_db().users.find_one_and_update(
+            {"email": email.lower()},
+            {"$set": fields},
+            projection=self._FIELDS,
+            return_document=ReturnDocument.AFTER,
+            upsert=upsert,
+        )
+
+
+class MongoDevices(DeviceRepository):
+    async def all(self) -> list:
+        return await get_db().devices.find({}, {"_id": 0}).to_list(None)
+
+    async def upsert_many(self, docs: list):
+        if docs:
+            await get_db().devices.bulk_write(
+                [UpdateOne({"id": d["id"]}, {"$set": d}, upsert=True) for d in docs], ordered=False,
+            )
+
+
+class MongoSensors(SensorRepository):
+    async def insert_many(self, docs: list):
+        if docs:
+            # Shallow copies: pymongo writes `_id` into the dicts it is given
+            await get_db().sensor_readings.insert_many([dict(d) for d in docs], ordered=False)
+
+    async def iter_range(self, device_id, start=None, end=None, batch_size: int = 500):
+        query: dict = {"device_id": device_id}
+        if start or end:
+            query["ts"] = {}
+            if start:
+                query["ts"]["$gte"] = start
+            if end:
+                query["ts"]["$lt"] = end
+        cursor = get_db().sensor_readings.find(query, {"_id": 0}).sort("ts", 1).batch_size(batch_size)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class MongoSessions(SessionRepository):
+    async def save(self, session: dict):
+        await get_db().sessions.replace_one({"id": session["id"]}, session, upsert=True)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return await get_db().sessions.find_one({"id": session_id}, {"_id": 0})
+
+    async def list_for_user(self, user: str, limit: int = 50) -> list:
+        cursor = get_db().sessions.find({"user": user}, {"_id": 0}).sort("started_at", -1).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def append_chunk(self, session_id: str, seq: int, payload: bytes):
+        await get_db().session_chunks.replace_one(
+            {"session_id": session_id, "seq": seq},
+            {"session_id": session_id, "seq": seq, "payload": payload},
+            upsert=True,
+        )
+
+    async def chunks(self, session_id: str) -> list:
+        cursor = get_db().session_chunks.find({"session_id": session_id}, {"_id": 0, "payload": 1}).sort("seq", 1)
+        return [bytes(d["payload"]) async for d in cursor]
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self):
+        self.users = MongoUsers()
+        self.devices = MongoDevices()
+        self.sensors = MongoSensors()
+        self.sessions = MongoSessions()
+
+    async def connect(self):
+        await connect_db()
+
+    async def ensure_indexes(self):
+        await ensure_indexes()
+
+    async def ping(self):
+        await get_db().client.admin.command("ping")
+
+    async def close(self):
+        await close_db()
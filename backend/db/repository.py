@@ -0,0 +1,129 @@
+"""
+Storage interfaces shared by the MongoDB, SQLite and in-memory backends.
+Documents are plain dicts in the MongoDB shapes the API already uses; every
+backend accepts and returns the same shapes so callers never branch on the backend.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+
+def to_ms(dt: Optional[datetime]) -> Optional[int]:
+    """Datetime to epoch ms; naive values are UTC (how readings are stored)."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def from_ms(ms: int) -> datetime:
+    """Epoch ms to naive UTC datetime, matching what MongoDB returns."""
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def apply_set(doc: dict, fields: dict) -> dict:
+    """MongoDB `$set` semantics for backends without it, including dotted paths ("settings.api_url")."""
+    for key, value in fields.items():
+        target = doc
+        *parents, leaf = key.split(".")
+        for p in parents:
+            if not isinstance(target.get(p), dict):
+                target[p] = {}
+            target = target[p]
+        target[leaf] = value
+    return doc
+
+
+def without_password(doc: Optional[dict]) -> Optional[dict]:
+    if doc is None:
+        return None
+    return {k: v for k, v in doc.items() if k != "password"}
+
+
+class UserRepository(ABC):
+    """Users keyed by lowercase email. Returned documents never include the password."""
+
+    @abstractmethod
+    async def find_by_email(self, email: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert(self, doc: dict) -> dict:
+        """Insert a new user; returns it with `_id` set. Raises DuplicateUser if the email exists."""
+
+    @abstractmethod
+    async def get_or_create(self, email: str, defaults: dict) -> dict:
+        """Return the user, creating it from `defaults` if absent, in one atomic step."""
+
+    @abstractmethod
+    async def update(self, email: str, fields: dict, upsert: bool = False) -> Optional[dict]:
+        """Apply `$set`-style fields (dotted keys allowed) and return the updated document."""
+
+
+class DuplicateUser(Exception):
+    pass
+
+
+class DeviceRepository(ABC):
+    """Device registry documents: {id, name, type, connected, last_seen}."""
+
+    @abstractmethod
+    async def all(self) -> list: ...
+
+    @abstractmethod
+    async def upsert_many(self, docs: list): ...
+
+
+class SensorRepository(ABC):
+    """Readings: {device_id, ts (naive UTC datetime), timestamp, accel, gyro, heart_rate}."""
+
+    @abstractmethod
+    async def insert_many(self, docs: list): ...
+
+    @abstractmethod
+    def iter_range(
+        self, device_id: str, start: Optional[datetime], end: Optional[datetime], batch_size: int = 500,
+    ) -> AsyncIterator[list]:
+        """Batches of readings in [start, end), oldest first."""
+
+
+class SessionRepository(ABC):
+    """Workout sessions: a metadata document plus ordered binary chunks."""
+
+    @abstractmethod
+    async def save(self, session: dict):
+        """Insert or replace session metadata (keyed by session["id"])."""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def list_for_user(self, user: str, limit: int = 50) -> list:
+        """Most recent first."""
+
+    @abstractmethod
+    async def append_chunk(self, session_id: str, seq: int, payload: bytes): ...
+
+    @abstractmethod
+    async def chunks(self, session_id: str) -> list:
+        """Chunk payloads in seq order."""
+
+
+class Storage(ABC):
+    name = "base"
+    users: UserRepository
+    devices: DeviceRepository
+    sensors: SensorRepository
+    sessions: SessionRepository
+
+    async def connect(self):
+        pass
+
+    async def ensure_indexes(self):
+        pass
+
+    async def ping(self):
+        """Cheap round trip; raises if the backend is unreachable (the circuit breaker's probe)."""
+
+    async def close(self):
+        pass
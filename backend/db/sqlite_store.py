@@ -0,0 +1,239 @@
+"""
+SQLite storage backend for single-node deployments (no network round trips).
+One connection in WAL mode, driven by a single worker thread so the event loop
+never blocks and writes are serialized; bulk writes run as one transaction.
+Documents without a fixed schema (users, sessions) are stored as JSON.
+"""
+import asyncio
+import json
+import sqlite3
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from db.repository import (
+    DeviceRepository, DuplicateUser, SensorRepository, SessionRepository, Storage, UserRepository,
+    apply_set, from_ms, to_ms, without_password,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, doc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS devices (
+    id TEXT PRIMARY KEY, name TEXT, type TEXT, connected INTEGER, last_seen TEXT
+);
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    device_id TEXT NOT NULL, ts INTEGER NOT NULL, timestamp TEXT,
+    ax REAL, ay REAL, az REAL, gx REAL, gy REAL, gz REAL, heart_rate REAL
+);
+CREATE INDEX IF NOT EXISTS sensor_readings_device_ts ON sensor_readings (device_id, ts);
+CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, user TEXT, started_at TEXT, doc TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user, started_at);
+CREATE TABLE IF NOT EXISTS session_chunks (
+    session_id TEXT NOT NULL, seq INTEGER NOT NULL, payload BLOB NOT NULL, PRIMARY KEY (session_id, seq)
+);
+"""
+
+
+class _Db:
+    """Serializes all access to one sqlite3 connection on a dedicated thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+
+    async def open(self):
+        await self.run(self._open)
+
+    async def close(self):
+        if self._conn is not None:
+            await self.run(self._conn.close)
+            self._conn = None
+        self._pool.shutdown(wait=False)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return self._conn
+
+    def transaction(self, fn):
+        """Run fn(conn) inside BEGIN/COMMIT (called on the worker thread)."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+
+class SqliteUsers(UserRepository):
+    def __init__(self, db: _Db):
+        self._db = db
+
+    def _get(self, conn, email: str) -> Optional[dict]:
+        row = conn.execute("SELECT doc FROM users WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def find_by_email(self, email: str) -> Optional[dict]:
+        return without_password(await self._db.run(lambda: self._get(self._db.conn, email.lower())))
+
+    async def insert(self, doc: dict) -> dict:
+        stored = {**doc, "email": doc["email"].lower(), "_id": uuid.uuid4().hex}
+
+        def op():
+            try:
+                self._db.conn.execute("INSERT INTO users (email, doc) VALUES (?, ?)", (stored["email"], json.dumps(stored)))
+            except sqlite3.IntegrityError:
+                raise DuplicateUser(stored["email"])
+        await self._db.run(op)
+        return without_password(stored)
+
+    async def get_or_create(self, email: str, defaults: dict) -> dict:
+        email = email.lower()
+        doc = {**defaults, "email": email, "_id": uuid.uuid4().hex}
+
+        def op():
+            # Statements run one at a time on the worker thread, so insert-if-absent + read is atomic
+            self._db.conn.execute("INSERT OR IGNORE INTO users (email, doc) VALUES (?, ?)", (email, json.dumps(doc)))
+            return self._get(self._db.conn, email)
+        return without_password(await self._db.run(op))
+
+    async def update(self, email: str, fields: dict, upsert: bool = False) -> Optional[dict]:
+        email = email.lower()
+
+        def op(conn):
+            doc = self._get(conn, email)
+            if doc is None:
+                if not upsert:
+                    return None
+                doc = {"_id": uuid.uuid4().hex, "email": email}
+            apply_set(doc, fields)
+            conn.execute("INSERT OR REPLACE INTO users (email, doc) VALUES (?, ?)", (email, json.dumps(doc)))
+            return doc
+        return without_password(await self._db.run(self._db.transaction, op))
+
+
+class SqliteDevices(DeviceRepository):
+    def __init__(self, db: _Db):
+        self._db = db
+
+    async def all(self) -> list:
+        rows = await self._db.run(
+            lambda: self._db.conn.execute("SELECT id, name, type, connected, last_seen FROM devices").fetchall()
+        )
+        return [
+            {"id": r[0], "name": r[1], "type": r[2], "connected": bool(r[3]), "last_seen": r[4]}
+            for r in rows
+        ]
+
+    async def upsert_many(self, docs: list):
+        rows = [(d["id"], d.get("name"), d.get("type"), int(bool(d.get("connected"))), d.get("last_seen")) for d in docs]
+        await self._db.run(self._db.transaction, lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO devices (id, name, type, connected, last_seen) VALUES (?, ?, ?, ?, ?)", rows,
+        ))
+
+
+class SqliteSensors(SensorRepository):
+    def __init__(self, db: _Db):
+        self._db = db
+
+    async def insert_many(self, docs: list):
+        rows = [
+            (d["device_id"], to_ms(d["ts"]), d.get("timestamp"), *d["accel"], *d["gyro"], d.get("heart_rate"))
+            for d in docs
+        ]
+        await self._db.run(self._db.transaction, lambda conn: conn.executemany(
+            "INSERT INTO sensor_readings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows,
+        ))
+
+    async def iter_range(self, device_id, start=None, end=None, batch_size: int = 500):
+        lo = to_ms(start) if start else -(2 ** 62)
+        hi = to_ms(end) if end else 2 ** 62
+        # Keyset pagination on (ts, rowid): each batch is one indexed range scan
+        last = (lo - 1, -1)
+        sql = (
+            "SELECT rowid, device_id, ts, timestamp, ax, ay, az, gx, gy, gz, heart_rate FROM sensor_readings "
+            "WHERE device_id = ? AND ts >= ? AND ts < ? AND (ts, rowid) > (?, ?) ORDER BY ts, rowid LIMIT ?"
+        )
+        while True:
+            args = (device_id, lo, hi, last[0], last[1], batch_size)
+            rows = await self._db.run(lambda: self._db.conn.execute(sql, args).fetchall())
+            if not rows:
+                break
+            last = (rows[-1][2], rows[-1][0])
+            yield [
+                {
+                    "device_id": r[1], "ts": from_ms(r[2]), "timestamp": r[3],
+                    "accel": [r[4], r[5], r[6]], "gyro": [r[7], r[8], r[9]], "heart_rate": r[10],
+                }
+                for r in rows
+            ]
+            if len(rows) < batch_size:
+                break
+
+
+class SqliteSessions(SessionRepository):
+    def __init__(self, db: _Db):
+        self._db = db
+
+    async def save(self, session: dict):
+        await self._db.run(lambda: self._db.conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, user, started_at, doc) VALUES (?, ?, ?, ?)",
+            (session["id"], session.get("user"), session.get("started_at"), json.dumps(session)),
+        ))
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        row = await self._db.run(
+            lambda: self._db.conn.execute("SELECT doc FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    async def list_for_user(self, user: str, limit: int = 50) -> list:
+        rows = await self._db.run(lambda: self._db.conn.execute(
+            "SELECT doc FROM sessions WHERE user = ? ORDER BY started_at DESC LIMIT ?", (user, limit),
+        ).fetchall())
+        return [json.loads(r[0]) for r in rows]
+
+    async def append_chunk(self, session_id: str, seq: int, payload: bytes):
+        await self._db.run(lambda: self._db.conn.execute(
+            "INSERT OR REPLACE INTO session_chunks (session_id, seq, payload) VALUES (?, ?, ?)",
+            (session_id, seq, sqlite3.Binary(payload)),
+        ))
+
+    async def chunks(self, session_id: str) -> list:
+        rows = await self._db.run(lambda: self._db.conn.execute(
+            "SELECT payload FROM session_chunks WHERE session_id = ? ORDER BY seq", (session_id,),
+        ).fetchall())
+        return [bytes(r[0]) for r in rows]
+
+
+class SqliteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self._db = _Db(path)
+        self.users = SqliteUsers(self._db)
+        self.devices = SqliteDevices(self._db)
+        self.sensors = SqliteSensors(self._db)
+        self.sessions = SqliteSessions(self._db)
+
+    async def connect(self):
+        await self._db.open()
+
+    async def ping(self):
+        await self._db.run(lambda: self._db.conn.execute("SELECT 1").fetchone())
+
+    async def close(self):
+        await self._db.close()
@@ -0,0 +1,45 @@
+"""Storage backend selection (STORAGE_BACKEND=mongo|sqlite|memory)."""
+import os
+from typing import Optional
+
+from db.mongo import MongoStorage, _settings
+from db.memory_store import MemoryStorage
+from db.repository import Storage
+from db.sqlite_store import SqliteStorage
+
+_storage: Optional[Storage] = None
+
+
+def create_storage(backend: Optional[str] = None) -> Storage:
+    backend = (backend or os.getenv("STORAGE_BACKEND") or _settings.storage_backend).lower()
+    if backend == "mongo":
+        return MongoStorage()
+    if backend == "sqlite":
+        return SqliteStorage(os.getenv("SQLITE_PATH") or _settings.sqlite_path)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+async def connect_storage(backend: Optional[str] = None) -> Storage:
+    """Create, connect and index the configured backend (idempotent)."""
+    global _storage
+    if _storage is None:
+        storage = create_storage(backend)
+        await storage.connect()
+        await storage.ensure_indexes()
+        _storage = storage
+    return _storage
+
+
+def get_storage() -> Storage:
+    if _storage is None:
+        raise RuntimeError("Storage not connected. Call connect_storage() first.")
+    return _storage
+
+
+async def close_storage():
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
@@ -11,10 +11,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from api import devices, posture, coach, health, iot, users
+from api import devices, posture, coach, health, iot, users, sessions, dashboard
 from services.injury_predictor import InjuryPredictorService
 from services.iot_simulator import IoTDataStore
-from db.mongo import connect_db, close_db
+from services.device_registry import DeviceRegistry
+from services.session_recorder import SessionRecorder
+from services.activity_aggregates import ActivityAggregates
+from db.storage import connect_storage, close_storage
 
 # Deployment: comma-separated origins, e.g. https://myapp.com,https://www.myapp.com
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000").strip().split(",")
@@ -23,11 +26,17 @@ FRONTEND_DIST = os.getenv("FRONTEND_DIST", "../frontend/dist").strip()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await connect_db()
+    await connect_storage()
     InjuryPredictorService.get_instance()
+    await DeviceRegistry.get_instance().start()
+    await SessionRecorder.get_instance().start()
+    await ActivityAggregates.get_instance().start()
     yield
+    await SessionRecorder.get_instance().stop()
+    await ActivityAggregates.get_instance().stop()
+    await DeviceRegistry.get_instance().stop()
     IoTDataStore.clear()
-    await close_db()
+    await close_storage()
 
 
 app = FastAPI(
@@ -51,6 +60,8 @@ app.include_router(posture.router, prefix="/api/posture", tags=["Posture"])
 app.include_router(coach.router, prefix="/api/coach", tags=["AI Coach"])
 app.include_router(iot.router, prefix="/api/iot", tags=["IoT"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
+app.include_router(sessions.router, prefix="/api/sessions", tags=["Sessions"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
 
 if os.path.exists("uploads"):
     app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -0,0 +1,239 @@
+"""
+Per-user activity aggregates (reps, posture score, risk distribution, time under
+tension), updated frame by frame as sessions are recorded. Counters are additive,
+so totals persisted on the user document are merged with what accumulated in
+memory before they were loaded; dirty users are written back in one pass per interval.
+"""
+import asyncio
+import math
+import os
+import threading
+from typing import Optional
+
+from db.mongo import DatabaseUnavailable, guarded
+from db.storage import get_storage
+
+_FLUSH_INTERVAL = float(os.getenv("AGGREGATE_FLUSH_INTERVAL_SEC", "10"))
+# Gaps longer than this between frames don't count as time under tension
+_MAX_TUT_GAP_MS = 2000
+# Exercises that load the body; standing / unknown frames are rest
+_ACTIVE = ("squat", "lunge", "plank")
+# Same cut-offs as InjuryPredictorService risk levels
+_MEDIUM_RISK, _HIGH_RISK = 0.4, 0.7
+# exercise -> (result field, angle that starts a rep, angle that completes it)
+_REP_ANGLES = {
+    "squat": ("knee_angle", 110, 140),
+    "lunge": ("knee_angle", 100, 140),
+}
+# A plank counts as one hold once it has lasted this long
+_MIN_HOLD_MS = 1000
+
+
+def _empty() -> dict:
+    return {
+        "frames": 0, "detected_frames": 0, "posture_score_sum": 0.0, "sessions": 0,
+        "risk": {"low": 0, "medium": 0, "high": 0}, "reps": {}, "tut_ms": {}, "last_active": None,
+    }
+
+
+def _merge(into: dict, other: dict) -> dict:
+    for key in ("frames", "detected_frames", "posture_score_sum", "sessions"):
+        into[key] += other.get(key) or 0
+    for key in ("risk", "reps", "tut_ms"):
+        for k, v in (other.get(key) or {}).items():
+            into[key][k] = into[key].get(k, 0) + v
+    if other.get("last_active") and (into["last_active"] or "") < other["last_active"]:
+        into["last_active"] = other["last_active"]
+    return into
+
+
+class _RepTracker:
+    """Per-session state: previous frame, whether the user is in the bottom of a rep, current plank hold."""
+    __slots__ = ("exercise", "t_ms", "down", "hold_start", "held")
+
+    def __init__(self):
+        self.exercise: Optional[str] = None
+        self.t_ms: Optional[int] = None
+        self.down = False
+        self.hold_start: Optional[int] = None
+        self.held = False
+
+    def step(self, exercise: Optional[str], result: dict, t_ms: int) -> tuple[Optional[str], int]:
+        """Returns (exercise a rep / hold was completed for, ms under tension since the previous frame)."""
+        tut = 0
+        if self.exercise in _ACTIVE and self.t_ms is not None:
+            tut = min(max(t_ms - self.t_ms, 0), _MAX_TUT_GAP_MS)
+        rep = None
+        if exercise != self.exercise:
+            # Leaving an exercise from the bottom of a rep (e.g. standing up out of a squat) completes it
+            if self.down:
+                rep = self.exercise
+            self.down = False
+            self.hold_start, self.held = (t_ms if exercise == "plank" else None), False
+        if exercise in _REP_ANGLES:
+            # Joint angle below `down`, then back above `up`, is one rep
+            key, down, up = _REP_ANGLES[exercise]
+            angle = result.get(key)
+            if isinstance(angle, (int, float)) and not math.isnan(angle):
+                if angle < down:
+                    self.down = True
+                elif self.down and angle > up:
+                    rep, self.down = exercise, False
+        elif exercise == "plank" and not self.held and t_ms - self.hold_start >= _MIN_HOLD_MS:
+            rep, self.held = "plank", True
+        self.exercise, self.t_ms = exercise, t_ms
+        return rep, tut
+
+
+class _Entry:
+    def __init__(self):
+        self.stats = _empty()
+        self.loaded = False
+
+
+class ActivityAggregates:
+    _instance: Optional["ActivityAggregates"] = None
+
+    @classmethod
+    def get_instance(cls) -> "ActivityAggregates":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._users: dict[str, _Entry] = {}
+        self._trackers: dict[str, _RepTracker] = {}
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- hot path (memory only, O(1) per frame) ---
+
+    def record_frame(self, user: Optional[str], session_id: str, result: dict, t_ms: int, at: str):
+        if not user:
+            return
+        with self._lock:
+            entry = self._users.get(user)
+            if entry is None:
+                entry = self._users[user] = _Entry()
+            s = entry.stats
+            tracker = self._trackers.get(session_id)
+            if tracker is None:
+                tracker = self._trackers[session_id] = _RepTracker()
+                s["sessions"] += 1
+            s["frames"] += 1
+            s["last_active"] = at
+            exercise = result.get("exercise") if result.get("detected") else None
+            if exercise:
+                s["detected_frames"] += 1
+                score = result.get("posture_score")
+                if isinstance(score, (int, float)):
+                    s["posture_score_sum"] += score
+                risk = result.get("injury_risk")
+                if isinstance(risk, (int, float)):
+                    level = "high" if risk > _HIGH_RISK else "medium" if risk > _MEDIUM_RISK else "low"
+                    s["risk"][level] += 1
+            prev = tracker.exercise
+            rep, tut = tracker.step(exercise, result, t_ms)
+            if rep:
+                s["reps"][rep] = s["reps"].get(rep, 0) + 1
+            if tut:
+                # The interval since the last frame belongs to the exercise held during it
+                s["tut_ms"][prev] = s["tut_ms"].get(prev, 0) + tut
+            self._dirty.add(user)
+
+    def end_session(self, session_id: str):
+        with self._lock:
+            self._trackers.pop(session_id, None)
+
+    # --- reads ---
+
+    async def summary(self, user: str) -> dict:
+        """Aggregate view for one user; persisted totals are loaded once per process."""
+        user = user.lower()
+        entry = self._users.get(user)
+        if entry is None or not entry.loaded:
+            await self._load(user)
+            entry = self._users.get(user)
+        with self._lock:
+            s = _merge(_empty(), entry.stats) if entry else _empty()
+        n = s["detected_frames"]
+        return {
+            "sessions": s["sessions"],
+            "frames": s["frames"],
+            "reps": s["reps"],
+            "total_reps": sum(s["reps"].values()),
+            "avg_posture_score": round(s["posture_score_sum"] / n, 3) if n else None,
+            "risk_distribution": {k: round(v / n, 3) for k, v in s["risk"].items()} if n else s["risk"],
+            "time_under_tension_sec": {k: round(v / 1000, 1) for k, v in s["tut_ms"].items()},
+            "total_time_under_tension_sec": round(sum(s["tut_ms"].values()) / 1000, 1),
+            "last_active": s["last_active"],
+            "persisted": bool(entry and entry.loaded),
+        }
+
+    # --- persistence ---
+
+    async def _load(self, user: str) -> bool:
+        users = get_storage().users
+        try:
+            doc = await guarded(lambda: users.find_by_email(user))
+        except (asyncio.TimeoutError, DatabaseUnavailable):
+            return False
+        except Exception as e:
+            print(f"Aggregate load failed for {user}: {e}")
+            return False
+        with self._lock:
+            entry = self._users.get(user)
+            if entry is None:
+                entry = self._users[user] = _Entry()
+            if not entry.loaded:
+                _merge(entry.stats, (doc or {}).get("stats") or {})
+                entry.loaded = True
+        return True
+
+    async def flush(self):
+        """Write dirty users' totals. Users whose stored totals couldn't be loaded yet are retried later."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        users = get_storage().users
+        for user in dirty:
+            entry = self._users.get(user)
+            if entry is None:
+                continue
+            if not entry.loaded and not await self._load(user):
+                with self._lock:
+                    self._dirty.add(user)
+                continue
+            with self._lock:
+                snapshot = _merge(_empty(), entry.stats)
+            try:
+                await guarded(lambda: users.update(user, {"stats": snapshot}))
+            except (asyncio.TimeoutError, DatabaseUnavailable):
+                with self._lock:
+                    self._dirty.add(user)
+            except Exception as e:
+                print(f"Aggregate flush failed for {user}: {e}")
+                with self._lock:
+                    self._dirty.add(user)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Aggregate flush error: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
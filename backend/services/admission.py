@@ -0,0 +1,121 @@
+"""
+Per-device admission control for IoT ingest.
+Token bucket per device (tokens = readings) plus batch/body size caps, so one
+misbehaving device is shed cheaply instead of starving other routes.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Sustained readings/sec per device, and how far a device may burst above it
+_RATE = float(os.getenv("IOT_RATE_PER_DEVICE", "200"))
+_BURST = float(os.getenv("IOT_BURST_PER_DEVICE", "500"))
+MAX_BATCH = int(os.getenv("IOT_MAX_BATCH", "500"))
+# ~200 bytes per JSON reading; rejects oversized bodies before they are read
+MAX_BODY_BYTES = int(os.getenv("IOT_MAX_BODY_BYTES", str(MAX_BATCH * 400)))
+# Devices with a bucket / counters; the least recently seen are dropped beyond this.
+# An idle bucket refills to `burst` within burst/rate seconds, so dropping it loses nothing.
+_MAX_DEVICES = int(os.getenv("IOT_MAX_TRACKED_DEVICES", "10000"))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, n: float = 1.0) -> float:
+        """Consume n tokens. Returns 0 on success, else seconds until n would be available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if n <= self.tokens:
+            self.tokens -= n
+            return 0.0
+        if n > self.capacity:
+            return math.inf
+        return (n - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Called from async routes on the event loop, so no locking is needed."""
+
+    _instance: Optional["AdmissionController"] = None
+
+    @classmethod
+    def get_instance(cls) -> "AdmissionController":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, rate: float = _RATE, burst: float = _BURST, max_devices: int = _MAX_DEVICES):
+        self.rate = rate
+        self.burst = burst
+        self.max_devices = max_devices
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._stats: "OrderedDict[str, dict]" = OrderedDict()
+        self.evicted = 0
+
+    def _bounded(self, entries: OrderedDict, device_id: str, create):
+        """Entry for device_id (created if missing), marked most recently used; evicts beyond max_devices."""
+        entry = entries.get(device_id)
+        if entry is None:
+            entry = entries[device_id] = create()
+            while len(entries) > self.max_devices:
+                entries.popitem(last=False)
+                if entries is self._buckets:
+                    self.evicted += 1
+        else:
+            entries.move_to_end(device_id)
+        return entry
+
+    def _bucket(self, device_id: str) -> TokenBucket:
+        return self._bounded(self._buckets, device_id, lambda: TokenBucket(self.rate, self.burst))
+
+    def _stat(self, device_id: str) -> dict:
+        return self._bounded(self._stats, device_id, lambda: {"accepted": 0, "rate_limited": 0, "oversized": 0})
+
+    def admit(self, counts: dict[str, int]) -> float:
+        """
+        Charge readings per device. Returns 0 if admitted, else Retry-After seconds.
+        All-or-nothing: a rejected batch charges no device.
+        """
+        waits, buckets = {}, {}
+        for device_id, n in counts.items():
+            bucket = buckets[device_id] = self._bucket(device_id)
+            wait = bucket.take(n)
+            if wait:
+                waits[device_id] = wait
+        if waits:
+            for device_id, n in counts.items():
+                if device_id not in waits:
+                    buckets[device_id].tokens += n  # refund
+                self._stat(device_id)["rate_limited"] += n
+            return max(waits.values())
+        for device_id, n in counts.items():
+            self._stat(device_id)["accepted"] += n
+        return 0.0
+
+    def record_oversized(self, device_id: str, n: int = 1):
+        self._stat(device_id)["oversized"] += n
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_device": self.rate,
+            "burst_per_device": self.burst,
+            "max_batch": MAX_BATCH,
+            "tracked_devices": len(self._buckets),
+            "max_tracked_devices": self.max_devices,
+            "evicted_devices": self.evicted,
+            "devices": dict(self._stats),
+        }
+
+    def clear(self):
+        self._buckets.clear()
+        self._stats.clear()
+        self.evicted = 0
@@ -0,0 +1,64 @@
+"""
+Dashboard summary: health, devices, device risk, recent readings and the user's
+activity aggregates in one payload. Every part is read from state maintained
+incrementally elsewhere, so the cost does not grow with a user's history.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from db.mongo import breaker
+from services.activity_aggregates import ActivityAggregates
+from services.device_registry import DeviceRegistry
+from services.injury_predictor import InjuryPredictorService
+from services.iot_simulator import IoTDataStore
+from services.profile_cache import ProfileCache
+
+_DEFAULT_DEVICE = "esp32-demo-1"
+_RISK_CACHE_SIZE = int(os.getenv("DASHBOARD_RISK_CACHE_SIZE", "1000"))
+# device_id -> (store version, risk), LRU; recomputed only after new readings arrive
+_risk_cache: OrderedDict[str, tuple[int, dict]] = OrderedDict()
+# /risk runs in the threadpool, the summary on the event loop
+_risk_lock = threading.Lock()
+
+
+def device_risk(device_id: str) -> dict:
+    """Risk for the device's recent readings, cached until its next reading."""
+    version = IoTDataStore.version(device_id)
+    with _risk_lock:
+        cached = _risk_cache.get(device_id)
+        if cached and cached[0] == version:
+            _risk_cache.move_to_end(device_id)
+            return cached[1]
+    result = InjuryPredictorService.get_instance().predict_from_sensor_data(
+        IoTDataStore.get_recent(device_id), IoTDataStore.get_gait(device_id),
+    )
+    with _risk_lock:
+        _risk_cache[device_id] = (version, result)
+        _risk_cache.move_to_end(device_id)
+        while len(_risk_cache) > _RISK_CACHE_SIZE:
+            _risk_cache.popitem(last=False)
+    return result
+
+
+async def build_summary(user: Optional[str], device_id: Optional[str] = None, history_limit: int = 50) -> dict:
+    devices = DeviceRegistry.get_instance().list_devices(limit=100)
+    if not device_id and user:
+        profile = ProfileCache.get_instance().get(user)
+        device_id = ((profile or {}).get("settings") or {}).get("default_device")
+    device_id = device_id or (devices[0]["id"] if devices else _DEFAULT_DEVICE)
+    return {
+        "health": {
+            "status": "healthy",
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": breaker.stats(),
+        },
+        "devices": devices,
+        "connected_devices": sum(1 for d in devices if d["connected"]),
+        "device_id": device_id,
+        "risk": device_risk(device_id),
+        "history": IoTDataStore.get_recent(device_id, history_limit),
+        "activity": await ActivityAggregates.get_instance().summary(user) if user else None,
+    }
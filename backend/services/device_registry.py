@@ -0,0 +1,131 @@
+"""
+Device registry: in-memory presence tracking with coalesced persistence.
+Ingest only touches memory; dirty devices are flushed in one bulk write per interval.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+from db.mongo import guarded
+from db.storage import get_storage
+
+_FLUSH_INTERVAL = float(os.getenv("DEVICE_FLUSH_INTERVAL_SEC", "5"))
+_FIELDS = ("id", "name", "type", "connected", "last_seen")
+
+
+class DeviceRegistry:
+    _instance: Optional["DeviceRegistry"] = None
+
+    @classmethod
+    def get_instance(cls) -> "DeviceRegistry":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._devices: dict[str, dict] = {}
+        self._dirty: set[str] = set()
+        # Routes touching the registry run both on the event loop and in the threadpool
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # --- in-memory operations (hot path, no I/O) ---
+
+    def upsert(self, info: dict) -> dict:
+        doc = {k: info.get(k) for k in _FIELDS}
+        with self._lock:
+            self._devices[doc["id"]] = doc
+            self._dirty.add(doc["id"])
+        return dict(doc)
+
+    def set_connected(self, device_id: str, connected: bool) -> bool:
+        with self._lock:
+            d = self._devices.get(device_id)
+            if d is None:
+                return False
+            d["connected"] = connected
+            self._dirty.add(device_id)
+        return True
+
+    def touch(self, device_id: str, seen_at: Optional[str] = None) -> bool:
+        """Record activity from ingest for a registered device; unknown ids are ignored (False)."""
+        seen_at = seen_at or datetime.utcnow().isoformat()
+        with self._lock:
+            d = self._devices.get(device_id)
+            if d is None:
+                return False
+            d["last_seen"] = seen_at
+            self._dirty.add(device_id)
+        return True
+
+    def get(self, device_id: str) -> Optional[dict]:
+        d = self._devices.get(device_id)
+        return dict(d) if d else None
+
+    def list_devices(
+        self,
+        connected: Optional[bool] = None,
+        device_type: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 100,
+    ) -> list:
+        with self._lock:
+            items = list(self._devices.values())
+        if connected is not None:
+            items = [d for d in items if d["connected"] == connected]
+        if device_type:
+            items = [d for d in items if d["type"] == device_type]
+        items.sort(key=lambda d: d["id"])
+        return [dict(d) for d in items[offset:offset + limit]]
+
+    # --- persistence ---
+
+    async def load(self):
+        """Populate from storage at startup. Registry stays in-memory only if the DB is down."""
+        try:
+            devices = get_storage().devices
+            docs = await guarded(devices.all, timeout=5.0)
+        except Exception as e:
+            print(f"Device registry load skipped: {e}")
+            return
+        with self._lock:
+            for doc in docs:
+                if doc.get("id") and doc["id"] not in self._devices:
+                    self._devices[doc["id"]] = {k: doc.get(k) for k in _FIELDS}
+
+    async def flush(self):
+        """Write every device changed since the last flush in one bulk upsert."""
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            docs = [dict(self._devices[i]) for i in dirty if i in self._devices]
+        try:
+            devices = get_storage().devices
+            await guarded(lambda: devices.upsert_many(docs), timeout=5.0)
+        except Exception as e:
+            print(f"Device registry flush failed: {e}")
+            with self._lock:
+                self._dirty |= dirty
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
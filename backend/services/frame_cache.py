@@ -0,0 +1,122 @@
+"""
+LRU cache of frame analysis results keyed by a hash of the uploaded image bytes
+and the stream (posture session) they belong to.
+Retried uploads and frames the webcam page sends twice are answered from it, and
+concurrent requests for the same bytes share one analysis (single flight).
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+_MAX_ENTRIES = int(os.getenv("FRAME_CACHE_SIZE", "256"))
+
+
+def frame_key(data, stream: Optional[str] = None) -> bytes:
+    """128-bit BLAKE2b digest of raw image bytes (or a contiguous numpy buffer) and their stream."""
+    h = hashlib.blake2b(data, digest_size=16)
+    if stream:
+        h.update(b"\0" + stream.encode())
+    return h.digest()
+
+
+class FrameCache:
+    _instance: Optional["FrameCache"] = None
+
+    @classmethod
+    def get_instance(cls) -> "FrameCache":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, dict] = OrderedDict()
+        self._inflight: dict[bytes, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.collapsed = 0  # served by an analysis already running for the same bytes
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                return None
+            self._entries.move_to_end(key)
+        return dict(result)
+
+    def put(self, key: bytes, result: dict):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, key: bytes, compute: Callable[[], Awaitable[dict]]) -> tuple[dict, bool]:
+        """
+        Cached result for key, or the result of an in-flight compute for the same key,
+        or compute() run here, and whether it was one of the first two (a duplicate).
+        Results carrying an "error" are not cached.
+        """
+        with self._lock:
+            self.requests += 1
+        while True:
+            result = self.get(key)
+            if result is not None:
+                with self._lock:
+                    self.hits += 1
+                return result, True
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            try:
+                result = await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if fut.cancelled():
+                    continue  # the request running it went away; run it here instead
+                raise
+            with self._lock:
+                self.collapsed += 1
+            return dict(result), True
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if "error" not in result:
+            self.put(key, result)
+        fut.set_result(result)
+        return dict(result), False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests, hits, collapsed = self.requests, self.hits, self.collapsed
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "requests": requests,
+            "hits": hits,
+            "collapsed": collapsed,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / requests, 3) if requests else 0.0,
+            "duplicate_rate": round((hits + collapsed) / requests, 3) if requests else 0.0,
+        }
@@ -0,0 +1,125 @@
+"""
+Streaming gait analysis from wearable accelerometer data.
+Tracks cadence and step asymmetry with a sliding DFT over accel magnitude,
+so each new sample costs a fixed number of bin updates (no FFT per poll).
+Pure Python on purpose: runs in the light deployment without numpy.
+"""
+import cmath
+import math
+import threading
+from datetime import datetime
+from typing import Optional
+
+# Nominal sample rate until timestamps tell us otherwise (ESP32 at 100 Hz)
+_DEFAULT_HZ = 100.0
+# Analysis window length in seconds (~2-5 strides)
+_WINDOW_SEC = 5.0
+_MIN_WINDOW, _MAX_WINDOW = 16, 1024
+# Step frequency band (Hz); stride bins at half of it are tracked too
+_STEP_BAND = (1.0, 3.5)
+# Damping for the stabilized SDFT (keeps float error from accumulating)
+_R = 0.9999
+# Re-tune the window when the measured rate drifts this far from the configured one
+_RATE_TOLERANCE = 0.25
+
+
+def _parse_ts(ts) -> Optional[float]:
+    if not ts or not isinstance(ts, str):
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class GaitAnalyzer:
+    """Sliding DFT over |accel| for one device. update() is O(tracked bins)."""
+
+    def __init__(self, sample_hz: float = _DEFAULT_HZ):
+        self._lock = threading.Lock()
+        self._rate = sample_hz
+        self._dt_avg: Optional[float] = None
+        self._last_ts: Optional[float] = None
+        self._configure(sample_hz)
+
+    def _configure(self, sample_hz: float):
+        """(Re)build window and bin set for a sample rate. O(N), only on rate changes."""
+        n = int(round(sample_hz * _WINDOW_SEC))
+        n = max(_MIN_WINDOW, min(_MAX_WINDOW, n))
+        self._hz = sample_hz
+        self._n = n
+        self._buf = [0.0] * n
+        self._pos = 0
+        self._count = 0
+        self._since_config = 0
+        nyquist = sample_hz / 2
+        k_lo = max(1, int(math.floor(_STEP_BAND[0] / 2 * n / sample_hz)))
+        k_hi = max(k_lo, min(n // 2, int(math.ceil(min(_STEP_BAND[1], nyquist) * n / sample_hz))))
+        self._k_lo = k_lo
+        self._bins = [0j] * (k_hi - k_lo + 1)
+        self._twiddle = [_R * cmath.exp(2j * math.pi * k / n) for k in range(k_lo, k_hi + 1)]
+        self._r_n = _R ** n
+
+    def _track_rate(self, ts: Optional[float]):
+        if ts is None:
+            return
+        last, self._last_ts = self._last_ts, ts
+        if last is None:
+            return
+        dt = ts - last
+        if dt <= 0 or dt > 1.0:
+            # Batched uploads share a timestamp; gaps mean the device paused
+            return
+        self._dt_avg = dt if self._dt_avg is None else 0.95 * self._dt_avg + 0.05 * dt
+        self._rate = 1.0 / self._dt_avg
+
+    def update(self, accel: list, timestamp: Optional[str] = None):
+        """Feed one accelerometer sample."""
+        x = math.sqrt(accel[0] * accel[0] + accel[1] * accel[1] + accel[2] * accel[2])
+        ts = _parse_ts(timestamp)
+        with self._lock:
+            self._track_rate(ts)
+            self._since_config += 1
+            if self._since_config >= _MIN_WINDOW and abs(self._rate - self._hz) > _RATE_TOLERANCE * self._hz:
+                self._configure(self._rate)
+            if not math.isfinite(x):
+                # NaN/inf would stay in every bin for good: hold the previous sample instead
+                x = self._buf[self._pos - 1] if self._count else 0.0
+            old = self._buf[self._pos]
+            self._buf[self._pos] = x
+            self._pos = (self._pos + 1) % self._n
+            if self._count < self._n:
+                self._count += 1
+            delta = x - self._r_n * old
+            bins, tw = self._bins, self._twiddle
+            for i in range(len(bins)):
+                bins[i] = (bins[i] + delta) * tw[i]
+
+    def snapshot(self) -> dict:
+        """Current cadence / asymmetry estimate. O(tracked bins)."""
+        with self._lock:
+            mags = [abs(b) for b in self._bins]
+            n, hz, k_lo, count = self._n, self._hz, self._k_lo, self._count
+        if count < n or not mags:
+            return {"ready": False, "cadence_spm": 0.0, "step_asymmetry": 0.0, "gait_confidence": 0.0}
+
+        step_lo = max(k_lo, int(math.floor(_STEP_BAND[0] * n / hz)))
+        step_range = range(step_lo - k_lo, len(mags))
+        if not step_range:
+            return {"ready": False, "cadence_spm": 0.0, "step_asymmetry": 0.0, "gait_confidence": 0.0}
+        peak = max(step_range, key=lambda i: mags[i])
+        k_step = peak + k_lo
+        step_amp = mags[peak]
+        total = sum(mags[i] for i in step_range)
+
+        # Left/right differences show up as energy at the stride frequency (half the step rate)
+        half = int(round(k_step / 2)) - k_lo
+        stride_amp = mags[half] if 0 <= half < len(mags) else 0.0
+        asymmetry = min(1.0, stride_amp / step_amp) if step_amp > 1e-9 else 0.0
+
+        return {
+            "ready": True,
+            "cadence_spm": round(k_step * hz / n * 60, 1),
+            "step_asymmetry": round(asymmetry, 3),
+            "gait_confidence": round(step_amp / total, 3) if total > 1e-9 else 0.0,
+        }
@@ -16,7 +16,9 @@ class InjuryPredictorService:
             cls._instance = cls()
         return cls._instance
 
-    def predict_from_sensor_data(self, readings: list) -> dict:
+    def predict_from_sensor_data(self, readings: list, gait: Optional[dict] = None) -> dict:
+        """Risk from recent readings; `gait` is the streaming snapshot from GaitAnalyzer."""
+        gait = gait if gait and gait.get("ready") else None
         if not readings:
             return {
                 "risk_level": "low",
@@ -26,12 +28,14 @@ class InjuryPredictorService:
                 "knee_stress": 0,
                 "fatigue_index": 0,
                 "stride_imbalance": 0,
+                "cadence_spm": 0,
+                "step_asymmetry": 0,
             }
 
         # Compute metrics from accel/gyro
         knee_stress = self._estimate_knee_stress(readings)
         fatigue = self._estimate_fatigue(readings)
-        imbalance = self._estimate_stride_imbalance(readings)
+        imbalance = self._estimate_stride_imbalance(readings, gait)
 
         risk_score = min(1.0, (knee_stress * 0.4 + fatigue * 0.4 + imbalance * 0.2))
         alerts = []
@@ -55,6 +59,11 @@ class InjuryPredictorService:
             alerts.append({"type": "warning", "msg": "Stride imbalance detected"})
             recommendations.append("Focus on symmetrical movement. Single-leg drills may help.")
 
+        if gait and gait["cadence_spm"] > 0 and gait["gait_confidence"] > 0.3 and knee_stress > 0.5:
+            if gait["cadence_spm"] < 150:
+                # Low cadence with high impact = overstriding
+                recommendations.append("Shorten your stride and increase cadence to reduce impact.")
+
         if not alerts:
             alerts.append({"type": "info", "msg": "Movement patterns look good"})
 
@@ -68,6 +77,8 @@ class InjuryPredictorService:
             "knee_stress": round(knee_stress, 3),
             "fatigue_index": round(fatigue, 3),
             "stride_imbalance": round(imbalance, 3),
+            "cadence_spm": gait["cadence_spm"] if gait else 0,
+            "step_asymmetry": gait["step_asymmetry"] if gait else 0,
         }
 
     def _estimate_knee_stress(self, readings: list) -> float:
@@ -98,7 +109,10 @@ class InjuryPredictorService:
             return max(0, min(1.0, decay))
         return 0.3
 
-    def _estimate_stride_imbalance(self, readings: list) -> float:
+    def _estimate_stride_imbalance(self, readings: list, gait: Optional[dict] = None) -> float:
+        if gait and gait["gait_confidence"] > 0.3:
+            # Stride-frequency energy relative to step frequency (harmonic ratio)
+            return gait["step_asymmetry"]
         if len(readings) < 10:
             return 0.2
         # Left vs right asymmetry from accel X
@@ -1,25 +1,77 @@
 """In-memory store for IoT sensor data (ESP32/MPU6050)."""
-from collections import deque
+import os
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+from services.gait_analyzer import GaitAnalyzer
+from services.sensor_blocks import DeviceHistory, ts_ms
+
+# Uncompressed tail per device (what /risk and /history read)
 _MAX_PER_DEVICE = 500
-_data: dict[str, deque] = {}
+# Older readings are sealed into compressed blocks of this many readings
+_BLOCK_SIZE = int(os.getenv("IOT_BLOCK_SIZE", "1024"))
+# Compressed blocks kept per device (default ~1 h at 100 Hz); 0 keeps only the hot tail
+_MAX_BLOCKS = int(os.getenv("IOT_HISTORY_BLOCKS", "352"))
+# Devices with retained history; the least recently active beyond this are dropped (same bound as admission)
+_MAX_DEVICES = int(os.getenv("IOT_MAX_TRACKED_DEVICES", "10000"))
+_data: "OrderedDict[str, DeviceHistory]" = OrderedDict()
+_gait: dict[str, GaitAnalyzer] = {}
+# add() runs in worker threads (ingest stores off the event loop)
+_lock = threading.Lock()
 
 
 class IoTDataStore:
     @staticmethod
     def add(device_id: str, reading: dict):
-        if device_id not in _data:
-            _data[device_id] = deque(maxlen=_MAX_PER_DEVICE)
-        _data[device_id].append(reading)
+        with _lock:
+            history = _data.get(device_id)
+            if history is None:
+                history = _data[device_id] = DeviceHistory(_MAX_PER_DEVICE, _BLOCK_SIZE, _MAX_BLOCKS)
+                _gait[device_id] = GaitAnalyzer()
+                while len(_data) > _MAX_DEVICES:
+                    evicted, _ = _data.popitem(last=False)
+                    _gait.pop(evicted, None)
+            else:
+                _data.move_to_end(device_id)
+            gait = _gait[device_id]
+        history.append(reading)
+        gait.update(reading["accel"], reading.get("timestamp"))
 
     @staticmethod
     def get_recent(device_id: str, limit: int = 100) -> list:
         if device_id not in _data:
             return []
-        items = list(_data[device_id])
-        return items[-limit:]
+        return _data[device_id].recent(limit)
+
+    @staticmethod
+    def iter_readings(device_id: str, start: Optional[str] = None, end: Optional[str] = None):
+        """Retained readings oldest first; compressed blocks outside [start, end) are skipped, not decoded."""
+        history = _data.get(device_id)
+        if history is None:
+            return iter(())
+        return history.iter_range(ts_ms(start), ts_ms(end))
+
+    @staticmethod
+    def version(device_id: str) -> int:
+        """Number of readings ever added for the device (0 if unknown); changes on every add."""
+        history = _data.get(device_id)
+        return history.appended if history else 0
+
+    @staticmethod
+    def get_gait(device_id: str) -> Optional[dict]:
+        """Streaming cadence/asymmetry snapshot, or None for unknown devices."""
+        g = _gait.get(device_id)
+        return g.snapshot() if g else None
+
+    @staticmethod
+    def stats() -> dict:
+        with _lock:
+            items = list(_data.items())
+        return {device_id: h.stats() for device_id, h in items}
 
     @staticmethod
     def clear():
-        _data.clear()
+        with _lock:
+            _data.clear()
+            _gait.clear()
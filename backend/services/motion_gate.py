@@ -0,0 +1,107 @@
+"""
+Motion gate per stream (posture session). Each uploaded frame is decoded at 1/8
+scale in grayscale (cheap for JPEG: libjpeg skips most of the IDCT) and compared
+with the frame the stream's last analysis was computed from. Below the motion
+threshold that analysis is reused, up to a maximum age, so static holds such as
+planks skip decoding and pose detection almost entirely.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+ENABLED = os.getenv("POSE_GATE", "1") != "0"
+# Mean absolute difference (0-255 grey levels) below which a frame counts as unchanged
+_THRESHOLD = float(os.getenv("POSE_GATE_THRESHOLD", "3.0"))
+# Long enough to span a few of the Coach page's 1.5 s captures
+_MAX_AGE_SEC = float(os.getenv("POSE_GATE_MAX_AGE_SEC", "5.0"))
+_MAX_STREAMS = int(os.getenv("POSE_MAX_STREAMS", "1000"))
+
+
+def small_gray(nparr):
+    """1/8-scale grayscale decode of an encoded image, or None."""
+    import cv2
+    return cv2.imdecode(nparr, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+
+
+class FrameGate:
+    __slots__ = ("lock", "reference", "result", "t")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reference = None  # small grayscale frame the cached result was computed from
+        self.result: Optional[dict] = None
+        self.t = 0.0
+
+
+class MotionGate:
+    _instance: Optional["MotionGate"] = None
+
+    @classmethod
+    def get_instance(cls) -> "MotionGate":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, threshold: float = _THRESHOLD, max_age: float = _MAX_AGE_SEC,
+                 max_streams: int = _MAX_STREAMS):
+        self.threshold = threshold
+        self.max_age = max_age
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, FrameGate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"reused": 0, "motion": 0, "expired": 0, "no_reference": 0}
+
+    def _gate(self, stream: str) -> FrameGate:
+        with self._lock:
+            gate = self._streams.get(stream)
+            if gate is None:
+                gate = self._streams[stream] = FrameGate()
+                while len(self._streams) > self.max_streams:
+                    self._streams.popitem(last=False)
+            else:
+                self._streams.move_to_end(stream)
+            return gate
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def check(self, stream: str, small) -> Optional[dict]:
+        """The stream's previous result if `small` hasn't changed enough since it was computed."""
+        import cv2
+        gate = self._gate(stream)
+        with gate.lock:
+            ref, result, t = gate.reference, gate.result, gate.t
+        if ref is None or result is None or ref.shape != small.shape:
+            self._count("no_reference")
+            return None
+        if time.monotonic() - t > self.max_age:
+            self._count("expired")
+            return None
+        if float(cv2.absdiff(ref, small).mean()) >= self.threshold:
+            self._count("motion")
+            return None
+        self._count("reused")
+        return {**result, "reused": True}
+
+    def store(self, stream: str, small, result: dict):
+        gate = self._gate(stream)
+        with gate.lock:
+            gate.reference, gate.result, gate.t = small, result, time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self._counts)
+            streams = len(self._streams)
+        frames = sum(c.values())
+        return {
+            "enabled": ENABLED,
+            "threshold": self.threshold,
+            "max_age_sec": self.max_age,
+            "streams": streams,
+            "frames": frames,
+            **c,
+            "reuse_ratio": round(c["reused"] / frames, 3) if frames else None,
+        }
@@ -0,0 +1,156 @@
+"""
+Keyframe pose tracking per stream (posture session). The pose model runs only on
+keyframes; landmarks for the frames in between are carried forward with sparse
+Lucas-Kanade optical flow on a small grayscale copy of the frame. The keyframe
+interval adapts to motion (fast movement shortens it, stillness lengthens it),
+and a keyframe is forced whenever too many landmarks are lost by the flow.
+cv2/numpy are imported lazily, like in posture_analyzer.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+ENABLED = os.getenv("POSE_TRACKING", "1") != "0"
+_K_MIN = max(1, int(os.getenv("POSE_KEYFRAME_MIN", "2")))
+_K_MAX = max(_K_MIN, int(os.getenv("POSE_KEYFRAME_MAX", "8")))
+_MAX_STREAMS = int(os.getenv("POSE_MAX_STREAMS", "1000"))
+# A stream's previous frame is too old to track from after this gap (so the Coach page's
+# 1.5 s captures are all keyframes: LK flow doesn't follow a body across gaps that long)
+_STALE_SEC = float(os.getenv("POSE_TRACK_STALE_SEC", "1.0"))
+# Landmarks are carried by the flow for at most this long after a keyframe, whatever the frame rate
+_MAX_TRACK_SEC = float(os.getenv("POSE_TRACK_MAX_SEC", "1.0"))
+_TRACK_WIDTH = 320  # optical flow runs on a grayscale frame this wide
+_MIN_TRACKED = 0.7  # fraction of landmarks the flow must follow, else re-detect
+_MAX_LK_ERROR = 20.0
+# Median landmark speed (fraction of frame width per frame) that shortens / lengthens the interval
+_FAST, _SLOW = 0.02, 0.005
+
+
+def _small_gray(img):
+    import cv2
+    h, w = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if w > _TRACK_WIDTH:
+        gray = cv2.resize(gray, (_TRACK_WIDTH, round(h * _TRACK_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+class StreamTracker:
+    """Tracking state for one stream. step() is called with frames in arrival order."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.gray = None  # previous frame, small grayscale
+        self.pts = None  # (33, 2) float32 landmark positions in self.gray pixels
+        self.z = None
+        self.k = _K_MIN
+        self.since_key = 0
+        self.t = 0.0
+        self.key_t = 0.0  # when the last keyframe was detected
+
+    def step(self, img, detect: Callable) -> tuple[Optional[list], bool]:
+        """
+        Landmarks ([[x, y, z]] * 33, normalized) for a BGR frame, and whether the
+        pose model ran. detect(bgr) runs the model and returns landmarks or None.
+        """
+        import cv2
+        import numpy as np
+
+        now = time.monotonic()
+        gray = _small_gray(img)
+        stale = now - self.t > _STALE_SEC or now - self.key_t > _MAX_TRACK_SEC
+        self.t = now
+        if (self.pts is None or stale or self.since_key + 1 >= self.k
+                or self.gray is None or self.gray.shape != gray.shape):
+            return self._keyframe(img, gray, detect), True
+
+        tracking = PoseTracking.get_instance()
+        new, status, err = cv2.calcOpticalFlowPyrLK(
+            self.gray, gray, self.pts.reshape(-1, 1, 2), None, winSize=(15, 15), maxLevel=2,
+        )
+        ok = (status.ravel() == 1) & (err.ravel() < _MAX_LK_ERROR)
+        if ok.mean() < _MIN_TRACKED:
+            tracking.count("lost")
+            return self._keyframe(img, gray, detect), True
+        new = new.reshape(-1, 2)
+        new[~ok] = self.pts[~ok]
+        motion = float(np.median(np.linalg.norm(new[ok] - self.pts[ok], axis=1))) / gray.shape[1]
+        if motion > _FAST:
+            self.k = max(_K_MIN, self.k // 2)
+        elif motion < _SLOW:
+            self.k = min(_K_MAX, self.k + 1)
+        self.pts, self.gray = new, gray
+        self.since_key += 1
+        tracking.count("tracked")
+        return self._landmarks(), False
+
+    def _keyframe(self, img, gray, detect) -> Optional[list]:
+        import numpy as np
+        PoseTracking.get_instance().count("keyframes")
+        pts = detect(img)
+        self.gray, self.since_key, self.key_t = gray, 0, self.t
+        if pts is None:
+            self.pts = None
+            return None
+        arr = np.asarray(pts, dtype=np.float32)
+        h, w = gray.shape
+        self.pts = arr[:, :2] * np.array([w, h], dtype=np.float32)
+        self.z = arr[:, 2].copy()
+        return pts
+
+    def pose(self, max_age: float) -> Optional[list]:
+        """Last known landmarks (normalized), or None if there are none or they are older than max_age seconds."""
+        if self.pts is None or self.gray is None or time.monotonic() - self.t > max_age:
+            return None
+        return self._landmarks()
+
+    def _landmarks(self) -> list:
+        h, w = self.gray.shape
+        return [[float(x / w), float(y / h), float(z)] for (x, y), z in zip(self.pts, self.z)]
+
+
+class PoseTracking:
+    """Bounded registry of per-stream trackers (least recently used streams are dropped)."""
+
+    _instance: Optional["PoseTracking"] = None
+
+    @classmethod
+    def get_instance(cls) -> "PoseTracking":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_streams: int = _MAX_STREAMS):
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, StreamTracker]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"keyframes": 0, "tracked": 0, "lost": 0}
+
+    def get(self, stream: str) -> StreamTracker:
+        with self._lock:
+            tracker = self._streams.get(stream)
+            if tracker is None:
+                tracker = self._streams[stream] = StreamTracker()
+                while len(self._streams) > self.max_streams:
+                    self._streams.popitem(last=False)
+            else:
+                self._streams.move_to_end(stream)
+            return tracker
+
+    def count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self._counts)
+            streams = len(self._streams)
+        frames = c["keyframes"] + c["tracked"]
+        return {
+            "enabled": ENABLED,
+            "streams": streams,
+            **c,
+            "keyframe_ratio": round(c["keyframes"] / frames, 3) if frames else None,
+        }
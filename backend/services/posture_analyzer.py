@@ -3,12 +3,26 @@ Posture analysis using MediaPipe landmarks.
 Heavy deps (cv2, numpy, mediapipe) are lazy-loaded so the app can run without them (e.g. free-tier deploy).
 """
 import math
+import os
 from pathlib import Path
 from typing import Optional, Union
 import asyncio
 
+from services import motion_gate, pose_tracker
+from services.frame_cache import FrameCache, frame_key
+from services.motion_gate import MotionGate
+from services.pose_tracker import PoseTracking
+
 # No top-level cv2/numpy/mediapipe - they are imported only when needed in _analyze_frame_sync
 
+# JPEGs are decoded at 1/2 or 1/4 scale while the long side stays at least this large
+_DECODE_MIN_SIDE = int(os.getenv("POSE_DECODE_MIN_SIDE", "480"))
+# Padding around the previous pose's bounding box, as a fraction of its larger side
+_ROI_PAD = 0.3
+_ROI_MAX_AREA = 0.8  # fraction of the frame above which cropping isn't worth it
+# Previous poses older than this aren't used to crop (the whole frame is searched if the crop misses)
+_ROI_MAX_AGE_SEC = float(os.getenv("POSE_ROI_MAX_AGE_SEC", "3.0"))
+
 # MediaPipe Pose landmark indices
 # https://developers.google.com/mediapipe/solutions/vision/pose_landmarker
 LANDMARKS = {
@@ -54,6 +68,53 @@ def _ml_unavailable_response() -> dict:
     }
 
 
+def _jpeg_size(buf) -> Optional[tuple]:
+    """(width, height) from a JPEG's frame header, or None if buf isn't a JPEG."""
+    buf = memoryview(buf)
+    if bytes(buf[:2]) != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(buf):
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):  # SOFn
+            return int.from_bytes(buf[i + 7:i + 9], "big"), int.from_bytes(buf[i + 5:i + 7], "big")
+        i += 2 + int.from_bytes(buf[i + 2:i + 4], "big")
+    return None
+
+
+def _decode(nparr):
+    """BGR frame, decoded by libjpeg at 1/2 or 1/4 scale when the JPEG is large."""
+    import cv2
+    flag = cv2.IMREAD_COLOR
+    size = _jpeg_size(nparr)
+    if size:
+        for factor, reduced in ((4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if max(size) / factor >= _DECODE_MIN_SIDE:
+                flag = reduced
+                break
+    return cv2.imdecode(nparr, flag)
+
+
+def _roi(pose: Optional[list], w: int, h: int) -> Optional[tuple]:
+    """Padded, square-ish (x0, y0, x1, y1) pixel box around a normalized pose, or None for the whole frame."""
+    if not pose:
+        return None
+    xs = [min(max(p[0], 0.0), 1.0) * w for p in pose]
+    ys = [min(max(p[1], 0.0), 1.0) * h for p in pose]
+    cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+    side = max(max(xs) - min(xs), max(ys) - min(ys)) * (1 + 2 * _ROI_PAD)
+    x0, x1 = max(0, int(cx - side / 2)), min(w, int(cx + side / 2) + 1)
+    y0, y1 = max(0, int(cy - side / 2)), min(h, int(cy + side / 2) + 1)
+    if (x1 - x0) < 32 or (y1 - y0) < 32 or (x1 - x0) * (y1 - y0) > _ROI_MAX_AREA * w * h:
+        return None
+    return x0, y0, x1, y1
+
+
 class PostureAnalyzerService:
     _instance: Optional["PostureAnalyzerService"] = None
     _landmarker = None  # MediaPipe 0.10 PoseLandmarker (lazy-loaded)
@@ -134,6 +195,11 @@ class PostureAnalyzerService:
 
         pts = [p if len(p) >= 3 else [p[0], p[1], 0] for p in landmarks]
 
+        # Lunge analysis (before squat: a lunge's average knee angle is in the squat range)
+        lunge_result = self._analyze_lunge(pts)
+        if lunge_result:
+            return lunge_result
+
         # Squat analysis
         squat_result = self._analyze_squat(pts)
         if squat_result:
@@ -144,14 +210,75 @@ class PostureAnalyzerService:
         if plank_result:
             return plank_result
 
-        # Lunge analysis
-        lunge_result = self._analyze_lunge(pts)
-        if lunge_result:
-            return lunge_result
-
         # Standing/default
         return self._analyze_standing(pts)
 
+    def analyze_landmarks_batch(self, landmarks) -> dict:
+        """
+        analyze_landmarks for every frame of an (N, 33, 3) array at once (NaN rows:
+        no pose). Returns per-frame arrays: detected, exercise ("" when not detected),
+        injury_risk, posture_score, knee_angle (squats: average, lunges: front
+        knee, NaN otherwise), and under
+        "corrections" a boolean array per correction message.
+        """
+        import numpy as np
+
+        P = np.asarray(landmarks, dtype=np.float64)
+        lm = {name: P[:, i, :2] for name, i in LANDMARKS.items()}
+
+        def angle(a, b, c):
+            v1, v2 = a - b, c - b
+            d = np.arctan2(v1[:, 1], v1[:, 0]) - np.arctan2(v2[:, 1], v2[:, 0])
+            return np.abs(np.degrees(d)) % 360
+
+        detected = ~np.isnan(P[:, :, :2]).any(axis=(1, 2))
+        l_knee = angle(lm["left_hip"], lm["left_knee"], lm["left_ankle"])
+        r_knee = angle(lm["right_hip"], lm["right_knee"], lm["right_ankle"])
+
+        bent, straight = np.minimum(l_knee, r_knee), np.maximum(l_knee, r_knee)
+        lunge = detected & (bent > 70) & (bent < 120) & (straight > 140) & (straight < 180)
+        # Front (bent) knee ahead of its ankle
+        front_dx = np.where(l_knee <= r_knee, lm["left_knee"][:, 0] - lm["left_ankle"][:, 0],
+                            lm["right_knee"][:, 0] - lm["right_ankle"][:, 0])
+        knee_over_toes = lunge & (bent < 100) & (np.abs(front_dx) > 0.1)
+
+        avg_knee = (l_knee + r_knee) / 2
+        squat = detected & ~lunge & (avg_knee > 50) & (avg_knee < 150)
+        too_deep = squat & (avg_knee < 70)
+        asymmetric = squat & (np.abs(l_knee - r_knee) > 15)
+        squat_risk = 0.2 + 0.3 * too_deep + 0.2 * asymmetric
+
+        shoulder_mid = (lm["left_shoulder"] + lm["right_shoulder"]) / 2
+        hip_mid = (lm["left_hip"] + lm["right_hip"]) / 2
+        slope = np.abs(hip_mid[:, 1] - shoulder_mid[:, 1]) / (np.abs(hip_mid[:, 0] - shoulder_mid[:, 0]) + 0.01)
+        plank = detected & ~lunge & ~squat & (slope < 0.5)
+
+        standing = detected & ~squat & ~plank & ~lunge
+        standing_risk = np.minimum(0.5, 0.2 + np.abs(lm["left_shoulder"][:, 1] - lm["right_shoulder"][:, 1]) * 2)
+
+        exercise = np.select([squat, plank, lunge, standing], ["squat", "plank", "lunge", "standing"], "")
+        injury_risk = np.select(
+            [squat, plank, lunge, standing],
+            [np.minimum(1.0, squat_risk), 0.2, np.minimum(1.0, 0.2 + 0.3 * knee_over_toes), standing_risk],
+            0.3,
+        )
+        posture_score = np.select(
+            [squat, plank, lunge, standing], [np.maximum(0.3, 1 - squat_risk), 0.8, 0.7, 0.8], 0.5,
+        )
+        return {
+            "detected": detected,
+            "exercise": exercise,
+            "injury_risk": injury_risk,
+            "posture_score": posture_score,
+            "knee_angle": np.select([squat, lunge], [np.round(avg_knee, 1), np.round(bent, 1)], np.nan),
+            "corrections": {
+                "Knees over toes - push knees out, sit back more": too_deep,
+                "Asymmetry - balance weight evenly": asymmetric,
+                "Keep hips level - avoid sagging or piking": plank & (slope > 0.3),
+                "Front knee over toes - shift weight back": knee_over_toes,
+            },
+        }
+
     def _analyze_squat(self, pts: list) -> Optional[dict]:
         l_hip = _get(pts, "left_hip")
         r_hip = _get(pts, "right_hip")
@@ -230,14 +357,15 @@ class PostureAnalyzerService:
         l_angle = _angle(l_hip, l_knee, l_ankle)
         r_angle = _angle(r_hip, r_knee, r_ankle)
         # Lunge: one leg bent ~90, one straighter
-        bent = max(l_angle, r_angle)
-        straight = min(l_angle, r_angle)
+        bent = min(l_angle, r_angle)
+        straight = max(l_angle, r_angle)
         if 70 < bent < 120 and 140 < straight < 180:
             injury_risk = 0.2
             corrections = []
-            # Knee over toe check
-            if l_angle < 100:
-                kx, ax = l_knee[0], l_ankle[0]
+            # Knee over toe check on the front (bent) leg
+            knee, ankle = (l_knee, l_ankle) if l_angle <= r_angle else (r_knee, r_ankle)
+            if bent < 100:
+                kx, ax = knee[0], ankle[0]
                 if abs(kx - ax) > 0.1:
                     injury_risk += 0.3
                     corrections.append("Front knee over toes - shift weight back")
@@ -248,6 +376,7 @@ class PostureAnalyzerService:
                 "posture_score": 0.7,
                 "feedback": ["Lunge form detected"],
                 "corrections": corrections,
+                "knee_angle": round(bent, 1),  # front knee
             }
         return None
 
@@ -269,12 +398,56 @@ class PostureAnalyzerService:
             "corrections": [],
         }
 
-    async def analyze_frame(self, data: Union[bytes, "np.ndarray"]) -> dict:
-        """Analyze posture from raw image bytes or numpy array. Accepts bytes to avoid requiring numpy at call site."""
+    async def analyze_frame(self, data: Union[bytes, "np.ndarray"], stream: Optional[str] = None) -> tuple[dict, bool]:
+        """
+        Analyze posture from raw image bytes or numpy array. Accepts bytes to avoid requiring numpy at call site.
+        Frames of one stream (e.g. a posture session) passed with its id are tracked between keyframes.
+        Identical bytes on the same stream (retries, resent frames) are answered from FrameCache.
+        Returns (result, duplicate): duplicate is True when the result came from the cache or
+        from an analysis of the same bytes already running, so the frame shouldn't be recorded again.
+        """
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._analyze_frame_sync, data)
+        return await FrameCache.get_instance().get_or_compute(
+            frame_key(data, stream),
+            lambda: loop.run_in_executor(None, self._analyze_frame_sync, data, stream),
+        )
+
+    def _detect(self, landmarker, img, previous: Optional[list] = None) -> Optional[list]:
+        """
+        Run the pose model on a BGR frame: 33 [x, y, z] landmarks, or None if no pose.
+        With the stream's previous pose, only a padded box around it is converted and
+        searched (whole frame if nothing is found there); landmarks stay frame-relative.
+        """
+        h, w = img.shape[:2]
+        roi = _roi(previous, w, h)
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            pts = self._detect_in(landmarker, img[y0:y1, x0:x1])
+            if pts is not None:
+                cw, ch = x1 - x0, y1 - y0
+                return [[(x0 + x * cw) / w, (y0 + y * ch) / h, z * cw / w] for x, y, z in pts]
+        return self._detect_in(landmarker, img)
+
+    def _detect_in(self, landmarker, img) -> Optional[list]:
+        import cv2
+        import numpy as np
+        from mediapipe.tasks.python.vision.core import image as image_lib
 
-    def _analyze_frame_sync(self, data: Union[bytes, "np.ndarray"]) -> dict:
+        rgb = np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        result = landmarker.detect(image_lib.Image(image_lib.ImageFormat.SRGB, rgb))
+        if not result.pose_landmarks or len(result.pose_landmarks) == 0:
+            return None
+        pts = []
+        for lm in result.pose_landmarks[0]:
+            x = getattr(lm, "x", None) or 0.0
+            y = getattr(lm, "y", None) or 0.0
+            z = getattr(lm, "z", None) or 0.0
+            pts.append([float(x), float(y), float(z)])
+        if len(pts) < 33:
+            pts.extend([[0.0, 0.0, 0.0]] * (33 - len(pts)))
+        return pts[:33]
+
+    def _analyze_frame_sync(self, data: Union[bytes, "np.ndarray"], stream: Optional[str] = None) -> dict:
         try:
             import cv2
             import numpy as np
@@ -285,7 +458,14 @@ class PostureAnalyzerService:
             nparr = np.frombuffer(data, dtype=np.uint8)
         else:
             nparr = data
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Frames of a stream barely changed since its last analysis reuse that result
+        gate = MotionGate.get_instance() if stream and motion_gate.ENABLED else None
+        small = motion_gate.small_gray(nparr) if gate is not None else None
+        if small is not None:
+            cached = gate.check(stream, small)
+            if cached is not None:
+                return cached
+        img = _decode(nparr)
         if img is None:
             return {"detected": False, "error": "Invalid image"}
 
@@ -293,33 +473,31 @@ class PostureAnalyzerService:
         if landmarker is None:
             return _ml_unavailable_response()
 
-        rgb = np.ascontiguousarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
         try:
-            from mediapipe.tasks.python.vision.core import image as image_lib
-            mp_image = image_lib.Image(image_lib.ImageFormat.SRGB, rgb)
-            result = landmarker.detect(mp_image)
+            if stream and pose_tracker.ENABLED:
+                tracker = PoseTracking.get_instance().get(stream)
+                with tracker.lock:
+                    previous = tracker.pose(_ROI_MAX_AGE_SEC)
+                    pts, keyframe = tracker.step(img, lambda frame: self._detect(landmarker, frame, previous))
+            else:
+                pts, keyframe = self._detect(landmarker, img), True
         except Exception:
             return _ml_unavailable_response()
 
-        if not result.pose_landmarks or len(result.pose_landmarks) == 0:
-            return {
+        if pts is None:
+            result = {
                 "detected": False,
                 "injury_risk": 0.3,
                 "posture_score": 0.5,
                 "feedback": ["No pose detected - ensure full body in frame"],
                 "corrections": [],
             }
-
-        landmarks = result.pose_landmarks[0]
-        pts = []
-        for lm in landmarks:
-            x = getattr(lm, "x", None) or 0.0
-            y = getattr(lm, "y", None) or 0.0
-            z = getattr(lm, "z", None) or 0.0
-            pts.append([float(x), float(y), float(z)])
-        if len(pts) < 33:
-            pts.extend([[0.0, 0.0, 0.0]] * (33 - len(pts)))
-        result = self.analyze_landmarks(pts[:33])
-        # include the raw landmark list so clients can draw them if desired
-        result["landmarks"] = pts[:33]
+        else:
+            result = self.analyze_landmarks(pts)
+            # include the raw landmark list so clients can draw them if desired
+            result["landmarks"] = pts
+        if stream:
+            result["keyframe"] = keyframe
+        if small is not None:
+            gate.store(stream, small, result)
         return result
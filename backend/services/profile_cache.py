@@ -0,0 +1,75 @@
+"""
+In-process LRU + TTL cache for user profiles, keyed by lowercase email.
+The users API reads through it and writes through it on updates.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+_TTL_SEC = float(os.getenv("PROFILE_CACHE_TTL_SEC", "300"))
+
+
+class ProfileCache:
+    _instance: Optional["ProfileCache"] = None
+
+    @classmethod
+    def get_instance(cls) -> "ProfileCache":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES, ttl: float = _TTL_SEC):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, email: str) -> Optional[dict]:
+        """Cached profile (a copy), or None on miss/expiry."""
+        key = email.lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            profile = entry[1]
+        return {**profile, "settings": dict(profile.get("settings") or {})}
+
+    def put(self, email: str, profile: dict):
+        key = email.lower()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email.lower(), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_sec": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,177 @@
+"""
+Compressed per-device sensor history.
+The newest readings stay as plain dicts (the hot tail /risk reads); older ones are
+sealed into blocks: timestamps and quantized channels are delta-encoded, packed
+and zlib-compressed, with min/max timestamps kept outside the payload so range
+reads only decompress overlapping blocks. Pure Python (array + zlib) so it also
+runs in the light deployment.
+"""
+import math
+import threading
+import zlib
+from array import array
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Iterator, Optional
+
+# Quantization steps: 0.001 m/s^2 / 0.001 gyro units / 0.1 bpm
+_ACCEL_Q = 1000.0
+_GYRO_Q = 1000.0
+_HR_Q = 10.0
+_I32 = (-(2 ** 31), 2 ** 31 - 1)
+# Quantized value of NaN / inf readings (finite values are clamped above it); decodes to NaN
+_MISSING = _I32[0]
+# Missing heart rate shares the out-of-range sentinel, so no real reading (e.g. -0.1) collides with it
+_HR_NONE = _MISSING
+
+
+def ts_ms(ts) -> Optional[int]:
+    """ISO-8601 string to epoch ms (naive = UTC, as ingest writes it)."""
+    if not ts or not isinstance(ts, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _iso(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).replace(tzinfo=None).isoformat(timespec="milliseconds")
+
+
+def _q(values, scale: float) -> list:
+    lo, hi = _MISSING + 1, _I32[1]
+    return [min(hi, max(lo, int(round(v * scale)))) if math.isfinite(v) else _MISSING for v in values]
+
+
+def _dq(q: int, scale: float) -> float:
+    return math.nan if q == _MISSING else q / scale
+
+
+def _delta(values: list) -> list:
+    return [b - a for a, b in zip([0] + values[:-1], values)]
+
+
+class SealedBlock:
+    """Immutable run of readings: [t_min, t_max] index plus one compressed payload."""
+
+    __slots__ = ("n", "t_min", "t_max", "payload")
+
+    def __init__(self, readings: list):
+        n = len(readings)
+        times, last = [], 0
+        for r in readings:
+            t = ts_ms(r.get("timestamp"))
+            # Unparseable client timestamps inherit the previous one
+            last = t if t is not None else last
+            times.append(last)
+        cols = []
+        for key, i, scale in (("accel", 0, _ACCEL_Q), ("accel", 1, _ACCEL_Q), ("accel", 2, _ACCEL_Q),
+                              ("gyro", 0, _GYRO_Q), ("gyro", 1, _GYRO_Q), ("gyro", 2, _GYRO_Q)):
+            cols.append(_q([r[key][i] for r in readings], scale))
+        cols.append([_HR_NONE if r.get("heart_rate") is None else v
+                     for r, v in zip(readings, _q([r.get("heart_rate") or 0 for r in readings], _HR_Q))])
+        # Deltas between int32 values need 33 bits; zlib squeezes out the zero high bytes
+        raw = array("q", _delta(times)).tobytes()
+        for c in cols:
+            raw += array("q", _delta(c)).tobytes()
+        self.n = n
+        self.t_min = min(times)
+        self.t_max = max(times)
+        self.payload = zlib.compress(raw, 6)
+
+    def decode(self) -> list:
+        raw = zlib.decompress(self.payload)
+        n = self.n
+        t = array("q")
+        t.frombytes(raw[: 8 * n])
+        chans = []
+        for k in range(1, 8):
+            a = array("q")
+            a.frombytes(raw[8 * n * k: 8 * n * (k + 1)])
+            chans.append(list(accumulate(a)))
+        times = list(accumulate(t))
+        ax, ay, az, gx, gy, gz, hr = chans
+        return [
+            {
+                "accel": [_dq(ax[i], _ACCEL_Q), _dq(ay[i], _ACCEL_Q), _dq(az[i], _ACCEL_Q)],
+                "gyro": [_dq(gx[i], _GYRO_Q), _dq(gy[i], _GYRO_Q), _dq(gz[i], _GYRO_Q)],
+                "heart_rate": None if hr[i] == _HR_NONE else hr[i] / _HR_Q,
+                "timestamp": _iso(times[i]),
+            }
+            for i in range(n)
+        ]
+
+    def nbytes(self) -> int:
+        return len(self.payload) + 64
+
+
+class DeviceHistory:
+    """Hot tail of dicts plus sealed blocks, oldest first. Blocks beyond max_blocks are dropped."""
+
+    def __init__(self, hot_size: int, block_size: int, max_blocks: int):
+        self.hot_size = hot_size
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._hot: list = []
+        self._blocks: list[SealedBlock] = []
+        self._lock = threading.Lock()
+        # Readings ever appended; lets readers cache values derived from the tail
+        self.appended = 0
+
+    def append(self, reading: dict):
+        with self._lock:
+            self.appended += 1
+            self._hot.append(reading)
+            if len(self._hot) >= self.hot_size + self.block_size:
+                # Seal before dropping the readings from the tail, so a failure loses nothing
+                if self.max_blocks > 0:
+                    self._blocks.append(SealedBlock(self._hot[: self.block_size]))
+                    if len(self._blocks) > self.max_blocks:
+                        del self._blocks[0]
+                del self._hot[: self.block_size]
+
+    def recent(self, limit: int) -> list:
+        """Newest `limit` readings; served from the hot tail when it is large enough."""
+        with self._lock:
+            if limit <= len(self._hot):
+                return self._hot[-limit:] if limit > 0 else []
+            hot = list(self._hot)
+            blocks = list(self._blocks)
+        need = limit - len(hot)
+        older = []
+        for b in reversed(blocks):
+            if need <= 0:
+                break
+            rows = b.decode()
+            older[:0] = rows[-need:]
+            need -= len(rows)
+        return older + hot
+
+    def iter_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Iterator[dict]:
+        """Readings oldest first, decompressing only blocks that overlap [start_ms, end_ms)."""
+        with self._lock:
+            blocks = list(self._blocks)
+            hot = list(self._hot)
+        for b in blocks:
+            if (start_ms is not None and b.t_max < start_ms) or (end_ms is not None and b.t_min >= end_ms):
+                continue
+            yield from b.decode()
+        yield from hot
+
+    def __len__(self) -> int:
+        return len(self._hot) + sum(b.n for b in self._blocks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            blocks = list(self._blocks)
+            hot = len(self._hot)
+        return {
+            "hot_readings": hot,
+            "sealed_readings": sum(b.n for b in blocks),
+            "blocks": len(blocks),
+            "compressed_bytes": sum(b.nbytes() for b in blocks),
+        }
@@ -0,0 +1,107 @@
+"""
+Streaming export of device sensor history as NDJSON or CSV.
+Rows are produced in chunks from the in-memory store or the storage backend and
+encoded (optionally gzipped) on the fly, so memory stays flat for any range.
+"""
+import asyncio
+import json
+import math
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from services.iot_simulator import IoTDataStore
+
+COLUMNS = ["device_id", "timestamp", "accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z", "heart_rate"]
+_CHUNK_ROWS = 500
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """ISO-8601 to aware UTC datetime; naive values are taken as UTC (what ingest writes)."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _finite(v):
+    """NaN / inf (missing samples in sealed blocks) as None: null in NDJSON, empty in CSV."""
+    return None if isinstance(v, float) and not math.isfinite(v) else v
+
+
+def _flatten(device_id: str, r: dict) -> dict:
+    a = r.get("accel") or [None, None, None]
+    g = r.get("gyro") or [None, None, None]
+    ts = r.get("timestamp")
+    if ts is None and isinstance(r.get("ts"), datetime):
+        ts = r["ts"].isoformat()
+    return {
+        "device_id": device_id, "timestamp": ts,
+        "accel_x": _finite(a[0]), "accel_y": _finite(a[1]), "accel_z": _finite(a[2]),
+        "gyro_x": _finite(g[0]), "gyro_y": _finite(g[1]), "gyro_z": _finite(g[2]),
+        "heart_rate": _finite(r.get("heart_rate")),
+    }
+
+
+async def iter_memory(device_id: str, start: Optional[datetime], end: Optional[datetime]) -> AsyncIterator[list]:
+    """Chunks of flat rows from the in-memory store; blocks are decompressed off the event loop."""
+    chunks = _memory_chunks(device_id, start, end)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _memory_chunks(device_id: str, start: Optional[datetime], end: Optional[datetime]) -> Iterator[list]:
+    chunk = []
+    readings = IoTDataStore.iter_readings(
+        device_id, start.isoformat() if start else None, end.isoformat() if end else None,
+    )
+    for r in readings:
+        if start or end:
+            t = parse_time(r.get("timestamp"))
+            if t is None or (start and t < start) or (end and t >= end):
+                continue
+        chunk.append(_flatten(device_id, r))
+        if len(chunk) >= _CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iter_db(sensors, device_id: str, start: Optional[datetime], end: Optional[datetime]) -> AsyncIterator[list]:
+    """Chunks of flat rows from persisted history (a SensorRepository), read batch by batch."""
+    async for batch in sensors.iter_range(device_id, start, end, _CHUNK_ROWS):
+        yield [_flatten(device_id, doc) for doc in batch]
+
+
+def _csv_value(v) -> str:
+    return "" if v is None else str(v)
+
+
+def _encode(rows: Iterable[dict], fmt: str) -> str:
+    if fmt == "csv":
+        return "".join(",".join(_csv_value(r[c]) for c in COLUMNS) + "\n" for r in rows)
+    return "".join(json.dumps(r, separators=(",", ":"), allow_nan=False) + "\n" for r in rows)
+
+
+async def stream_export(chunks: AsyncIterator[list], fmt: str = "ndjson", gzip: bool = False) -> AsyncIterator[bytes]:
+    """Encode row chunks to bytes. The CSV header goes out before the first read completes."""
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def out(text: str) -> bytes:
+        data = text.encode()
+        # Z_SYNC_FLUSH so each chunk reaches the client now, not when the stream ends
+        return z.compress(data) + z.flush(zlib.Z_SYNC_FLUSH) if z else data
+
+    if fmt == "csv":
+        yield out(",".join(COLUMNS) + "\n")
+    async for rows in chunks:
+        yield out(_encode(rows, fmt))
+    if z:
+        yield z.flush()
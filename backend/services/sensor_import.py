@@ -0,0 +1,207 @@
+"""
+Bulk import of offline sensor logs (ESP32 SD-card dumps).
+Files are parsed in chunks with numpy/pandas and validated a column at a time;
+valid rows go to the storage backend in bulk, and rows newer than a device's live
+readings into the in-memory store.
+numpy/pandas are lazy-loaded so the light deployment still starts without them.
+
+CLI:
+    python -m services.sensor_import log.csv [--device-id esp32-1]
+    python -m services.sensor_import log.bin --device-id esp32-1 --format bin
+"""
+import asyncio
+from typing import Iterator, Optional
+
+from services.iot_simulator import IoTDataStore, _MAX_PER_DEVICE
+from services.sensor_blocks import ts_ms
+
+_CHUNK_ROWS = 100_000
+_INSERT_BATCH = 10_000
+
+# Physical limits: MPU6050 full scale is +-16 g and +-2000 deg/s
+ACCEL_LIMIT = 16 * 9.81
+GYRO_LIMIT = 2000.0
+HR_RANGE = (20.0, 250.0)
+
+# Binary record: epoch ms, accel xyz, gyro xyz, heart rate (NaN = none), little-endian
+BINARY_FIELDS = [("ts_ms", "<u8"), ("accel", "<f4", (3,)), ("gyro", "<f4", (3,)), ("heart_rate", "<f4")]
+
+
+def _chunk(np, device_ids, ts_ms, accel, gyro, hr) -> dict:
+    return {
+        "device_id": np.asarray(device_ids, dtype=object),
+        "ts_ms": np.asarray(ts_ms, dtype=np.int64),
+        "accel": np.asarray(accel, dtype=np.float64),
+        "gyro": np.asarray(gyro, dtype=np.float64),
+        "heart_rate": np.asarray(hr, dtype=np.float64),
+    }
+
+
+def parse_csv(source, device_id: Optional[str] = None, chunk_rows: int = _CHUNK_ROWS) -> Iterator[dict]:
+    """
+    CSV with the export columns (device_id, timestamp, accel_x..gyro_z, heart_rate).
+    device_id column is optional when device_id is given. timestamp is ISO-8601 or epoch s/ms.
+    """
+    import numpy as np
+    import pandas as pd
+
+    for df in pd.read_csv(source, chunksize=chunk_rows):
+        n = len(df)
+        if "device_id" in df.columns:
+            # Missing ids stay None (rejected by validate), not the string "nan"
+            missing = df["device_id"].isna().to_numpy()
+            ids = np.where(missing, device_id or None, df["device_id"].astype(str).to_numpy())
+        elif device_id:
+            ids = np.full(n, device_id, dtype=object)
+        else:
+            raise ValueError("CSV has no device_id column; pass device_id")
+        ts = df["timestamp"]
+        if pd.api.types.is_numeric_dtype(ts):
+            t = ts.to_numpy(dtype=np.float64)
+            # Epoch seconds vs milliseconds
+            t = np.where(t > 1e11, t, t * 1000.0)
+            ts_ms = np.where(np.isfinite(t), t, -1).astype(np.int64)
+        else:
+            parsed = pd.to_datetime(ts, utc=True, errors="coerce", format="ISO8601").dt.tz_localize(None)
+            # NaT becomes a large negative int and fails validation
+            ts_ms = parsed.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        accel = df[["accel_x", "accel_y", "accel_z"]].to_numpy(dtype=np.float64)
+        gyro = df[["gyro_x", "gyro_y", "gyro_z"]].to_numpy(dtype=np.float64)
+        hr = df["heart_rate"].to_numpy(dtype=np.float64) if "heart_rate" in df.columns else np.full(n, np.nan)
+        yield _chunk(np, ids, ts_ms, accel, gyro, hr)
+
+
+def parse_binary(source, device_id: str, chunk_rows: int = _CHUNK_ROWS) -> Iterator[dict]:
+    """Fixed-size little-endian records (see BINARY_FIELDS); read chunk_rows records at a time."""
+    import numpy as np
+
+    dtype = np.dtype(BINARY_FIELDS)
+    while True:
+        buf = source.read(dtype.itemsize * chunk_rows)
+        if not buf:
+            break
+        usable = len(buf) - len(buf) % dtype.itemsize  # drop a torn final record
+        rec = np.frombuffer(buf[:usable], dtype=dtype)
+        if not len(rec):
+            break
+        yield _chunk(np, np.full(len(rec), device_id, dtype=object), rec["ts_ms"], rec["accel"], rec["gyro"], rec["heart_rate"])
+
+
+def validate(chunk: dict):
+    """Boolean mask of rows inside physical ranges, computed per column."""
+    import numpy as np
+
+    accel, gyro, hr, ids = chunk["accel"], chunk["gyro"], chunk["heart_rate"], chunk["device_id"]
+    mask = chunk["ts_ms"] > 0
+    mask &= (ids != None) & (ids != "")  # noqa: E711 (elementwise on an object array)
+    mask &= np.isfinite(accel).all(axis=1) & (np.abs(accel) <= ACCEL_LIMIT).all(axis=1)
+    mask &= np.isfinite(gyro).all(axis=1) & (np.abs(gyro) <= GYRO_LIMIT).all(axis=1)
+    mask &= np.isnan(hr) | ((hr >= HR_RANGE[0]) & (hr <= HR_RANGE[1]))
+    return mask
+
+
+def to_documents(chunk: dict, mask) -> list:
+    """Reading documents for valid rows, in the SensorRepository layout."""
+    import numpy as np
+
+    ts = chunk["ts_ms"][mask].astype("datetime64[ms]")
+    iso = np.datetime_as_string(ts, unit="ms").tolist()
+    hr = chunk["heart_rate"][mask]
+    hr = np.where(np.isnan(hr), None, hr).tolist()
+    return [
+        {"device_id": d, "ts": t, "timestamp": s, "accel": a, "gyro": g, "heart_rate": h}
+        for d, t, s, a, g, h in zip(
+            chunk["device_id"][mask].tolist(), ts.tolist(), iso,
+            chunk["accel"][mask].tolist(), chunk["gyro"][mask].tolist(), hr,
+        )
+    ]
+
+
+def _store_tail(docs: list) -> dict:
+    """
+    Newest readings per device into the in-memory store, in time order. Only rows newer
+    than the device's live head are added, so live history and gait tracking never go
+    back in time. Returns the last timestamp per device.
+    """
+    tails: dict[str, list] = {}
+    for d in docs:
+        tails.setdefault(d["device_id"], []).append(d)
+    last_seen = {}
+    for device_id, rows in tails.items():
+        rows.sort(key=lambda d: d["ts"])
+        head = IoTDataStore.get_recent(device_id, 1)
+        head_ms = ts_ms(head[-1]["timestamp"]) if head else None
+        newer = rows if head_ms is None else [d for d in rows if ts_ms(d["timestamp"]) > head_ms]
+        for d in newer[-_MAX_PER_DEVICE:]:
+            IoTDataStore.add(device_id, {
+                "accel": d["accel"], "gyro": d["gyro"], "heart_rate": d["heart_rate"], "timestamp": d["timestamp"],
+            })
+        last_seen[device_id] = rows[-1]["timestamp"]
+    return last_seen
+
+
+async def import_chunks(chunks: Iterator[dict], sensors=None, live: bool = True) -> dict:
+    """
+    Validate and persist parsed chunks into `sensors` (a SensorRepository). Parsing runs
+    in a worker thread so the event loop stays responsive; inserts are bulk writes.
+    """
+    loop = asyncio.get_running_loop()
+    stats = {"rows": 0, "imported": 0, "rejected": 0, "devices": {}}
+
+    def next_batch():
+        c = next(chunks, None)
+        if c is None:
+            return None
+        mask = validate(c)
+        return len(mask), to_documents(c, mask)
+
+    while True:
+        batch = await loop.run_in_executor(None, next_batch)
+        if batch is None:
+            break
+        n, docs = batch
+        stats["rows"] += n
+        stats["imported"] += len(docs)
+        stats["rejected"] += n - len(docs)
+        if sensors is not None:
+            for i in range(0, len(docs), _INSERT_BATCH):
+                await sensors.insert_many(docs[i:i + _INSERT_BATCH])
+        if live:
+            stats["devices"].update(_store_tail(docs))
+        else:
+            for d in docs:
+                stats["devices"][d["device_id"]] = d["timestamp"]
+    return stats
+
+
+def main():
+    import argparse
+
+    from db.storage import connect_storage, close_storage
+
+    parser = argparse.ArgumentParser(description="Import offline sensor logs into the configured storage backend")
+    parser.add_argument("path", help="CSV or binary log file")
+    parser.add_argument("--device-id", "-d", help="Device id (required for binary logs)")
+    parser.add_argument("--format", "-f", choices=["csv", "bin"], help="Defaults from file extension")
+    args = parser.parse_args()
+
+    fmt = args.format or ("bin" if args.path.endswith(".bin") else "csv")
+    if fmt == "bin" and not args.device_id:
+        parser.error("--device-id is required for binary logs")
+
+    async def run():
+        storage = await connect_storage()
+        try:
+            with open(args.path, "rb") as f:
+                chunks = parse_binary(f, args.device_id) if fmt == "bin" else parse_csv(f, args.device_id)
+                return await import_chunks(chunks, storage.sensors, live=False)
+        finally:
+            await close_storage()
+
+    stats = asyncio.run(run())
+    print(f"Imported {stats['imported']} of {stats['rows']} rows ({stats['rejected']} rejected) "
+          f"for {len(stats['devices'])} device(s)")
+
+
+if __name__ == "__main__":
+    main()
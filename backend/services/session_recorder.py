@@ -0,0 +1,412 @@
+"""
+Workout session recorder. Live analysis results are appended to per-session
+column buffers (landmarks as float16) with no I/O on the request path; a
+background task encodes pending frames into compressed chunks and writes them
+through the storage layer, along with a running summary in the session document.
+"""
+import asyncio
+import json
+import math
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from datetime import datetime
+from itertools import chain
+from typing import Optional
+
+from db.mongo import DatabaseUnavailable, guarded
+from db.storage import get_storage
+from services.activity_aggregates import ActivityAggregates
+
+_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL_SEC", "5"))
+_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT_SEC", "300"))
+# Encoded chunks kept per session while storage is unreachable; oldest are dropped beyond this
+_MAX_UNSENT = int(os.getenv("SESSION_MAX_UNSENT_CHUNKS", "120"))
+
+N_LANDMARKS = 33
+NUMERIC_FIELDS = ("injury_risk", "posture_score", "knee_angle")
+
+_MAGIC = b"NPS1"
+_HEADER = struct.Struct("<4sIIqI")  # magic, frames, pose frames, start epoch ms, vocab bytes
+_LANDMARKS = struct.Struct(f"<{N_LANDMARKS * 3}e")
+_NUMERIC = struct.Struct(f"<{len(NUMERIC_FIELDS)}e")
+_NAN = float("nan")
+_DETECTED, _HAS_POSE = 1, 2
+
+
+def _num(v) -> float:
+    """Numeric field as float, NaN when missing or outside float16 range (max 65504)."""
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or not abs(v) < 65504:
+        return _NAN
+    return float(v)
+
+
+def _array(typecode: str, data) -> array:
+    a = array(typecode)
+    a.frombytes(data)
+    return a
+
+
+class _Columns:
+    """Pending (unflushed) frames of one session, one column per field."""
+
+    def __init__(self):
+        self.t_ms = array("I")          # ms since the chunk's first frame
+        self.flags = bytearray()
+        self.numeric = bytearray()      # float16 x len(NUMERIC_FIELDS) per frame
+        self.landmarks = bytearray()    # float16 x 99 per frame, pose frames only
+        self.labels: list = []          # (exercise, feedback, corrections), dictionary-encoded at flush
+        self.start_ms: Optional[int] = None
+
+    def __len__(self):
+        return len(self.flags)
+
+    def append(self, now_ms: int, result: dict, landmarks: Optional[list]):
+        if self.start_ms is None:
+            self.start_ms = now_ms
+        flags = _DETECTED if result.get("detected") else 0
+        if landmarks and len(landmarks) >= N_LANDMARKS:
+            try:
+                self.landmarks += _LANDMARKS.pack(*chain.from_iterable(p[:3] for p in landmarks[:N_LANDMARKS]))
+                flags |= _HAS_POSE
+            except (struct.error, TypeError, ValueError, OverflowError):
+                pass
+        self.t_ms.append(now_ms - self.start_ms)
+        self.flags.append(flags)
+        self.numeric += _NUMERIC.pack(*(_num(result.get(f)) for f in NUMERIC_FIELDS))
+        self.labels.append((
+            result.get("exercise"), tuple(result.get("feedback") or ()), tuple(result.get("corrections") or ()),
+        ))
+
+
+def encode_chunk(cols: _Columns) -> bytes:
+    """
+    Serialize pending frames. Landmark columns are transposed (one series per
+    coordinate) and byte-shuffled before zlib, which compresses float16 data far
+    better than frame-major order.
+    """
+    n = len(cols)
+    vocab: dict = {}
+    codes = array("H", (vocab.setdefault(label, len(vocab)) for label in cols.labels))
+    vocab_bytes = json.dumps([list(v) for v in vocab]).encode()
+    pose_frames = len(cols.landmarks) // _LANDMARKS.size
+    coords = memoryview(cols.landmarks).cast("H")
+    series = b"".join(coords[j::N_LANDMARKS * 3].tobytes() for j in range(N_LANDMARKS * 3))
+    body = b"".join((
+        vocab_bytes, cols.t_ms.tobytes(), bytes(cols.flags), codes.tobytes(),
+        bytes(cols.numeric), series[0::2], series[1::2],
+    ))
+    return _HEADER.pack(_MAGIC, n, pose_frames, cols.start_ms or 0, len(vocab_bytes)) + zlib.compress(body, 6)
+
+
+def decode_chunk(payload: bytes, with_landmarks: bool = True) -> list:
+    """Inverse of encode_chunk: list of frame dicts in recording order."""
+    magic, n, pose_frames, start_ms, vocab_len = _HEADER.unpack_from(payload)
+    if magic != _MAGIC:
+        raise ValueError("Not a session chunk")
+    body = memoryview(zlib.decompress(payload[_HEADER.size:]))
+    pos = 0
+
+    def take(size):
+        nonlocal pos
+        pos += size
+        return body[pos - size:pos]
+
+    vocab = json.loads(bytes(take(vocab_len)))
+    t_ms = _array("I", take(4 * n))
+    flags = bytes(take(n))
+    codes = _array("H", take(2 * n))
+    numeric = take(_NUMERIC.size * n)
+    half = pose_frames * _LANDMARKS.size // 2
+    lo, hi = take(half), take(half)
+    lm = None
+    if with_landmarks and pose_frames:
+        series = bytearray(2 * half)
+        series[0::2], series[1::2] = lo, hi
+        per = N_LANDMARKS * 3
+        frame_major = bytearray(2 * half)
+        out = memoryview(frame_major).cast("H")
+        src = memoryview(series).cast("H")
+        for j in range(per):
+            out[j::per] = src[j * pose_frames:(j + 1) * pose_frames]
+        lm = frame_major
+
+    frames, k = [], 0
+    for i in range(n):
+        exercise, feedback, corrections = vocab[codes[i]]
+        values = _NUMERIC.unpack_from(numeric, i * _NUMERIC.size)
+        frame = {
+            "t": datetime.utcfromtimestamp((start_ms + t_ms[i]) / 1000).isoformat(),
+            "detected": bool(flags[i] & _DETECTED),
+            "exercise": exercise, "feedback": feedback, "corrections": corrections,
+        }
+        frame.update({f: round(v, 3) for f, v in zip(NUMERIC_FIELDS, values) if not math.isnan(v)})
+        if flags[i] & _HAS_POSE:
+            if lm is not None:
+                c = _LANDMARKS.unpack_from(lm, k * _LANDMARKS.size)
+                frame["landmarks"] = [list(c[j:j + 3]) for j in range(0, len(c), 3)]
+            k += 1
+        frames.append(frame)
+    return frames
+
+
+class SessionForbidden(Exception):
+    """The requested session id belongs to another user."""
+
+
+class _Session:
+    def __init__(self, session_id: str, user: Optional[str], source: str, verified: bool = True):
+        now = datetime.utcnow().isoformat()
+        self.doc = {
+            "id": session_id, "user": user, "source": source, "started_at": now, "ended_at": None,
+            "last_frame_at": None, "frames": 0, "detected_frames": 0, "chunks": 0,
+            "posture_score_sum": 0.0, "injury_risk_sum": 0.0, "corrections": 0, "exercises": {},
+        }
+        self.pending = _Columns()
+        self.unsent: list = []
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.dirty = True
+        # Client-chosen ids may already be stored for someone else; checked on the first flush
+        self.verified = verified
+
+
+def _close(s: _Session):
+    s.closed = True
+    s.doc["ended_at"] = datetime.utcnow().isoformat()
+    s.dirty = True
+    ActivityAggregates.get_instance().end_session(s.doc["id"])
+
+
+def _resume(doc: dict, stored: dict):
+    """Fold a stored document of the same session into a rejoined one (counters add up)."""
+    for k in ("frames", "detected_frames", "chunks", "posture_score_sum", "injury_risk_sum", "corrections"):
+        doc[k] += stored.get(k) or 0
+    for ex, n in (stored.get("exercises") or {}).items():
+        doc["exercises"][ex] = doc["exercises"].get(ex, 0) + n
+    doc["started_at"] = stored.get("started_at") or doc["started_at"]
+
+
+class SessionRecorder:
+    _instance: Optional["SessionRecorder"] = None
+
+    @classmethod
+    def get_instance(cls) -> "SessionRecorder":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._sessions: dict[str, _Session] = {}
+        self._by_user: dict[str, str] = {}
+        # Recording happens on the event loop (WebSocket) and in the threadpool (sync routes)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.dropped_chunks = 0
+        self.dropped_frames = 0
+        self.rejected_sessions = 0
+
+    # --- hot path (memory only) ---
+
+    def start_session(self, user: Optional[str] = None, source: str = "ws", session_id: Optional[str] = None) -> str:
+        """
+        Open (or rejoin) a session owned by `user`. Raises SessionForbidden when a
+        client-supplied id is already open for a different owner. Rejoining a session
+        that ended (idle timeout) reopens it, as happens once it has left memory.
+        """
+        user = user.lower() if user else None
+        verified = session_id is None
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is None:
+                self._sessions[session_id] = _Session(session_id, user, source, verified)
+            elif s.doc["user"] != user:
+                raise SessionForbidden(session_id)
+            elif s.closed:
+                s.closed, s.doc["ended_at"], s.dirty = False, None, True
+                s.last_seen = time.monotonic()
+        return session_id
+
+    def session_for(self, user: Optional[str], session_id: Optional[str] = None, source: str = "http") -> Optional[str]:
+        """
+        Session for a stateless request: the client's X-Session-Id if given, else the user's
+        open session (a new one after SESSION_IDLE_TIMEOUT_SEC). Anonymous requests aren't recorded.
+        A session only accepts frames from the user it was started by (SessionForbidden otherwise).
+        """
+        if session_id:
+            return self.start_session(user, source, session_id[:64])
+        if not user:
+            return None
+        user = user.lower()
+        with self._lock:
+            current = self._sessions.get(self._by_user.get(user, ""))
+            if current and not current.closed and time.monotonic() - current.last_seen < _IDLE_TIMEOUT:
+                return current.doc["id"]
+        session_id = self.start_session(user, source)
+        with self._lock:
+            self._by_user[user] = session_id
+        return session_id
+
+    def record(self, session_id: Optional[str], result: dict, landmarks: Optional[list] = None) -> bool:
+        """
+        Append one analyzed frame; landmarks default to result["landmarks"]. Returns
+        False (and logs) if the session isn't open, e.g. a frame racing the end of a session.
+        """
+        if not session_id:
+            return False
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is None or s.closed:
+                self.dropped_frames += 1
+                print(f"Session {session_id} is not open; frame not recorded")
+                return False
+            s.pending.append(now_ms, result, landmarks if landmarks is not None else result.get("landmarks"))
+            s.last_seen = time.monotonic()
+            d = s.doc
+            d["frames"] += 1
+            if result.get("detected"):
+                d["detected_frames"] += 1
+                for f in ("posture_score", "injury_risk"):
+                    v = _num(result.get(f))
+                    if not math.isnan(v):
+                        d[f + "_sum"] += v
+                ex = result.get("exercise") or "unknown"
+                d["exercises"][ex] = d["exercises"].get(ex, 0) + 1
+            d["corrections"] += len(result.get("corrections") or ())
+            s.dirty = True
+            user = d["user"]
+        ActivityAggregates.get_instance().record_frame(
+            user, session_id, result, now_ms, datetime.utcfromtimestamp(now_ms / 1000).isoformat(),
+        )
+        return True
+
+    def end_session(self, session_id: Optional[str]):
+        """Mark a session finished; its remaining frames go out on the next flush."""
+        with self._lock:
+            s = self._sessions.get(session_id or "")
+            if s and not s.closed:
+                _close(s)
+
+    def live_summary(self, session_id: str) -> Optional[dict]:
+        """Summary of an in-memory session; callers check summary["user"] against the requester."""
+        with self._lock:
+            s = self._sessions.get(session_id)
+            return summarize(dict(s.doc)) if s else None
+
+    # --- background persistence ---
+
+    async def flush(self):
+        """Encode pending frames of every session into chunks and persist them with the session document."""
+        now = time.monotonic()
+        work = []
+        with self._lock:
+            for sid, s in list(self._sessions.items()):
+                if not s.closed and now - s.last_seen >= _IDLE_TIMEOUT:
+                    _close(s)
+                if not s.dirty and not s.unsent:
+                    if s.closed:
+                        del self._sessions[sid]
+                        if s.doc["user"] and self._by_user.get(s.doc["user"]) == sid:
+                            del self._by_user[s.doc["user"]]
+                    continue
+                cols = s.pending if len(s.pending) else None
+                if cols is not None:
+                    s.pending = _Columns()
+                    s.doc["last_frame_at"] = datetime.utcfromtimestamp(
+                        (cols.start_ms + cols.t_ms[-1]) / 1000).isoformat()
+                s.dirty = False
+                work.append((s, cols, dict(s.doc, exercises=dict(s.doc["exercises"]))))
+        if not work:
+            return
+        sessions = get_storage().sessions
+        for s, cols, doc in work:
+            if cols is not None:
+                s.unsent.append(await asyncio.to_thread(encode_chunk, cols))
+                if len(s.unsent) > _MAX_UNSENT:
+                    s.unsent.pop(0)
+                    self.dropped_chunks += 1
+            if not s.verified:
+                try:
+                    stored = await guarded(lambda: sessions.get(doc["id"]), timeout=5.0)
+                except Exception:
+                    # Chunks wait in s.unsent until ownership is known
+                    s.dirty = True
+                    continue
+                if stored is not None and stored.get("user") != doc["user"]:
+                    print(f"Session {doc['id']} belongs to another user; dropping its frames")
+                    with self._lock:
+                        self.rejected_sessions += 1
+                        self._sessions.pop(doc["id"], None)
+                    continue
+                if stored is not None:
+                    # Same owner rejoining a session flushed earlier: continue its chunks and counters
+                    with self._lock:
+                        _resume(s.doc, stored)
+                        doc = dict(s.doc, exercises=dict(s.doc["exercises"]))
+                s.verified = True
+            try:
+                while s.unsent:
+                    seq = s.doc["chunks"]
+                    await guarded(lambda: sessions.append_chunk(doc["id"], seq, s.unsent[0]), timeout=5.0)
+                    s.unsent.pop(0)
+                    s.doc["chunks"] = seq + 1
+                doc["chunks"] = s.doc["chunks"]
+                await guarded(lambda: sessions.save(doc), timeout=5.0)
+            except (asyncio.TimeoutError, DatabaseUnavailable):
+                s.dirty = True
+            except Exception as e:
+                print(f"Session flush failed for {doc['id']}: {e}")
+                s.dirty = True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Session recorder flush error: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        with self._lock:
+            for sid in list(self._sessions):
+                s = self._sessions[sid]
+                if not s.closed:
+                    _close(s)
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_sessions": sum(1 for s in self._sessions.values() if not s.closed),
+                "pending_frames": sum(len(s.pending) for s in self._sessions.values()),
+                "unsent_chunks": sum(len(s.unsent) for s in self._sessions.values()),
+                "dropped_chunks": self.dropped_chunks,
+                "dropped_frames": self.dropped_frames,
+                "rejected_sessions": self.rejected_sessions,
+            }
+
+
+def summarize(doc: dict) -> dict:
+    """Public view of a session document (averages instead of running sums)."""
+    out = {k: v for k, v in doc.items() if not k.endswith("_sum") and k != "_id"}
+    n = doc.get("detected_frames") or 0
+    out["avg_posture_score"] = round(doc.get("posture_score_sum", 0.0) / n, 3) if n else None
+    out["avg_injury_risk"] = round(doc.get("injury_risk_sum", 0.0) / n, 3) if n else None
+    return out
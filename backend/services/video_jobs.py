@@ -0,0 +1,290 @@
+"""
+Background analysis of uploaded workout videos. Uploads are written to disk and
+queued; worker threads extract landmarks with the pipelined extractor from
+ml_models (decode thread + VIDEO-mode landmarker, frame striding), analyze every
+frame in one vectorized pass and summarize the clip per rep. Job state lives in
+memory and is polled (or streamed as server-sent events) by clients.
+"""
+import importlib.util
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from services.posture_analyzer import PostureAnalyzerService
+
+JOB_DIR = Path(os.getenv("VIDEO_JOB_DIR", "") or Path(tempfile.gettempdir()) / "neuroposture-videos")
+MAX_UPLOAD_BYTES = int(float(os.getenv("VIDEO_MAX_MB", "200")) * 1024 * 1024)
+_WORKERS = max(1, int(os.getenv("VIDEO_JOB_WORKERS", "1")))
+TARGET_FPS = float(os.getenv("VIDEO_TARGET_FPS", "15")) or None
+_KEEP_JOBS = int(os.getenv("VIDEO_KEEP_JOBS", "200"))
+# Uploads waiting for a worker (each up to VIDEO_MAX_MB on disk); more are refused
+_MAX_QUEUED = int(os.getenv("VIDEO_MAX_QUEUED", "20"))
+_ML_DIR = Path(__file__).resolve().parent.parent.parent / "ml_models"
+
+# Knee angle (down, up) per exercise: the cut-offs of activity_aggregates._RepTracker, so clip and live rep counts agree
+_REP_KNEE = {"squat": (110, 140), "lunge": (100, 140)}
+_MIN_HOLD_SEC = 1.0  # shorter plank runs aren't reported as holds
+
+
+def available() -> bool:
+    """Whether this deploy can extract landmarks from video (full stack and ml_models present)."""
+    try:
+        import cv2, mediapipe, numpy  # noqa: F401
+    except ImportError:
+        return False
+    return (_ML_DIR / "pose_extractor.py").is_file()
+
+
+@lru_cache(maxsize=None)
+def _extractor():
+    """ml_models/pose_extractor.py, loaded by path so ml_models' modules stay off sys.path."""
+    spec = importlib.util.spec_from_file_location("ml_models_pose_extractor", _ML_DIR / "pose_extractor.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def rep_segments(exercise, knee_angle) -> list:
+    """
+    (exercise, first frame, last frame) per completed squat or lunge rep, as indices
+    into the per-frame arrays. A rep runs from the last frame at rest / at the top
+    to the frame the user is back there, or switches to another exercise (as in the
+    live tracker, state is reset on every switch). Frames without a pose are skipped
+    rather than ending the rep, unlike the live tracker.
+    """
+    segments = []
+    start, down, prev = 0, False, None
+    for i, (ex, knee) in enumerate(zip(exercise, knee_angle)):
+        if not ex:
+            continue
+        if ex != prev:
+            if down:
+                segments.append((prev, start, i))
+                start = i
+            down = False
+        if ex in _REP_KNEE:
+            lo, hi = _REP_KNEE[ex]
+            if knee < lo:
+                down = True
+            elif down and knee > hi:
+                segments.append((ex, start, i))
+                down = False
+        if not down and (ex not in _REP_KNEE or knee > _REP_KNEE[ex][1]):
+            start = i
+        prev = ex
+    return segments
+
+
+def _holds(exercise, name: str) -> list:
+    import numpy as np
+    on = np.concatenate([[False], exercise == name, [False]])
+    edges = np.flatnonzero(on[1:] != on[:-1])
+    return [(name, int(a), int(b) - 1) for a, b in zip(edges[::2], edges[1::2])]
+
+
+def summarize(analysis: dict, frames, fps: float) -> dict:
+    """Clip summary with one entry per rep / hold, from analyze_landmarks_batch output."""
+    import numpy as np
+
+    detected, exercise = analysis["detected"], analysis["exercise"]
+    score, risk, knee = analysis["posture_score"], analysis["injury_risk"], analysis["knee_angle"]
+    sec = np.asarray(frames, dtype=np.float64) / fps
+
+    segments = rep_segments(exercise, knee)
+    segments += [h for h in _holds(exercise, "plank") if sec[h[2]] - sec[h[1]] >= _MIN_HOLD_SEC]
+    segments.sort(key=lambda s: s[1])
+    reps, counts = [], {}
+    for ex, a, b in segments:
+        sl = slice(a, b + 1)
+        on = detected[sl]
+        corrections = {msg: int(mask[sl].sum()) for msg, mask in analysis["corrections"].items() if mask[sl].any()}
+        rep = {
+            "exercise": ex,
+            "kind": "hold" if ex == "plank" else "rep",
+            "index": counts.get(ex, 0) + 1,
+            "start_frame": int(frames[a]),
+            "end_frame": int(frames[b]),
+            "start_sec": round(float(sec[a]), 2),
+            "duration_sec": round(float(sec[b] - sec[a]), 2),
+            "avg_posture_score": round(float(score[sl][on].mean()), 3) if on.any() else None,
+            "max_injury_risk": round(float(risk[sl][on].max()), 3) if on.any() else None,
+            "corrections": dict(sorted(corrections.items(), key=lambda kv: -kv[1])),
+        }
+        if ex in _REP_KNEE:
+            rep["min_knee_angle"] = round(float(np.nanmin(knee[sl])), 1)
+        counts[ex] = rep["index"]
+        reps.append(rep)
+
+    ex_frames = dict(zip(*np.unique(exercise[detected], return_counts=True)))
+    return {
+        "frames": int(len(detected)),
+        "detected_frames": int(detected.sum()),
+        "duration_sec": round(float(sec[-1]), 2) if len(sec) else 0.0,
+        "exercise_frames": {str(k): int(v) for k, v in ex_frames.items()},
+        "rep_counts": counts,
+        "avg_posture_score": round(float(score[detected].mean()), 3) if detected.any() else None,
+        "max_injury_risk": round(float(risk[detected].max()), 3) if detected.any() else None,
+        "reps": reps,
+    }
+
+
+class QueueFull(Exception):
+    """VIDEO_MAX_QUEUED uploads are already waiting for a worker."""
+
+
+def save_upload(src, path: Path) -> int:
+    """Copy an upload to path in 1 MB chunks; ValueError (file removed) beyond MAX_UPLOAD_BYTES."""
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while chunk := src.read(1 << 20):
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise ValueError(f"Video exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return size
+
+
+class VideoJobs:
+    _instance: Optional["VideoJobs"] = None
+
+    @classmethod
+    def get_instance(cls) -> "VideoJobs":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, workers: int = _WORKERS, keep: int = _KEEP_JOBS, max_queued: int = _MAX_QUEUED):
+        self.workers = workers
+        self.keep = keep
+        self.max_queued = max_queued
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._queue: queue.Queue = queue.Queue()
+        self._threads: list = []
+        self._lock = threading.Lock()
+        self._uploading = 0  # uploads being written, counted against max_queued
+
+    def new_upload(self, filename: str) -> tuple[str, Path]:
+        """
+        Job id and the path its upload should be written to. Raises QueueFull when
+        max_queued uploads are already waiting; otherwise a slot is held until
+        submit() or cancel_upload().
+        """
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j["status"] == "queued")
+            if queued + self._uploading >= self.max_queued:
+                raise QueueFull("Too many videos are waiting for analysis, try again later")
+            self._uploading += 1
+        job_id = uuid.uuid4().hex
+        JOB_DIR.mkdir(parents=True, exist_ok=True)
+        return job_id, JOB_DIR / f"{job_id}{Path(filename or '').suffix.lower() or '.mp4'}"
+
+    def cancel_upload(self, path: Path):
+        """Release the slot of an upload that won't be submitted."""
+        path.unlink(missing_ok=True)
+        with self._lock:
+            self._uploading -= 1
+
+    def submit(self, job_id: str, path: Path, filename: str, user: Optional[str] = None,
+               target_fps: Optional[float] = TARGET_FPS) -> dict:
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "filename": filename,
+            "user": user.lower() if user else None,
+            "bytes": path.stat().st_size,
+            "target_fps": target_fps,
+            "created_at": datetime.utcnow().isoformat(),
+            "progress": {"frames": 0, "expected_frames": None, "fraction": 0.0},
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._uploading -= 1
+            self._jobs[job_id] = job
+            self._prune()
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, daemon=True, name=f"video-job-{len(self._threads)}")
+                t.start()
+                self._threads.append(t)
+        self._queue.put((job_id, path))
+        return self.get(job_id)
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond `keep` (queued and running ones stay)."""
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for k in finished[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[k]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, "progress": dict(job["progress"])} if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _work(self):
+        while True:
+            job_id, path = self._queue.get()
+            try:
+                self._run(job_id, path)
+            except Exception as e:
+                print(f"Video job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=datetime.utcnow().isoformat())
+            finally:
+                path.unlink(missing_ok=True)
+
+    def _run(self, job_id: str, path: Path):
+        import cv2
+
+        job = self.get(job_id)
+        if job is None:
+            return
+        self._update(job_id, status="running", started_at=datetime.utcnow().isoformat())
+        progress = self._jobs[job_id]["progress"]
+
+        def report(done: int, expected: int):
+            # Plain dict writes; readers copy under the lock
+            progress["frames"] = done
+            progress["expected_frames"] = max(expected, done)
+            progress["fraction"] = round(min(done / expected, 0.99), 3) if expected else 0.0
+
+        cap = cv2.VideoCapture(str(path))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        t0 = time.perf_counter()
+        landmarks, frames = _extractor().extract_landmarks(path, target_fps=job["target_fps"], progress=report)
+        extract_sec = time.perf_counter() - t0
+        if not len(landmarks):
+            raise RuntimeError("No frames could be decoded from the video")
+        analysis = PostureAnalyzerService.get_instance().analyze_landmarks_batch(landmarks)
+        result = summarize(analysis, frames, fps)
+        result["processing_sec"] = round(time.perf_counter() - t0, 2)
+        result["extract_sec"] = round(extract_sec, 2)
+        progress["fraction"] = 1.0
+        self._update(job_id, status="done", result=result, finished_at=datetime.utcnow().isoformat())
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [j["status"] for j in self._jobs.values()]
+        return {
+            "available": available(),
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            **{s: statuses.count(s) for s in ("queued", "running", "done", "failed")},
+        }
@@ -0,0 +1,110 @@
+"""Frame cache: per-stream keys and single-flight analysis of identical uploads."""
+import asyncio
+
+import pytest
+
+from services.frame_cache import FrameCache, frame_key
+
+
+def test_key_depends_on_bytes_and_stream():
+    assert frame_key(b"jpeg") == frame_key(b"jpeg", None) == frame_key(b"jpeg", "")
+    assert frame_key(b"jpeg", "s1") == frame_key(bytearray(b"jpeg"), "s1")
+    assert frame_key(b"jpeg", "s1") != frame_key(b"jpeg", "s2")
+    assert frame_key(b"jpeg", "s1") != frame_key(b"jpeg")
+    assert frame_key(b"jpeg") != frame_key(b"jpeg2")
+
+
+def counting(result, gate=None):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        if gate is not None:
+            await gate.wait()
+        return dict(result)
+    return compute, calls
+
+
+def test_concurrent_identical_frames_compute_once():
+    async def main():
+        cache = FrameCache(max_entries=4)
+        gate = asyncio.Event()
+        compute, calls = counting({"score": 80}, gate)
+        tasks = [asyncio.create_task(cache.get_or_compute(b"k", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks)
+        assert len(calls) == 1
+        assert [dup for _, dup in results] == [False, True, True]
+        assert all(r == {"score": 80} for r, _ in results)
+        # Later retries are cache hits
+        assert await cache.get_or_compute(b"k", compute) == ({"score": 80}, True)
+        assert len(calls) == 1
+        stats = cache.stats()
+        assert (stats["requests"], stats["hits"], stats["collapsed"]) == (4, 1, 2)
+    asyncio.run(main())
+
+
+def test_streams_do_not_share_results():
+    async def main():
+        cache = FrameCache(max_entries=4)
+        compute, calls = counting({"score": 80})
+        _, dup1 = await cache.get_or_compute(frame_key(b"jpeg", "s1"), compute)
+        _, dup2 = await cache.get_or_compute(frame_key(b"jpeg", "s2"), compute)
+        assert (dup1, dup2) == (False, False) and len(calls) == 2
+    asyncio.run(main())
+
+
+def test_errors_are_not_cached():
+    async def main():
+        cache = FrameCache(max_entries=4)
+        compute, calls = counting({"error": "no pose"})
+        await cache.get_or_compute(b"k", compute)
+        result, dup = await cache.get_or_compute(b"k", compute)
+        assert result == {"error": "no pose"} and dup is False and len(calls) == 2
+    asyncio.run(main())
+
+
+def test_failure_reaches_waiters_and_is_retried():
+    async def main():
+        cache = FrameCache(max_entries=4)
+        gate = asyncio.Event()
+
+        async def failing():
+            await gate.wait()
+            raise ValueError("decode failed")
+        tasks = [asyncio.create_task(cache.get_or_compute(b"k", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        gate.set()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(o, ValueError) for o in outcomes)
+        compute, calls = counting({"score": 1})
+        assert await cache.get_or_compute(b"k", compute) == ({"score": 1}, False)
+    asyncio.run(main())
+
+
+def test_cancelled_leader_hands_over_to_waiter():
+    async def main():
+        cache = FrameCache(max_entries=4)
+        gate = asyncio.Event()
+        compute, calls = counting({"score": 5}, gate)
+        leader = asyncio.create_task(cache.get_or_compute(b"k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute(b"k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await waiter == ({"score": 5}, False)
+        assert len(calls) == 2
+    asyncio.run(main())
+
+
+def test_lru_bound():
+    cache = FrameCache(max_entries=2)
+    for k in (b"a", b"b", b"c"):
+        cache.put(k, {"k": k})
+    assert cache.get(b"a") is None and cache.get(b"c") == {"k": b"c"}
+    assert cache.evictions == 1
@@ -0,0 +1,59 @@
+"""Ingest admission: oversized requests get 413, devices over their rate get 429 + Retry-After."""
+import pytest
+from fastapi.testclient import TestClient
+
+import api.iot as iot
+from services.admission import AdmissionController
+from services.iot_simulator import IoTDataStore
+
+
+def reading(device_id="dev-1"):
+    return {"device_id": device_id, "accel_x": 0.1, "accel_y": 0.2, "accel_z": 9.8,
+            "gyro_x": 0.0, "gyro_y": 0.0, "gyro_z": 0.0, "heart_rate": 72.0}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+    monkeypatch.setattr(AdmissionController, "_instance", AdmissionController(rate=0.01, burst=3.0))
+    yield TestClient(main.app)
+    IoTDataStore.clear()
+
+
+def test_burst_then_rate_limited(client):
+    for _ in range(3):
+        assert client.post("/api/iot/ingest", json=reading()).status_code == 200
+    r = client.post("/api/iot/ingest", json=reading())
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    # Other devices keep their own bucket
+    assert client.post("/api/iot/ingest", json=reading("dev-2")).status_code == 200
+    stats = client.get("/api/iot/admission").json()["devices"]
+    assert stats["dev-1"] == {"accepted": 3, "rate_limited": 1, "oversized": 0}
+
+
+def test_rejected_batch_charges_no_device(client):
+    batch = {"readings": [reading("a"), reading("a"), reading("b"), reading("b"), reading("b"), reading("b")]}
+    r = client.post("/api/iot/ingest/batch", json=batch)
+    assert r.status_code == 413  # 4 readings from "b" can never fit a burst of 3
+    batch = {"readings": [reading("a"), reading("a"), reading("b"), reading("b"), reading("b")]}
+    assert client.post("/api/iot/ingest/batch", json=batch).json() == {"received": 5}
+    r = client.post("/api/iot/ingest/batch", json={"readings": [reading("a"), reading("b")]})
+    assert r.status_code == 429 and "Retry-After" in r.headers
+    # "a" was refunded when "b" was refused, so its one remaining token is still there
+    assert client.post("/api/iot/ingest", json=reading("a")).status_code == 200
+
+
+def test_oversized_batch_is_413(client, monkeypatch):
+    monkeypatch.setattr(iot, "MAX_BATCH", 2)
+    r = client.post("/api/iot/ingest/batch", json={"readings": [reading()] * 3})
+    assert r.status_code == 413
+    assert client.get("/api/iot/admission").json()["devices"]["dev-1"]["oversized"] == 3
+
+
+def test_oversized_body_is_413_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(iot, "MAX_BODY_BYTES", 64)
+    r = client.post("/api/iot/ingest", content=b"{" + b" " * 100 + b"}",
+                    headers={"content-type": "application/json", "x-device-id": "big"})
+    assert r.status_code == 413
+    assert client.get("/api/iot/admission").json()["devices"]["big"]["oversized"] == 1
@@ -0,0 +1,92 @@
+"""Profile cache: TTL/LRU bounds, and the users API keeps it in step with storage writes."""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import db.storage as storage_mod
+from db.memory_store import MemoryStorage
+from services.profile_cache import ProfileCache
+
+
+def test_keys_are_case_insensitive_and_invalidate():
+    cache = ProfileCache(max_entries=10, ttl=60)
+    cache.put("Ann@Example.com", {"email": "ann@example.com", "settings": {"api_url": "x"}})
+    assert cache.get("ANN@example.com")["email"] == "ann@example.com"
+    cache.invalidate("ann@EXAMPLE.com")
+    assert cache.get("ann@example.com") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_returned_profiles_are_copies():
+    cache = ProfileCache(max_entries=10, ttl=60)
+    cache.put("a@x.com", {"name": "A", "settings": {"api_url": "x"}})
+    got = cache.get("a@x.com")
+    got["name"] = "changed"
+    got["settings"]["api_url"] = "changed"
+    assert cache.get("a@x.com") == {"name": "A", "settings": {"api_url": "x"}}
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.profile_cache.time.monotonic", lambda: now[0])
+    cache = ProfileCache(max_entries=10, ttl=5)
+    cache.put("a@x.com", {"name": "A"})
+    now[0] += 4
+    assert cache.get("a@x.com") is not None
+    now[0] += 2
+    assert cache.get("a@x.com") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = ProfileCache(max_entries=2, ttl=60)
+    cache.put("a@x.com", {"name": "A"})
+    cache.put("b@x.com", {"name": "B"})
+    cache.get("a@x.com")
+    cache.put("c@x.com", {"name": "C"})
+    assert cache.get("b@x.com") is None
+    assert cache.get("a@x.com") and cache.get("c@x.com")
+    assert cache.evictions == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+    storage = MemoryStorage()
+    asyncio.run(storage.connect())
+    monkeypatch.setattr(storage_mod, "_storage", storage)
+    monkeypatch.setattr(ProfileCache, "_instance", ProfileCache(max_entries=10, ttl=60))
+    yield TestClient(main.app), storage
+
+
+def test_updates_write_through(client):
+    client, _ = client
+    headers = {"X-User-Email": "Ann@Example.com"}
+    client.post("/api/users/login", json={"email": "ann@example.com", "name": "Ann"})
+    assert client.get("/api/users/me", headers=headers).json()["name"] == "Ann"
+
+    client.patch("/api/users/me", json={"name": "Ann B"}, headers=headers)
+    assert client.get("/api/users/me", headers=headers).json()["name"] == "Ann B"
+
+    client.patch("/api/users/me/settings", json={"api_url": "http://new"}, headers=headers)
+    assert client.get("/api/users/me/settings", headers=headers).json()["api_url"] == "http://new"
+    assert client.get("/api/users/me", headers=headers).json()["settings"]["api_url"] == "http://new"
+
+
+def test_failed_write_invalidates(client, monkeypatch):
+    client, storage = client
+    headers = {"X-User-Email": "ann@example.com"}
+    client.post("/api/users/login", json={"email": "ann@example.com", "name": "Ann"})
+    assert client.get("/api/users/me", headers=headers).json()["name"] == "Ann"
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("write lost")
+    with monkeypatch.context() as m:
+        m.setattr(storage.users, "update", broken)
+        client.patch("/api/users/me", json={"name": "Ann B"}, headers=headers)
+    assert ProfileCache.get_instance().get("ann@example.com") is None
+
+    # Next read goes back to storage (and refills the cache)
+    assert client.get("/api/users/me", headers=headers).json()["id"]
+    assert ProfileCache.get_instance().get("ann@example.com")["name"] == "Ann"
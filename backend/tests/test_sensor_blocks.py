@@ -0,0 +1,59 @@
+"""Sealed sensor blocks: quantize + delta + zlib must round-trip within quantization steps."""
+import math
+
+from services.sensor_blocks import DeviceHistory, SealedBlock, ts_ms
+
+
+def reading(i, accel=None, heart_rate=72.0):
+    return {
+        "accel": accel or [0.1 * i, -9.81, 0.003],
+        "gyro": [0.5, -0.25, 0.001 * i],
+        "heart_rate": heart_rate,
+        "timestamp": f"2024-01-01T00:00:{i:02d}.250",
+    }
+
+
+def test_round_trip_within_quantization():
+    rows = [reading(i) for i in range(20)]
+    block = SealedBlock(rows)
+    assert block.n == 20
+    assert block.t_min == ts_ms(rows[0]["timestamp"]) and block.t_max == ts_ms(rows[-1]["timestamp"])
+    for src, out in zip(rows, block.decode()):
+        assert out["timestamp"] == src["timestamp"][:23]
+        assert all(abs(a - b) <= 0.0005 for a, b in zip(out["accel"], src["accel"]))
+        assert all(abs(a - b) <= 0.0005 for a, b in zip(out["gyro"], src["gyro"]))
+        assert out["heart_rate"] == src["heart_rate"]
+
+
+def test_missing_and_non_finite_values():
+    rows = [
+        reading(0, heart_rate=None),
+        reading(1, accel=[math.nan, math.inf, -math.inf], heart_rate=math.nan),
+        reading(2, heart_rate=0.0),
+    ]
+    out = SealedBlock(rows).decode()
+    assert out[0]["heart_rate"] is None
+    assert all(math.isnan(v) for v in out[1]["accel"])
+    assert out[1]["heart_rate"] is None
+    assert out[2]["heart_rate"] == 0.0
+
+
+def test_negative_heart_rate_is_not_the_missing_sentinel():
+    # -0.1 bpm quantizes to -1, which used to be the "no heart rate" marker
+    out = SealedBlock([reading(0, heart_rate=-0.1), reading(1, heart_rate=-1e12)]).decode()
+    assert out[0]["heart_rate"] == -0.1
+    assert out[1]["heart_rate"] is not None and out[1]["heart_rate"] < 0
+
+
+def test_history_serves_sealed_and_hot_readings_in_order():
+    history = DeviceHistory(hot_size=5, block_size=10, max_blocks=2)
+    rows = [reading(i) for i in range(40)]
+    for r in rows:
+        history.append(r)
+    stats = history.stats()
+    assert stats["blocks"] == 2 and stats["hot_readings"] == 10 and len(history) == 30
+    assert [r["timestamp"] for r in history.recent(25)] == [r["timestamp"][:23] for r in rows[15:30]] + \
+        [r["timestamp"] for r in rows[30:]]
+    start, end = ts_ms(rows[22]["timestamp"]), ts_ms(rows[35]["timestamp"])
+    # Only the second block overlaps, plus the hot tail
+    assert len(list(history.iter_range(start, end))) == 20
@@ -0,0 +1,178 @@
+"""Repository contract: every storage backend accepts and returns the same shapes."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import db.mongo as mongo
+import db.storage as storage_mod
+from db.memory_store import MemoryStorage
+from db.repository import DuplicateUser
+from db.sqlite_store import SqliteStorage
+
+BACKENDS = ["memory", "sqlite", "mongo"]
+
+
+async def _open(backend: str, tmp_path):
+    if backend == "memory":
+        storage = MemoryStorage()
+    elif backend == "sqlite":
+        storage = SqliteStorage(str(tmp_path / "contract.db"))
+    else:
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        storage = mongo.MongoStorage()
+        mongo._client = mongomock_motor.AsyncMongoMockClient()
+        mongo._db = mongo._client.get_database("neuroposture")
+    await storage.connect()
+    await storage.ensure_indexes()
+    return storage
+
+
+def run(backend, tmp_path, body):
+    async def main():
+        storage = await _open(backend, tmp_path)
+        try:
+            await body(storage)
+        finally:
+            await storage.close()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_users(backend, tmp_path):
+    async def body(s):
+        created = await s.users.insert({"email": "Ann@Example.com", "name": "Ann", "password": "hash"})
+        assert created["email"] == "ann@example.com" and "_id" in created and "password" not in created
+        with pytest.raises(DuplicateUser):
+            await s.users.insert({"email": "ann@example.com", "name": "Other"})
+        found = await s.users.find_by_email("ANN@example.com")
+        assert found["name"] == "Ann" and "password" not in found
+        assert await s.users.find_by_email("nobody@example.com") is None
+
+        first = await s.users.get_or_create("bob@example.com", {"name": "Bob"})
+        again = await s.users.get_or_create("BOB@example.com", {"name": "Changed"})
+        assert first["name"] == again["name"] == "Bob"
+
+        updated = await s.users.update("ann@example.com", {"settings.api_url": "http://x", "name": "Ann B"})
+        assert updated["name"] == "Ann B" and updated["settings"] == {"api_url": "http://x"}
+        assert "password" not in updated
+        assert await s.users.update("ghost@example.com", {"name": "G"}) is None
+        upserted = await s.users.update("ghost@example.com", {"name": "G"}, upsert=True)
+        assert upserted["email"] == "ghost@example.com" and upserted["name"] == "G"
+    run(backend, tmp_path, body)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_devices(backend, tmp_path):
+    async def body(s):
+        await s.devices.upsert_many([
+            {"id": "a", "name": "A", "type": "esp32", "connected": True, "last_seen": "2026-01-01T00:00:00"},
+            {"id": "b", "name": "B", "type": "esp32", "connected": False, "last_seen": None},
+        ])
+        await s.devices.upsert_many([{"id": "a", "name": "A2", "type": "esp32", "connected": False, "last_seen": None}])
+        await s.devices.upsert_many([])
+        docs = sorted(await s.devices.all(), key=lambda d: d["id"])
+        assert [d["id"] for d in docs] == ["a", "b"]
+        assert docs[0]["name"] == "A2" and docs[0]["connected"] is False
+        assert "_id" not in docs[0]
+    run(backend, tmp_path, body)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sensor_ranges(backend, tmp_path):
+    async def body(s):
+        t0 = datetime(2026, 1, 1)
+        docs = [
+            {"device_id": "d1", "ts": t0 + timedelta(seconds=i), "timestamp": None,
+             "accel": [float(i), 0.0, 9.8], "gyro": [0.0, 0.0, 0.0], "heart_rate": None}
+            for i in reversed(range(10))
+        ]
+        await s.sensors.insert_many(docs)
+        await s.sensors.insert_many([{**docs[0], "device_id": "d2"}])
+        await s.sensors.insert_many([])
+
+        batches = [b async for b in s.sensors.iter_range("d1", batch_size=4)]
+        assert [len(b) for b in batches] == [4, 4, 2]
+        rows = [r for b in batches for r in b]
+        assert [r["ts"] for r in rows] == [t0 + timedelta(seconds=i) for i in range(10)]
+        assert rows[3]["accel"] == [3.0, 0.0, 9.8] and "_id" not in rows[0]
+
+        window = [r async for b in s.sensors.iter_range("d1", t0 + timedelta(seconds=2), t0 + timedelta(seconds=5))
+                  for r in b]
+        assert [r["accel"][0] for r in window] == [2.0, 3.0, 4.0]
+        assert [b async for b in s.sensors.iter_range("missing")] == []
+    run(backend, tmp_path, body)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sessions(backend, tmp_path):
+    async def body(s):
+        await s.sessions.save({"id": "s1", "user": "ann@example.com", "started_at": "2026-01-01T10:00:00"})
+        await s.sessions.save({"id": "s2", "user": "ann@example.com", "started_at": "2026-01-02T10:00:00"})
+        await s.sessions.save({"id": "s3", "user": "bob@example.com", "started_at": "2026-01-03T10:00:00"})
+        await s.sessions.save({"id": "s1", "user": "ann@example.com", "started_at": "2026-01-01T10:00:00", "frames": 3})
+        assert (await s.sessions.get("s1"))["frames"] == 3
+        assert await s.sessions.get("nope") is None
+        assert [d["id"] for d in await s.sessions.list_for_user("ann@example.com")] == ["s2", "s1"]
+        assert [d["id"] for d in await s.sessions.list_for_user("ann@example.com", limit=1)] == ["s2"]
+
+        await s.sessions.append_chunk("s1", 1, b"second")
+        await s.sessions.append_chunk("s1", 0, b"first")
+        await s.sessions.append_chunk("s1", 1, b"second-retry")
+        assert await s.sessions.chunks("s1") == [b"first", b"second-retry"]
+        assert await s.sessions.chunks("s2") == []
+    run(backend, tmp_path, body)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_ping(backend, tmp_path):
+    async def body(s):
+        await s.ping()
+    run(backend, tmp_path, body)
+
+
+def test_breaker_ignores_non_outage_errors(monkeypatch):
+    breaker = mongo.CircuitBreaker(threshold=2, probe_interval=0.01)
+    monkeypatch.setattr(mongo, "breaker", breaker)
+
+    async def duplicate():
+        raise DuplicateUser("ann@example.com")
+
+    async def stalled():
+        await asyncio.sleep(1)
+
+    async def main():
+        for _ in range(5):
+            with pytest.raises(DuplicateUser):
+                await mongo.guarded(duplicate)
+        assert breaker.state == "closed"
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await mongo.guarded(stalled, timeout=0.01)
+        assert breaker.state == "open"
+        with pytest.raises(mongo.DatabaseUnavailable):
+            await mongo.guarded(duplicate)
+        breaker.reset()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_breaker_probe_recovers_without_mongo(backend, tmp_path, monkeypatch):
+    breaker = mongo.CircuitBreaker(threshold=1, probe_interval=0.01)
+    monkeypatch.setattr(mongo, "breaker", breaker)
+
+    async def main():
+        storage = await _open(backend, tmp_path)
+        monkeypatch.setattr(storage_mod, "_storage", storage)
+        try:
+            breaker.record_failure()
+            assert breaker.state == "open"
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if breaker.state == "closed":
+                    break
+            assert breaker.state == "closed"
+        finally:
+            breaker.reset()
+            await storage.close()
+    asyncio.run(main())
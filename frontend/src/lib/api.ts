@@ -34,6 +34,14 @@ export async function postApi<T>(path: string, body: unknown): Promise<T> {
   })
 }
 
+export async function postApiWithAuth<T>(path: string, body: unknown, headers?: Record<string, string>): Promise<T> {
+  return fetchApiWithAuth<T>(path, {
+    method: 'POST',
+    body: JSON.stringify(body),
+    headers,
+  })
+}
+
 export async function patchApiWithAuth<T>(path: string, body: unknown): Promise<T> {
   return fetchApiWithAuth<T>(path, {
     method: 'PATCH',
@@ -55,6 +63,22 @@ export const listDevices = () => fetchApi<{ id: string; name: string; type?: str
 export const registerDevice = (data: { id: string; name: string; type: string; connected?: boolean }) =>
   postApi('/devices/register', { ...data, connected: data.connected ?? false })
 export const getIotRisk = (deviceId: string) => fetchApi(`/iot/${deviceId}/risk`)
+export const getDashboardSummary = () =>
+  fetchApiWithAuth<{
+    health: { status: string }
+    devices: { id: string; name: string; type?: string; connected: boolean }[]
+    connected_devices: number
+    device_id: string
+    risk: unknown
+    history: unknown[]
+    activity: {
+      sessions: number
+      reps: Record<string, number>
+      total_reps: number
+      avg_posture_score: number | null
+      total_time_under_tension_sec: number
+    } | null
+  }>('/dashboard/summary')
 export const getIotHistory = (deviceId: string, limit = 50) =>
   fetchApi(`/iot/${deviceId}/history?limit=${limit}`)
 export const ingestSensor = (data: {
@@ -67,8 +91,9 @@ export const ingestSensor = (data: {
   gyro_z: number
   heart_rate?: number
 }) => postApi('/iot/ingest', data)
-export const analyzePosture = (imageBase64: string) =>
-  postApi('/posture/analyze/base64', { image: imageBase64 })
+// sessionId names the frame stream, so the server can track the pose between frames
+export const analyzePosture = (imageBase64: string, sessionId?: string) =>
+  postApiWithAuth('/posture/analyze/base64', { image: imageBase64 }, sessionId ? { 'X-Session-Id': sessionId } : undefined)
 export const analyzeLandmarks = (landmarks: number[][]) =>
   postApi('/posture/analyze/landmarks', {
     landmarks: landmarks.map(([x, y, z]) => ({ x, y, z, visibility: 1 })),
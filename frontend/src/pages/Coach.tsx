@@ -4,10 +4,18 @@ import { listExercises, analyzePosture } from '../lib/api'
 
 type Exercise = { id: string; name: string; description?: string }
 
+// Frames this far apart are all keyframes on the server (POSE_TRACK_STALE_SEC); the motion gate and crop still apply
+const ANALYSIS_INTERVAL_MS = 1500
+
+function newSessionId(): string {
+  return crypto.randomUUID?.() ?? `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+}
+
 export default function Coach() {
   const videoRef = useRef<HTMLVideoElement>(null)
   const canvasRef = useRef<HTMLCanvasElement>(null)
   const intervalRef = useRef<ReturnType<typeof setInterval> | null>(null)
+  const sessionIdRef = useRef<string | null>(null)
   const [stream, setStream] = useState<MediaStream | null>(null)
   const [exercises, setExercises] = useState<Exercise[]>([])
   const [selected, setSelected] = useState<string | null>(null)
@@ -47,6 +55,7 @@ export default function Coach() {
       clearInterval(intervalRef.current)
       intervalRef.current = null
     }
+    sessionIdRef.current = null
     stream?.getTracks().forEach((t) => t.stop())
     setStream(null)
     setActive(false)
@@ -68,7 +77,7 @@ export default function Coach() {
     if (!base64) return
 
     try {
-      const res = (await analyzePosture(base64)) as { injury_risk?: number; posture_score?: number; corrections?: string[]; exercise?: string }
+      const res = (await analyzePosture(base64, sessionIdRef.current ?? undefined)) as { injury_risk?: number; posture_score?: number; corrections?: string[]; exercise?: string }
       setFeedback({
         injury_risk: res.injury_risk,
         posture_score: res.posture_score,
@@ -84,9 +93,10 @@ export default function Coach() {
     if (!stream) {
       await startCamera()
     }
+    sessionIdRef.current = newSessionId()
     setActive(true)
     runAnalysis()
-    const id = setInterval(runAnalysis, 1500)
+    const id = setInterval(runAnalysis, ANALYSIS_INTERVAL_MS)
     intervalRef.current = id
   }, [stream, startCamera, runAnalysis])
 
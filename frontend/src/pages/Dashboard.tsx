@@ -2,7 +2,7 @@ import { useEffect, useState } from 'react'
 import { Link } from 'react-router-dom'
 import { Activity, AlertTriangle, TrendingUp, Zap, User } from 'lucide-react'
 import { BarChart, Bar, XAxis, YAxis, ResponsiveContainer } from 'recharts'
-import { health, listDevices, getIotRisk } from '../lib/api'
+import { getDashboardSummary } from '../lib/api'
 
 type Health = { status: string }
 type Device = { id: string; name: string; connected: boolean }
@@ -14,11 +14,19 @@ type Risk = {
   knee_stress?: number
   fatigue_index?: number
 }
+type ActivitySummary = {
+  sessions: number
+  reps: Record<string, number>
+  total_reps: number
+  avg_posture_score: number | null
+  total_time_under_tension_sec: number
+}
 
 export default function Dashboard() {
   const [healthStatus, setHealthStatus] = useState<Health | null>(null)
   const [devices, setDevices] = useState<Device[]>([])
   const [risk, setRisk] = useState<Risk | null>(null)
+  const [activity, setActivity] = useState<ActivitySummary | null>(null)
   const [chartData] = useState([
     { name: 'Mon', stress: 0.3, fatigue: 0.2 },
     { name: 'Tue', stress: 0.5, fatigue: 0.4 },
@@ -30,15 +38,22 @@ export default function Dashboard() {
   ])
 
   useEffect(() => {
-    health().then(setHealthStatus).catch(() => setHealthStatus({ status: 'offline' }))
-    listDevices().then(setDevices).catch(() => setDevices([]))
+    // one request: health, devices and risk are served from server-side aggregates
+    getDashboardSummary()
+      .then((s) => {
+        setHealthStatus(s.health)
+        setDevices(s.devices)
+        setRisk(s.risk as Risk)
+        setActivity(s.activity)
+      })
+      .catch(() => {
+        setHealthStatus({ status: 'offline' })
+        setDevices([])
+        setRisk(null)
+        setActivity(null)
+      })
   }, [])
 
-  useEffect(() => {
-    const deviceId = devices[0]?.id ?? 'esp32-demo-1'
-    getIotRisk(deviceId).then((r) => setRisk(r as Risk)).catch(() => setRisk(null))
-  }, [devices])
-
   const connectedCount = devices.filter((d) => d.connected).length
 
   return (
@@ -172,6 +187,41 @@ export default function Dashboard() {
         </div>
       </div>
 
+      {activity ? (
+        <div className="rounded-xl bg-slate-800/50 border border-slate-700/50 p-6">
+          <h2 className="font-semibold text-white mb-4">Your Activity</h2>
+          <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
+            <div>
+              <p className="text-slate-400 text-sm">Sessions</p>
+              <p className="text-xl font-semibold text-white mt-1">{activity.sessions}</p>
+            </div>
+            <div>
+              <p className="text-slate-400 text-sm">Reps</p>
+              <p className="text-xl font-semibold text-white mt-1">{activity.total_reps}</p>
+            </div>
+            <div>
+              <p className="text-slate-400 text-sm">Avg Posture Score</p>
+              <p className="text-xl font-semibold text-white mt-1">
+                {activity.avg_posture_score != null ? `${Math.round(activity.avg_posture_score * 100)}%` : '—'}
+              </p>
+            </div>
+            <div>
+              <p className="text-slate-400 text-sm">Time Under Tension</p>
+              <p className="text-xl font-semibold text-white mt-1">{Math.round(activity.total_time_under_tension_sec)} s</p>
+            </div>
+          </div>
+          {Object.keys(activity.reps).length ? (
+            <ul className="mt-4 flex flex-wrap gap-3">
+              {Object.entries(activity.reps).map(([exercise, count]) => (
+                <li key={exercise} className="px-3 py-1 rounded-lg bg-slate-700/30 text-slate-300 text-sm capitalize">
+                  {exercise.replace('_', ' ')}: {count}
+                </li>
+              ))}
+            </ul>
+          ) : null}
+        </div>
+      ) : null}
+
       {risk?.recommendations?.length ? (
         <div className="rounded-xl bg-slate-800/50 border border-slate-700/50 p-6">
           <h2 className="font-semibold text-white mb-4">AI Recommendations</h2>
@@ -0,0 +1,172 @@
+"""
+Bulk landmark extraction for a video library.
+
+Videos (found under directories, or listed in a manifest) are spread over a
+process pool; each worker keeps one PoseLandmarker for its whole life. A
+video's landmarks are appended to the columnar dataset (dataset.py) as soon as
+it finishes, and recorded in <out>/extract_checkpoint.json, so an interrupted
+run picks up where it stopped.
+
+    python bulk_extract.py videos/ --out data/landmarks          # label = parent dir name
+    python bulk_extract.py videos.csv -j 8                       # manifest: path,label[,session]
+
+Manifests are CSV or JSON lines with `path`, optional `label` and `session`;
+relative paths are resolved against the manifest's directory.
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from dataset import DEFAULT_DIR, LandmarkDataset
+
+VIDEO_EXTS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+CHECKPOINT = "extract_checkpoint.json"
+
+
+class Video(NamedTuple):
+    path: Path
+    label: str
+    session: str  # dataset session name; also the checkpoint key
+
+
+def find_videos(inputs: list, label: Optional[str] = None) -> list:
+    videos = []
+    for inp in inputs:
+        inp = Path(inp)
+        if inp.suffix.lower() in (".csv", ".jsonl", ".json"):
+            videos.extend(read_manifest(inp, label))
+        elif inp.is_dir():
+            for p in sorted(inp.rglob("*")):
+                if p.suffix.lower() in VIDEO_EXTS:
+                    videos.append(Video(p, label or p.parent.name, str(p.relative_to(inp))))
+        else:
+            videos.append(Video(inp, label or inp.parent.name, inp.name))
+    return videos
+
+
+def read_manifest(path: Path, label: Optional[str] = None) -> list:
+    if path.suffix.lower() == ".csv":
+        import pandas as pd
+        records = pd.read_csv(path, dtype=str).fillna("").to_dict("records")
+    else:
+        records = [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+    videos = []
+    for r in records:
+        p = Path(r["path"])
+        full = p if p.is_absolute() else path.parent / p
+        videos.append(Video(full, r.get("label") or label or full.parent.name, r.get("session") or r["path"]))
+    return videos
+
+
+# --- worker process ---
+
+_landmarker = None
+
+
+def _init_worker():
+    global _landmarker
+    from pose_extractor import VideoLandmarker
+    try:
+        _landmarker = VideoLandmarker()
+    except RuntimeError:
+        _landmarker = None
+
+
+def _extract(video: Video, max_frames: Optional[int], target_fps: Optional[float]) -> tuple:
+    from pose_extractor import extract_landmarks
+    if _landmarker is None:
+        raise RuntimeError("Could not initialise MediaPipe pose landmarker")
+    t0 = time.perf_counter()
+    landmarks, frames = extract_landmarks(video.path, _landmarker, max_frames, target_fps)
+    return landmarks, frames, time.perf_counter() - t0
+
+
+# --- coordinator ---
+
+def _load_checkpoint(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {"done": {}, "failed": {}}
+
+
+def _save_checkpoint(path: Path, ckpt: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(ckpt, indent=1))
+    os.replace(tmp, path)
+
+
+def bulk_extract(videos: list, out_dir=DEFAULT_DIR, workers: Optional[int] = None,
+                 max_frames: Optional[int] = None, target_fps: Optional[float] = None) -> dict:
+    """Extract every video not yet in the dataset; returns the checkpoint."""
+    dataset = LandmarkDataset(out_dir)
+    ckpt_path = Path(out_dir) / CHECKPOINT
+    ckpt = _load_checkpoint(ckpt_path)
+    # A video appended just before an interruption may be missing from the checkpoint
+    done = set(ckpt["done"]) | set(dataset.sessions)
+    todo = [v for v in videos if v.session not in done]
+    skipped = len(videos) - len(todo)
+    if skipped:
+        print(f"Skipping {skipped} video(s) already extracted")
+    if not todo:
+        return ckpt
+    # Largest files first, so one long video does not start last and run alone
+    todo.sort(key=lambda v: v.path.stat().st_size if v.path.exists() else 0, reverse=True)
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    t0, frames = time.perf_counter(), 0
+    # spawn: MediaPipe's threads don't survive fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        jobs = {pool.submit(_extract, v, max_frames, target_fps): v for v in todo}
+        try:
+            for i, job in enumerate(as_completed(jobs), 1):
+                v = jobs[job]
+                try:
+                    landmarks, frame_numbers, secs = job.result()
+                except Exception as e:
+                    ckpt["failed"][v.session] = {"path": str(v.path), "error": str(e)}
+                    print(f"[{i}/{len(todo)}] {v.session}: FAILED ({e})")
+                else:
+                    dataset.append(landmarks, labels=v.label, sessions=v.session, frames=frame_numbers)
+                    detected = int((~np.isnan(landmarks[:, 0, 0])).sum()) if len(landmarks) else 0
+                    ckpt["done"][v.session] = {
+                        "path": str(v.path), "label": v.label, "frames": len(landmarks),
+                        "detected": detected, "sec": round(secs, 2),
+                        "at": datetime.now(timezone.utc).isoformat(),
+                    }
+                    ckpt["failed"].pop(v.session, None)
+                    frames += len(landmarks)
+                    print(f"[{i}/{len(todo)}] {v.session}: {len(landmarks)} frames in {secs:.1f}s")
+                _save_checkpoint(ckpt_path, ckpt)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("Interrupted; run again to resume")
+            raise
+    elapsed = time.perf_counter() - t0
+    print(f"{frames} frames from {len(todo)} video(s) in {elapsed:.1f}s "
+          f"({frames / elapsed:.0f} frames/s with {workers} worker(s))")
+    return ckpt
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract landmarks from many videos in parallel")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories, or manifests (.csv / .jsonl)")
+    parser.add_argument("--out", "-o", default=str(DEFAULT_DIR), help="Dataset directory")
+    parser.add_argument("--label", "-l", default=None, help="Label for videos without one (default: parent dir name)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--target-fps", type=float, default=None, help="Process only this many frames per second")
+    args = parser.parse_args()
+    bulk_extract(find_videos(args.inputs, args.label), args.out, args.jobs, args.max_frames, args.target_fps)
@@ -0,0 +1,463 @@
+"""
+Columnar landmark dataset: float32 (N, 33, 3) landmarks plus label / frame /
+session / timestamp columns stored as .npy files, loaded memory-mapped.
+
+Layout of a dataset directory:
+    meta.json                 label and session vocabularies, list of parts,
+                              converted CSVs by content hash
+    part-00000/landmarks.npy  (n, 33, 3) float32
+    part-00000/label.npy      (n,) int16 codes into meta["labels"]
+    part-00000/session.npy    (n,) int32 codes into meta["sessions"]
+    part-00000/frame.npy      (n,) int32
+    part-00000/timestamp.npy  (n,) float64 epoch seconds (NaN if unknown)
+
+Appends write a new part, so existing files are never rewritten; `compact()`
+merges parts. Convert existing CSVs with:
+    python dataset.py convert data/ --out data/landmarks
+CSVs already converted (same content) are skipped, so this can be re-run after
+recording more.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from utils import LANDMARK_COLUMNS, N_LANDMARKS, feature_matrix, landmark_array
+
+COLUMNS = ("landmarks", "label", "session", "frame", "timestamp")
+_DTYPES = {"label": np.int16, "session": np.int32, "frame": np.int32, "timestamp": np.float64}
+DEFAULT_DIR = Path(__file__).parent / "data" / "landmarks"
+
+
+class LandmarkDataset:
+    def __init__(self, root):
+        self.root = Path(root)
+        meta_path = self.root / "meta.json"
+        if meta_path.exists():
+            self.meta = json.loads(meta_path.read_text())
+        else:
+            self.meta = {"version": 1, "labels": [], "sessions": [], "parts": [], "next_part": 0, "sources": {}}
+
+    @staticmethod
+    def exists(root) -> bool:
+        return (Path(root) / "meta.json").exists()
+
+    def __len__(self) -> int:
+        return sum(p["rows"] for p in self.meta["parts"])
+
+    @property
+    def labels(self) -> list:
+        return self.meta["labels"]
+
+    @property
+    def sessions(self) -> list:
+        return self.meta["sessions"]
+
+    def tracks_sources(self) -> bool:
+        """Whether converted CSVs are recorded (datasets converted before that was added don't)."""
+        return "sources" in self.meta
+
+    def has_source(self, digest: str) -> bool:
+        return digest in self.meta.get("sources", {})
+
+    def add_source(self, digest: str, path):
+        """Record a converted CSV: {sha256 of its content: path}."""
+        self.meta.setdefault("sources", {})[digest] = str(path)
+        self._save_meta()
+
+    def _save_meta(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / "meta.json.tmp"
+        tmp.write_text(json.dumps(self.meta, indent=1))
+        os.replace(tmp, self.root / "meta.json")
+
+    def _codes(self, vocab_key: str, values, n: int, dtype) -> np.ndarray:
+        vocab = self.meta[vocab_key]
+        index = {v: i for i, v in enumerate(vocab)}
+        if values is None:
+            values = [""] * n
+        elif isinstance(values, str):
+            values = [values] * n
+        uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        for u in uniques:
+            if u not in index:
+                index[u] = len(vocab)
+                vocab.append(str(u))
+        return np.array([index[u] for u in uniques], dtype=dtype)[inverse]
+
+    def append(self, landmarks: np.ndarray, labels=None, sessions=None, frames=None, timestamps=None):
+        """Write one new part. labels / sessions may be a single string or one per row."""
+        landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, N_LANDMARKS, 3)
+        n = len(landmarks)
+        if n == 0:
+            return
+        cols = {
+            "landmarks": landmarks,
+            "label": self._codes("labels", labels, n, _DTYPES["label"]),
+            "session": self._codes("sessions", sessions, n, _DTYPES["session"]),
+            "frame": np.arange(n, dtype=np.int32) if frames is None else np.asarray(frames, dtype=np.int32),
+            "timestamp": np.full(n, np.nan) if timestamps is None else np.asarray(timestamps, dtype=np.float64),
+        }
+        name = self._next_part_name()
+        part_dir = self.root / name
+        part_dir.mkdir(parents=True)
+        for col, arr in cols.items():
+            np.save(part_dir / f"{col}.npy", arr)
+        # The part only becomes visible once meta.json lists it
+        self.meta["parts"].append({"name": name, "rows": n})
+        self._save_meta()
+
+    def _next_part_name(self) -> str:
+        i = self.meta.get("next_part", len(self.meta["parts"]))
+        self.meta["next_part"] = i + 1
+        return f"part-{i:05d}"
+
+    def _load_part(self, part: dict, columns, mmap: bool) -> dict:
+        mode = "r" if mmap else None
+        return {c: np.load(self.root / part["name"] / f"{c}.npy", mmap_mode=mode) for c in columns}
+
+    def load(self, columns=COLUMNS, mmap: bool = True) -> dict:
+        """
+        Whole dataset as arrays. A single part stays memory-mapped (nothing is read
+        until sliced); several parts are concatenated, which reads them into RAM.
+        Use iter_batches() to stay out of core.
+        """
+        parts = [self._load_part(p, columns, mmap) for p in self.meta["parts"]]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return {c: np.empty((0, N_LANDMARKS, 3) if c == "landmarks" else 0, _DTYPES.get(c, np.float32))
+                    for c in columns}
+        return {c: np.concatenate([p[c] for p in parts]) for c in columns}
+
+    def iter_batches(self, batch_size: int = 65536, columns=COLUMNS) -> Iterator[dict]:
+        """Memory-mapped slices of at most batch_size rows, part by part; RAM use is one batch."""
+        for part in self.meta["parts"]:
+            yield from self.iter_part(part, batch_size, columns)
+
+    def iter_part(self, part: dict, batch_size: int = 65536, columns=COLUMNS) -> Iterator[dict]:
+        arrays = self._load_part(part, columns, mmap=True)
+        for start in range(0, part["rows"], batch_size):
+            yield {c: np.asarray(a[start:start + batch_size]) for c, a in arrays.items()}
+
+    def part_file(self, part: dict, column: str = "landmarks") -> Path:
+        return self.root / part["name"] / f"{column}.npy"
+
+    def compact(self):
+        """Merge all parts into one (streams part by part, so it works beyond RAM)."""
+        if len(self.meta["parts"]) <= 1:
+            return
+        n = len(self)
+        name = self._next_part_name()
+        part_dir = self.root / name
+        part_dir.mkdir(parents=True)
+        out = {
+            c: np.lib.format.open_memmap(
+                part_dir / f"{c}.npy", mode="w+",
+                dtype=np.float32 if c == "landmarks" else _DTYPES[c],
+                shape=(n, N_LANDMARKS, 3) if c == "landmarks" else (n,),
+            )
+            for c in COLUMNS
+        }
+        pos = 0
+        for batch in self.iter_batches():
+            k = len(batch["label"])
+            for c in COLUMNS:
+                out[c][pos:pos + k] = batch[c]
+            pos += k
+        for arr in out.values():
+            arr.flush()
+        del out
+        old = [p["name"] for p in self.meta["parts"]]
+        self.meta["parts"] = [{"name": name, "rows": n}]
+        self._save_meta()
+        for old_name in old:
+            shutil.rmtree(self.root / old_name, ignore_errors=True)
+
+    def info(self) -> dict:
+        counts = np.zeros(len(self.labels), dtype=np.int64)
+        for batch in self.iter_batches(columns=("label",)):
+            counts += np.bincount(batch["label"], minlength=len(self.labels))
+        return {
+            "rows": len(self),
+            "parts": len(self.meta["parts"]),
+            "sessions": len(self.sessions),
+            "labels": dict(zip(self.labels, counts.tolist())),
+            "landmark_bytes": len(self) * N_LANDMARKS * 3 * 4,
+        }
+
+
+def _timestamps(chunk) -> Optional[np.ndarray]:
+    if "timestamp" not in chunk:
+        return None
+    import pandas as pd
+    ts = pd.to_datetime(chunk["timestamp"], errors="coerce", utc=True)
+    return (ts - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy(dtype=np.float64)
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def convert_csv(csv_path, dataset: LandmarkDataset, chunksize: int = 100_000) -> Optional[int]:
+    """
+    Append one landmark CSV (pose_extractor / webcam_collector format), chunk by chunk.
+    Returns None without reading it if a file with the same content was already converted.
+    """
+    import pandas as pd
+    csv_path = Path(csv_path)
+    digest = file_sha256(csv_path)
+    if dataset.has_source(digest):
+        return None
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {c: np.float32 for c in LANDMARK_COLUMNS if c in header}
+    total = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=dtypes):
+        n = len(chunk)
+        dataset.append(
+            landmark_array(chunk),
+            labels=chunk["label"].fillna("").astype(str).to_numpy() if "label" in chunk else "",
+            sessions=chunk["session"].astype(str).to_numpy() if "session" in chunk else csv_path.stem,
+            frames=chunk["frame"].to_numpy() if "frame" in chunk else np.arange(total, total + n),
+            timestamps=_timestamps(chunk),
+        )
+        total += n
+    dataset.add_source(digest, csv_path)
+    return total
+
+
+def convert(paths: list, out_dir, chunksize: int = 100_000, compact: bool = True) -> LandmarkDataset:
+    """Convert CSV files (directories are searched recursively) into a dataset at out_dir."""
+    dataset = LandmarkDataset(out_dir)
+    for p in paths:
+        p = Path(p)
+        files = sorted(p.glob("**/*.csv")) if p.is_dir() else [p]
+        for f in files:
+            n = convert_csv(f, dataset, chunksize)
+            print(f"{f}: already converted" if n is None else f"{f}: {n} frames")
+    if compact:
+        dataset.compact()
+    return dataset
+
+
+def _csv_batches(path: Path, batch_size: int) -> Iterator[tuple]:
+    import pandas as pd
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {c: np.float32 for c in LANDMARK_COLUMNS if c in header}
+    for chunk in pd.read_csv(path, chunksize=batch_size, dtype=dtypes):
+        # Same labels and session ids convert_csv gives these rows
+        labels = chunk["label"].fillna("").astype(str).to_numpy() if "label" in chunk else np.full(len(chunk), "")
+        sessions = chunk["session"].astype(str).to_numpy() if "session" in chunk else np.full(len(chunk), path.stem)
+        yield landmark_array(chunk), labels.astype(object), sessions
+
+
+def _part_batches(ds: LandmarkDataset, part: dict, batch_size: int) -> Iterator[tuple]:
+    labels = np.asarray(ds.labels + [""], dtype=object)
+    sessions = np.asarray(ds.sessions + [""], dtype=object)
+    for b in ds.iter_part(part, batch_size, ("landmarks", "label", "session")):
+        yield b["landmarks"], labels[b["label"]], sessions[b["session"]]
+
+
+def _units(sources: list, batch_size: int) -> Iterator[tuple]:
+    """
+    (file the features depend on, callable returning its batches) per CSV file /
+    dataset part. Batches are (landmarks, label per row, session per row); CSV rows
+    get the labels and sessions converting the file would give them. Nothing is
+    read until the callable is invoked.
+    """
+    for src in sources:
+        src = Path(src)
+        if LandmarkDataset.exists(src):
+            ds = LandmarkDataset(src)
+            for part in ds.meta["parts"]:
+                yield ds.part_file(part), (lambda ds=ds, part=part: _part_batches(ds, part, batch_size))
+        elif src.exists():
+            yield src, (lambda src=src: _csv_batches(src, batch_size))
+
+
+def list_sessions(sources: list) -> set:
+    """Session ids in dataset directories / CSV files (a CSV without a session column is one session, its file stem)."""
+    import pandas as pd
+    out = set()
+    for src in sources:
+        src = Path(src)
+        if LandmarkDataset.exists(src):
+            out.update(LandmarkDataset(src).sessions)
+        elif src.exists():
+            if "session" in pd.read_csv(src, nrows=0).columns:
+                out.update(pd.read_csv(src, usecols=["session"])["session"].astype(str).unique())
+            else:
+                out.add(src.stem)
+    return out
+
+
+# Per-row session codes and their names, stored with the features of each file
+_SESSION, _SESSION_NAMES = "_session", "_session_names"
+
+
+def _rows(feats: dict) -> int:
+    return len(next(iter(feats.values()), ()))
+
+
+def _featurize(batches, exercises: list, labels: dict) -> dict:
+    """
+    One pass over the batches, computing every exercise's features: {exercise: feats}.
+    Rows are kept only if their label is in labels[exercise] (when given).
+    """
+    parts = {ex: [] for ex in exercises}
+    sessions = {ex: [] for ex in exercises}
+    for lm, names, sess in batches:
+        for ex in exercises:
+            keep = slice(None)
+            if labels.get(ex) is not None:
+                keep = np.isin(names, list(labels[ex]))
+            _, _, feats, valid = feature_matrix(lm[keep], ex)
+            parts[ex].append(feats)
+            sessions[ex].append(sess[keep][valid])
+    out = {}
+    for ex, fs in parts.items():
+        if not fs:
+            out[ex] = {}
+            continue
+        names, codes = np.unique(np.concatenate(sessions[ex]).astype(object), return_inverse=True)
+        out[ex] = {c: np.concatenate([f[c] for f in fs]) for c in fs[0]}
+        out[ex][_SESSION], out[ex][_SESSION_NAMES] = codes.astype(np.int32), names.astype(str)
+    return out
+
+
+def load_features_multi(sources: dict, batch_size: int = 65536, cache=True, select=None, labels=None,
+                        sessions=None) -> dict:
+    """
+    {exercise: (X, feature_cols, feats)} from {exercise: sources}. Each file is read
+    at most once, however many exercises use it, and only if some exercise's features
+    for it are not cached (see feature_cache.py); pass cache=None to always recompute.
+    select(path) -> bool restricts loading to some CSV files / dataset parts.
+    labels ({exercise: label names}) selects an exercise's rows, in CSV files and
+    converted datasets alike (either may hold several exercises).
+    sessions (a set of session ids) keeps only those sessions' rows.
+    """
+    from feature_cache import open_cache
+    fc = open_cache(cache)
+    labels = labels or {}
+    units = {}  # path -> (batches callable, exercises), in first-seen order
+    for exercise, srcs in sources.items():
+        for path, batches in _units(srcs, batch_size):
+            if select is not None and not select(Path(path)):
+                continue
+            key = Path(path).resolve()
+            if key not in units:
+                units[key] = (path, batches, [])
+            if exercise not in units[key][2]:
+                units[key][2].append(exercise)
+
+    def cache_key(ex: str) -> str:
+        # Filtered features are cached apart from the whole file's
+        if labels.get(ex) is None:
+            return ex
+        return f"{ex}.{'+'.join(sorted(labels[ex]))}"
+
+    parts_f = {ex: [] for ex in sources}
+    for path, batches, exercises in units.values():
+        found = {ex: fc.get(path, cache_key(ex)) for ex in exercises} if fc is not None else {}
+        # Entries cached before session ids were stored are featurized again
+        missing = [ex for ex in exercises if found.get(ex) is None or (found[ex] and _SESSION not in found[ex])]
+        if missing:
+            for ex, feats in _featurize(batches(), missing, labels).items():
+                found[ex] = feats
+                if fc is not None:
+                    fc.put(path, cache_key(ex), feats)
+        for ex in exercises:
+            if not found[ex]:
+                continue
+            feats = dict(found[ex])
+            codes, names = feats.pop(_SESSION), feats.pop(_SESSION_NAMES)
+            if sessions is not None:
+                keep = np.isin(names, list(sessions))[codes]
+                feats = {c: v[keep] for c, v in feats.items()}
+            parts_f[ex].append(feats)
+    if fc is not None:
+        fc.save()
+        if fc.hits:
+            print(f"Feature cache: {fc.hits} reused, {fc.misses} featurized (file x exercise)")
+
+    out = {}
+    for ex, fs in parts_f.items():
+        fs = [f for f in fs if _rows(f)]
+        if not fs:
+            raise FileNotFoundError(
+                f"No landmark data found for {ex}. Run webcam_collector.py or pose_extractor.py first."
+            )
+        feature_cols = list(fs[0])
+        feats = {c: np.concatenate([f[c] for f in fs]) for c in feature_cols}
+        out[ex] = (np.column_stack([feats[c] for c in feature_cols]), feature_cols, feats)
+    return out
+
+
+def load_features(sources: list, exercise: str, batch_size: int = 65536, cache=True, select=None,
+                  labels=None, sessions=None) -> tuple:
+    """
+    (X, feature_cols, feats) for an exercise from dataset directories and/or CSV files.
+    Both are streamed in batches, so only the (small) feature matrix is held in memory.
+    Features are cached per file, so only new or modified files are featurized again.
+    Rows are limited to the given labels (a trainer's LABELS), and to the given
+    sessions if set.
+    """
+    return load_features_multi(
+        {exercise: sources}, batch_size, cache, select, {exercise: labels}, sessions,
+    )[exercise]
+
+
+def default_sources(data_dir: Path, csv_globs: list) -> list:
+    """
+    The converted dataset (data/landmarks) if there is one, plus the CSVs matching
+    csv_globs that aren't in it yet (e.g. new webcam_collector recordings). The
+    dataset holds every exercise; pass the trainer's LABELS to load_features to
+    train on its rows only.
+    """
+    if not data_dir.exists():
+        return []
+    csvs = list(dict.fromkeys(p for g in csv_globs for p in sorted(data_dir.glob(g))))
+    if not LandmarkDataset.exists(data_dir / "landmarks"):
+        return csvs
+    ds = LandmarkDataset(data_dir / "landmarks")
+    if not ds.tracks_sources():
+        # Can't tell which CSVs it already holds; using them all could count rows twice
+        if csvs:
+            print(f"Note: {data_dir / 'landmarks'} doesn't record its source CSVs; "
+                  f"CSVs in {data_dir} are not used. Convert new recordings into a fresh dataset.")
+        return [data_dir / "landmarks"]
+    new = [p for p in csvs if not ds.has_source(file_sha256(p))]
+    if new:
+        print(f"{len(new)} CSV file(s) not converted yet, used alongside the dataset "
+              f"(add them with: python dataset.py convert {data_dir} --out {data_dir / 'landmarks'})")
+    return [data_dir / "landmarks"] + new
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Landmark dataset tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="Convert landmark CSVs (files or directories) to a dataset")
+    c.add_argument("inputs", nargs="+")
+    c.add_argument("--out", "-o", default=str(DEFAULT_DIR))
+    c.add_argument("--chunksize", type=int, default=100_000)
+    c.add_argument("--no-compact", action="store_true", help="Keep one part per CSV chunk")
+    i = sub.add_parser("info", help="Row / label counts")
+    i.add_argument("path", nargs="?", default=str(DEFAULT_DIR))
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        ds = convert(args.inputs, args.out, args.chunksize, compact=not args.no_compact)
+        print(json.dumps(ds.info(), indent=1))
+    else:
+        print(json.dumps(LandmarkDataset(args.path).info(), indent=1))
@@ -30,10 +30,26 @@ except ImportError as e:
     print(f"Import error: {e}. Ensure utils.py exists.")
     sys.exit(1)
 
+# Keyframe tracking (--track) is shared with the backend's frame analyzer
+try:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+    from services.pose_tracker import StreamTracker
+except ImportError:
+    StreamTracker = None
+
 MODELS_DIR = Path(__file__).parent
 LANDMARKS = 33
 
 
+class _Point:
+    """Landmark carried forward by the tracker (same attributes as MediaPipe's)."""
+    __slots__ = ("x", "y", "z", "visibility", "presence")
+
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+        self.visibility = self.presence = 1.0
+
+
 MODEL_FILES = {"squat": "stage_model.joblib", "bicep": "lean_back_model.joblib", "lunge": "knee_over_toe_model.joblib", "plank": "form_model.joblib"}
 
 
@@ -74,6 +90,8 @@ def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--video", "-v", help="Optional video file for detection")
+    parser.add_argument("--track", action="store_true",
+                        help="Run the pose model on keyframes only; optical flow in between")
     args = parser.parse_args()
 
     # create MediaPipe PoseLandmarker
@@ -101,6 +119,22 @@ def main():
         print(f"Could not open {'video' if args.video else 'webcam'}:", source)
         return
 
+    from mediapipe.tasks.python.vision.core import image as image_lib
+
+    def detect(bgr):
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        results = landmarker.detect(image_lib.Image(image_lib.ImageFormat.SRGB, np.ascontiguousarray(rgb)))
+        if results and results.pose_landmarks and len(results.pose_landmarks) > 0:
+            return results.pose_landmarks[0]
+        return None
+
+    tracker = None
+    if args.track:
+        if StreamTracker is None:
+            print("Tracking unavailable (backend/services/pose_tracker.py not found); running every frame")
+        else:
+            tracker = StreamTracker()
+
     exercise = "squat"
     scaler, model, feats = load_model(exercise)
 
@@ -112,14 +146,14 @@ def main():
         if not ret:
             break
 
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        from mediapipe.tasks.python.vision.core import image as image_lib
-        mp_image = image_lib.Image(image_lib.ImageFormat.SRGB, np.ascontiguousarray(rgb))
-        results = landmarker.detect(mp_image)
+        if tracker is not None:
+            pts, _ = tracker.step(frame, lambda f: [[lm.x, lm.y, lm.z] for lm in detect(f) or []] or None)
+            landmarks = [_Point(*p) for p in pts] if pts else None
+        else:
+            landmarks = detect(frame)
 
         feedback = ""
-        if results and results.pose_landmarks and len(results.pose_landmarks) > 0:
-            landmarks = results.pose_landmarks[0]
+        if landmarks is not None:
             try:
                 drawing_utils.draw_landmarks(
                     frame,
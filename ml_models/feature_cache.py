@@ -0,0 +1,97 @@
+"""
+Per-file feature cache for retraining. Features computed from one source file
+(a landmark CSV or a dataset part) are stored under a key made of the file's
+content hash, the exercise and utils.FEATURE_VERSION, so a retrain only
+featurizes new or modified recordings. Content hashes are remembered by
+(size, mtime) so unchanged files are not even re-read.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils import FEATURE_VERSION
+
+DEFAULT_DIR = Path(__file__).parent / "data" / ".feature_cache"
+_INDEX = "hashes.json"
+
+
+class FeatureCache:
+    def __init__(self, root=DEFAULT_DIR):
+        self.root = Path(root)
+        self.hits = 0
+        self.misses = 0
+        try:
+            self._hashes = json.loads((self.root / _INDEX).read_text())
+        except (OSError, ValueError):
+            self._hashes = {}
+        self._dirty = False
+
+    def content_hash(self, path: Path) -> str:
+        """sha256 of the file; reused while the file's size and mtime are unchanged."""
+        st = path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        key = str(path.resolve())
+        known = self._hashes.get(key)
+        if known and known[:2] == stamp:
+            return known[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._hashes[key] = stamp + [digest]
+        self._dirty = True
+        return digest
+
+    def _entry(self, path: Path, exercise: str) -> Path:
+        return self.root / f"{exercise}-v{FEATURE_VERSION}-{self.content_hash(path)[:32]}.npz"
+
+    def get(self, path: Path, exercise: str) -> Optional[dict]:
+        entry = self._entry(path, exercise)
+        if entry.exists():
+            try:
+                with np.load(entry) as z:
+                    feats = {k: z[k] for k in z.files}
+                self.hits += 1
+                return feats
+            except (OSError, ValueError):
+                pass
+        self.misses += 1
+        return None
+
+    def put(self, path: Path, exercise: str, feats: dict):
+        entry = self._entry(path, exercise)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(entry.name + ".tmp.npz")
+        np.savez(tmp, **feats)
+        os.replace(tmp, entry)
+
+    def get_or_compute(self, path: Path, exercise: str, compute: Callable[[], dict]) -> dict:
+        """Feature columns for one source file, from cache or compute() (then stored)."""
+        feats = self.get(path, exercise)
+        if feats is None:
+            feats = compute()
+            self.put(path, exercise, feats)
+        return feats
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / (_INDEX + ".tmp")
+        tmp.write_text(json.dumps(self._hashes))
+        os.replace(tmp, self.root / _INDEX)
+        self._dirty = False
+
+
+def open_cache(cache) -> Optional[FeatureCache]:
+    """cache argument of load_features: True = default dir, a path, a FeatureCache, or None/False."""
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, FeatureCache):
+        return cache
+    return FeatureCache(DEFAULT_DIR if cache is True else cache)
@@ -0,0 +1,204 @@
+"""
+Incremental model updates from newly collected sessions.
+
+Only sessions the deployed model has not been trained or updated on are used as
+new data; the consumed session ids are recorded in model/updates.json, so copying,
+touching or compacting files does not make old data look new. Forests are
+warm-started with extra trees fitted on the new frames plus a replayed sample of
+older ones (so every class is still represented), keeping at most --max-trees of
+the newest trees; estimators with partial_fit are updated in place. The scaler is kept as is, so existing trees
+still see the inputs they were trained on.
+
+The replaced model is kept in model/previous/ and can be restored:
+
+    python incremental.py                  # update all exercises
+    python incremental.py squat --trees 30
+    python incremental.py squat --rollback
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from dataset import default_sources, list_sessions, load_features
+from train_all import DATA_DIR, EXERCISES, _sha256, load_trainer
+
+STATE_FILE = "updates.json"
+PREVIOUS_DIR = "previous"
+DEFAULT_TREES = 20
+DEFAULT_MAX_TREES = 300
+# Old frames replayed per new frame, so new trees still see the previous distribution
+DEFAULT_REPLAY = 1.0
+HOLDOUT = 0.2
+
+
+def _load_state(model_dir: Path, model_path: Path, sources: list) -> dict:
+    """
+    Update history plus `consumed`, the session ids the deployed model was trained on.
+    If the model file changed outside this module (a full retrain), every session
+    present now is taken as consumed.
+    """
+    try:
+        state = json.loads((model_dir / STATE_FILE).read_text())
+    except (OSError, ValueError):
+        state = {"history": []}
+    digest = _sha256(model_path)
+    if state.get("model_sha256") != digest or "consumed" not in state:
+        state["consumed"] = sorted(list_sessions(sources))
+        state["model_sha256"] = digest
+        # mtime-based state from earlier versions
+        state.pop("since", None)
+        state.pop("model_mtime", None)
+        # Saved right away, so sessions added later still count as new
+        _save_state(model_dir, state)
+    return state
+
+
+def _save_state(model_dir: Path, state: dict):
+    tmp = model_dir / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=1))
+    os.replace(tmp, model_dir / STATE_FILE)
+
+
+def _split(n: int, holdout: float, seed: int = 42) -> tuple:
+    idx = np.random.default_rng(seed).permutation(n)
+    k = int(n * holdout) if n >= 10 else 0
+    return idx[k:], idx[:k]
+
+
+def _grow(clf, X, y, trees: int, max_trees: int):
+    """Copy of clf with `trees` new estimators fitted on X, y; only the newest max_trees are kept."""
+    new = copy.deepcopy(clf)
+    if isinstance(new, (RandomForestClassifier, ExtraTreesClassifier)):
+        new.set_params(warm_start=True, n_estimators=len(new.estimators_) + trees)
+        new.fit(X, y)
+        if len(new.estimators_) > max_trees:
+            new.estimators_ = new.estimators_[-max_trees:]
+            new.n_estimators = max_trees
+        new.set_params(warm_start=False)
+    elif hasattr(new, "partial_fit"):
+        new.partial_fit(X, y, classes=clf.classes_)
+    else:
+        raise ValueError(f"{type(clf).__name__} can't be updated incrementally; run a full retrain")
+    return new
+
+
+def update(exercise: str, trees: int = DEFAULT_TREES, max_trees: int = DEFAULT_MAX_TREES,
+           replay: float = DEFAULT_REPLAY, sources=None) -> dict:
+    trainer = load_trainer(exercise)
+    model_dir, model_path = trainer.MODEL_DIR, trainer.MODEL_DIR / trainer.MODEL_FILE
+    if not model_path.exists():
+        raise FileNotFoundError(f"No {exercise} model to update; train it first")
+    sources = sources or default_sources(DATA_DIR, trainer.SOURCES)
+    state = _load_state(model_dir, model_path, sources)
+    consumed = set(state["consumed"])
+    new = list_sessions(sources) - consumed
+
+    try:
+        # An empty `new` leaves no rows, which raises like missing data
+        X_new, cols, f_new = load_features(sources, exercise, labels=trainer.LABELS, sessions=new)
+    except FileNotFoundError:
+        print(f"{exercise}: no new data")
+        return {"exercise": exercise, "updated": False, "rows": 0}
+    y_new = trainer.labels(f_new)
+
+    scaler = joblib.load(model_dir / "scaler.joblib")
+    clf = joblib.load(model_path)
+    if list(joblib.load(model_dir / "feature_cols.joblib")) != list(cols):
+        raise ValueError(f"{exercise}: features changed since the model was trained; run a full retrain")
+
+    fit_idx, test_idx = _split(len(X_new), HOLDOUT)
+    X_fit, y_fit = X_new[fit_idx], y_new[fit_idx]
+    n_replay = int(len(fit_idx) * replay)
+    if n_replay:
+        try:
+            X_old, _, f_old = load_features(sources, exercise, labels=trainer.LABELS, sessions=consumed)
+            pick = np.random.default_rng(0).choice(len(X_old), min(n_replay, len(X_old)), replace=False)
+            X_fit = np.concatenate([X_fit, X_old[pick]])
+            y_fit = np.concatenate([y_fit, trainer.labels(f_old)[pick]])
+        except FileNotFoundError:
+            pass
+    if set(np.unique(y_fit)) != set(clf.classes_):
+        raise ValueError(f"{exercise}: new and replayed data must contain every class {list(clf.classes_)}")
+
+    t0 = time.perf_counter()
+    new_clf = _grow(clf, scaler.transform(X_fit), y_fit, trees, max_trees)
+    fit_sec = time.perf_counter() - t0
+
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "rows": int(len(X_new)),
+        "replayed": int(len(X_fit) - len(fit_idx)),
+        "fit_sec": round(fit_sec, 2),
+        "estimators": len(getattr(new_clf, "estimators_", [])) or None,
+        "sessions": sorted(new),
+    }
+    if len(test_idx):
+        X_test = scaler.transform(X_new[test_idx])
+        entry["holdout_accuracy_before"] = round(float(clf.score(X_test, y_new[test_idx])), 4)
+        entry["holdout_accuracy_after"] = round(float(new_clf.score(X_test, y_new[test_idx])), 4)
+
+    # Keep the deployed model for rollback (copy2 keeps its mtime), then swap atomically
+    (model_dir / PREVIOUS_DIR).mkdir(exist_ok=True)
+    shutil.copy2(model_path, model_dir / PREVIOUS_DIR / trainer.MODEL_FILE)
+    tmp = model_path.with_suffix(".joblib.tmp")
+    joblib.dump(new_clf, tmp)
+    os.replace(tmp, model_path)
+
+    state["history"].append(entry)
+    state["consumed"], state["model_sha256"] = sorted(consumed | new), _sha256(model_path)
+    _save_state(model_dir, state)
+    print(f"{exercise}: updated from {entry['rows']} new frames (+{entry['replayed']} replayed) in {fit_sec:.2f}s"
+          + (f", holdout {entry['holdout_accuracy_before']:.3f} -> {entry['holdout_accuracy_after']:.3f}"
+             if len(test_idx) else ""))
+    return {"exercise": exercise, "updated": True, **entry}
+
+
+def rollback(exercise: str) -> bool:
+    """Restore the model replaced by the last update; its sessions count as new again."""
+    trainer = load_trainer(exercise)
+    model_dir, model_path = trainer.MODEL_DIR, trainer.MODEL_DIR / trainer.MODEL_FILE
+    previous = model_dir / PREVIOUS_DIR / trainer.MODEL_FILE
+    if not previous.exists():
+        print(f"{exercise}: nothing to roll back")
+        return False
+    state = _load_state(model_dir, model_path, default_sources(DATA_DIR, trainer.SOURCES))
+    os.replace(previous, model_path)
+    if state["history"]:
+        returned = set(state["history"].pop().get("sessions", []))
+        state["consumed"] = sorted(set(state["consumed"]) - returned)
+    state["model_sha256"] = _sha256(model_path)
+    _save_state(model_dir, state)
+    print(f"{exercise}: rolled back")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update exercise models with newly collected data")
+    parser.add_argument("exercises", nargs="*", help=f"Any of {', '.join(EXERCISES)} (default: all)")
+    parser.add_argument("--trees", type=int, default=DEFAULT_TREES, help="Trees added per update (forests)")
+    parser.add_argument("--max-trees", type=int, default=DEFAULT_MAX_TREES, help="Oldest trees beyond this are dropped")
+    parser.add_argument("--replay", type=float, default=DEFAULT_REPLAY, help="Old frames replayed per new frame")
+    parser.add_argument("--rollback", action="store_true", help="Restore the model replaced by the last update")
+    args = parser.parse_args()
+    unknown = set(args.exercises) - set(EXERCISES)
+    if unknown:
+        parser.error(f"unknown exercise(s): {', '.join(sorted(unknown))}")
+    for ex in args.exercises or EXERCISES:
+        if args.rollback:
+            rollback(ex)
+        else:
+            try:
+                update(ex, args.trees, args.max_trees, args.replay)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"{ex}: {e}")
@@ -2,25 +2,33 @@
 Extract MediaPipe pose landmarks from video or webcam.
 Reference: https://github.com/NgoQuocBao1010/Exercise-Correction
 """
+import queue
+import threading
+
 import cv2
 # use MediaPipe 0.10 Tasks API rather than the older "solutions" module
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Callable, Generator, Optional
 
 # helper from webcam_collector handles model download/lookup
-# when executed as a standalone script the ml_models package may not be on PYTHONPATH
 import sys, os
-sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 try:
     from ml_models.webcam_collector import get_pose_landmarker
 except ImportError:
     try:
         from webcam_collector import get_pose_landmarker
     except ImportError:
-        # last resort: copy the helper inline or raise
-        raise
+        # Loaded by file path (the backend's video jobs): load the sibling module the same
+        # way instead of putting ml_models on sys.path, where it would shadow the importer's modules
+        import importlib.util
+        _spec = importlib.util.spec_from_file_location(
+            "ml_models_webcam_collector", os.path.join(os.path.dirname(os.path.abspath(__file__)), "webcam_collector.py"),
+        )
+        _webcam_collector = importlib.util.module_from_spec(_spec)
+        _spec.loader.exec_module(_webcam_collector)
+        get_pose_landmarker = _webcam_collector.get_pose_landmarker
 
 # MediaPipe Pose landmark indices (33 landmarks)
 LANDMARKS = {
@@ -41,61 +49,168 @@ def get_landmark_names():
     return sorted(LANDMARKS, key=LANDMARKS.get)
 
 
+class VideoLandmarker:
+    """
+    PoseLandmarker in VIDEO mode, reusable across videos. MediaPipe requires
+    increasing timestamps for the landmarker's whole life, so each video's frame
+    times are offset past the previous video's.
+    """
+
+    def __init__(self):
+        self._landmarker = get_pose_landmarker(video=True)
+        if self._landmarker is None:
+            raise RuntimeError("Could not initialise MediaPipe pose landmarker")
+        self._base_ms = 0
+        self._last_ms = -1
+
+    def next_video(self):
+        self._base_ms = self._last_ms + 1000
+
+    def detect(self, mp_image, t_ms: int):
+        ts = max(self._base_ms + int(t_ms), self._last_ms + 1)
+        self._last_ms = ts
+        return self._landmarker.detect_for_video(mp_image, ts)
+
+    def close(self):
+        try:
+            self._landmarker.close()
+        except Exception:
+            pass
+
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _decode(cap, q: queue.Queue, stop: threading.Event, stride: int, max_frames: Optional[int]):
+    """Decode thread: grab() skips frames without decoding them; kept frames are converted to RGB."""
+    idx = kept = 0
+    try:
+        while not stop.is_set() and not (max_frames and kept >= max_frames):
+            if idx % stride:
+                if not cap.grab():
+                    break
+                idx += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if not _put(q, (idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), stop):
+                return
+            idx += 1
+            kept += 1
+    except Exception as e:
+        _put(q, e, stop)
+    _put(q, _DONE, stop)
+
+
+def extract_landmarks(
+    video_path: str,
+    landmarker=None,
+    max_frames: Optional[int] = None,
+    target_fps: Optional[float] = None,
+    queue_size: int = 8,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> tuple:
+    """
+    (landmarks (N, 33, 3) float32, frame numbers (N,) int32) for a video, NaN where
+    no pose was found. With target_fps, only every k-th frame is decoded (k = source
+    fps / target_fps). Decoding runs in its own thread, ahead of inference.
+
+    landmarker: a VideoLandmarker (tracks between frames; created and closed here
+    if not given) or an IMAGE-mode PoseLandmarker. A passed landmarker is left open.
+    progress(done, expected) is called after each frame; expected comes from the
+    container's frame count and may be off.
+    """
+    owned = landmarker is None
+    if owned:
+        landmarker = VideoLandmarker()
+    elif isinstance(landmarker, VideoLandmarker):
+        landmarker.next_video()
+    video_mode = isinstance(landmarker, VideoLandmarker)
+    from mediapipe.tasks.python.vision.core import image as image_lib
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video file: {video_path}")
+    src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    stride = max(1, round(src_fps / target_fps)) if target_fps else 1
+    # Frame counts from containers can be off; the buffer grows if needed
+    expected = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // stride + 1
+    if max_frames:
+        expected = min(expected, max_frames)
+    out = np.full((max(expected, 1), 33, 3), np.nan, dtype=np.float32)
+    frames = np.zeros(len(out), dtype=np.int32)
+
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode, args=(cap, q, stop, stride, max_frames), daemon=True)
+    decoder.start()
+    n = 0
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            idx, rgb = item
+            mp_image = image_lib.Image(image_lib.ImageFormat.SRGB, rgb)
+            if video_mode:
+                results = landmarker.detect(mp_image, idx * 1000.0 / src_fps)
+            else:
+                results = landmarker.detect(mp_image)
+            if n == len(out):
+                out = np.concatenate([out, np.full_like(out, np.nan)])
+                frames = np.concatenate([frames, np.zeros_like(frames)])
+            if results and results.pose_landmarks:
+                out[n] = [(lm.x, lm.y, lm.z) for lm in results.pose_landmarks[0]]
+            frames[n] = idx
+            n += 1
+            if progress is not None:
+                progress(n, expected)
+    finally:
+        stop.set()
+        decoder.join()
+        cap.release()
+        if owned:
+            landmarker.close()
+    return out[:n], frames[:n]
+
+
+def landmarks_frame(landmarks: np.ndarray, label: Optional[str] = None, frames=None) -> pd.DataFrame:
+    """DataFrame with columns: frame, label, lm0_x, lm0_y, lm0_z, ... lm32_z"""
+    df = pd.DataFrame(landmarks.reshape(len(landmarks), -1).astype(np.float64),
+                      columns=[f"lm{i}_{a}" for i in range(33) for a in "xyz"])
+    if label is not None:
+        df.insert(0, "label", label)
+    df.insert(0, "frame", np.arange(len(landmarks)) if frames is None else frames)
+    return df
+
+
 def extract_from_video(
     video_path: str,
     label: Optional[str] = None,
     max_frames: Optional[int] = None,
+    landmarker=None,
+    target_fps: Optional[float] = None,
 ) -> pd.DataFrame:
     """
     Extract pose landmarks from a video file using MediaPipe 0.10 PoseLandmarker.
     Returns DataFrame with columns: frame, label, lm0_x, lm0_y, lm0_z, ... lm32_z
+    (frame is the source frame number, so it skips when target_fps strides).
     """
-    landmarker = get_pose_landmarker()
-    if landmarker is None:
-        raise RuntimeError("Could not initialise MediaPipe pose landmarker")
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video file: {video_path}")
-    rows = []
-    frame_idx = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        if max_frames and frame_idx >= max_frames:
-            break
-
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        from mediapipe.tasks.python.vision.core import image as image_lib
-        mp_image = image_lib.Image(image_lib.ImageFormat.SRGB, np.ascontiguousarray(rgb))
-        results = landmarker.detect(mp_image)
-
-        row = {"frame": frame_idx}
-        if label is not None:
-            row["label"] = label
-
-        if results and results.pose_landmarks and len(results.pose_landmarks) > 0:
-            for i, lm in enumerate(results.pose_landmarks[0]):
-                row[f"lm{i}_x"] = lm.x
-                row[f"lm{i}_y"] = lm.y
-                row[f"lm{i}_z"] = lm.z
-        else:
-            for i in range(33):
-                row[f"lm{i}_x"] = np.nan
-                row[f"lm{i}_y"] = np.nan
-                row[f"lm{i}_z"] = np.nan
-
-        rows.append(row)
-        frame_idx += 1
-
-    cap.release()
-    try:
-        landmarker.close()
-    except Exception:
-        pass
-    return pd.DataFrame(rows)
+    landmarks, frames = extract_landmarks(video_path, landmarker, max_frames, target_fps)
+    return landmarks_frame(landmarks, label, frames)
 
 
 def extract_from_webcam(
@@ -112,6 +227,8 @@ def extract_from_webcam(
     if landmarker is None:
         raise RuntimeError("Could not initialise MediaPipe pose landmarker")
 
+    from mediapipe.tasks.python.vision.core import image as image_lib
+
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         raise RuntimeError("Could not open webcam")
@@ -133,7 +250,6 @@ def extract_from_webcam(
 
         if frame_idx % frame_interval == 0:
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            from mediapipe.tasks.python.vision.core import image as image_lib
             mp_image = image_lib.Image(image_lib.ImageFormat.SRGB, np.ascontiguousarray(rgb))
             results = landmarker.detect(mp_image)
 
@@ -192,12 +308,13 @@ if __name__ == "__main__":
     parser.add_argument("--output", "-o", default="data/collected.csv", help="Output CSV")
     parser.add_argument("--duration", "-d", type=int, default=30, help="Webcam duration (sec)")
     parser.add_argument("--fps", type=int, default=10, help="Sample rate for webcam")
+    parser.add_argument("--target-fps", type=float, default=None, help="Video: process only this many frames per second")
     args = parser.parse_args()
 
     if args.webcam:
         extract_from_webcam(args.output, args.label, args.duration, args.fps)
     elif args.video:
-        df = extract_from_video(args.video, args.label)
+        df = extract_from_video(args.video, args.label, target_fps=args.target_fps)
         Path(args.output).parent.mkdir(parents=True, exist_ok=True)
         df.to_csv(args.output, index=False)
         print(f"Saved {len(df)} frames to {args.output}")
@@ -0,0 +1,139 @@
+"""
+Train several exercise models from one pass over the data.
+
+Landmarks are read once and every requested exercise's features are computed
+from the same batches (load_features_multi). Each model is then trained in its
+own worker process, so the total time is close to that of the slowest model.
+Artifacts go to <exercise>_model/model/ as before, plus models/manifest.json.
+
+    python train_all.py                     # all exercises
+    python train_all.py squat plank -j 2
+    python train_all.py --tune --budget-ms 1   # model selection, see tuning.py
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+from dataset import default_sources, load_features_multi
+from tuning import REPORT_FILE
+from utils import FEATURE_VERSION
+
+EXERCISES = ("squat", "bicep", "lunge", "plank")
+DATA_DIR = ROOT / "data"
+MANIFEST = ROOT / "models" / "manifest.json"
+
+
+def load_trainer(exercise: str):
+    """The <exercise>_model/train.py module (the directories are not packages)."""
+    path = ROOT / f"{exercise}_model" / "train.py"
+    spec = importlib.util.spec_from_file_location(f"{exercise}_train", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _rel(path) -> str:
+    path = Path(path).resolve()
+    return str(path.relative_to(ROOT)) if path.is_relative_to(ROOT) else str(path)
+
+
+def _train_one(exercise: str, X, y, feature_cols, tune: bool, budget_ms, n_jobs: int) -> dict:
+    """Runs in a worker process: fit and save one model, report what was written."""
+    trainer = load_trainer(exercise)
+    t0 = time.perf_counter()
+    acc = trainer.train(X, y, feature_cols, tune, budget_ms, n_jobs)
+    result = {
+        "samples": int(len(X)),
+        "features": list(feature_cols),
+        "positive_rate": round(float(y.mean()), 4) if len(y) else None,
+        "accuracy": round(float(acc), 4),
+        "train_sec": round(time.perf_counter() - t0, 2),
+        "artifacts": {
+            _rel(p): _sha256(p) for p in sorted(trainer.MODEL_DIR.glob("*.joblib"))
+        },
+    }
+    report_path = trainer.MODEL_DIR / REPORT_FILE
+    if tune and report_path.exists():
+        report = json.loads(report_path.read_text())
+        result["tuning"] = {
+            "chosen": report["chosen"],
+            **next({k: r[k] for k in ("cv_accuracy", "single_ms", "batch_row_ms", "size_kb")}
+                   for r in report["candidates"] if r["name"] == report["chosen"]),
+        }
+    return result
+
+
+def train_all(exercises=EXERCISES, workers=None, cache=True, tune=False, budget_ms=None) -> dict:
+    trainers = {ex: load_trainer(ex) for ex in exercises}
+    sources = {ex: default_sources(DATA_DIR, t.SOURCES) for ex, t in trainers.items()}
+    missing = [ex for ex, s in sources.items() if not s]
+    if missing:
+        raise FileNotFoundError(f"No data for {', '.join(missing)}. Run webcam_collector.py or pose_extractor.py first.")
+
+    t0 = time.perf_counter()
+    data = load_features_multi(sources, cache=cache, labels={ex: t.LABELS for ex, t in trainers.items()})
+    load_sec = time.perf_counter() - t0
+    print(f"Features for {len(exercises)} exercise(s) in {load_sec:.2f}s")
+
+    jobs = {}
+    workers = workers or min(len(exercises), os.cpu_count() or 1)
+    # Cores left for each worker's cross-validation when tuning
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for ex, (X, cols, feats) in data.items():
+            y = trainers[ex].labels(feats)
+            print(f"{ex}: training on {len(X)} samples, {len(cols)} features")
+            jobs[ex] = pool.submit(_train_one, ex, X, y, cols, tune, budget_ms, n_jobs)
+        models = {}
+        for ex, job in jobs.items():
+            models[ex] = job.result()
+            print(f"{ex}: accuracy {models[ex]['accuracy']:.3f} ({models[ex]['train_sec']}s)")
+
+    all_sources = sorted({Path(p) for s in sources.values() for p in s})
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "feature_version": FEATURE_VERSION,
+        "sources": {ex: [_rel(p) for p in s] for ex, s in sources.items()},
+        "source_hashes": {_rel(p): _sha256(p) for p in all_sources if p.is_file()},
+        "load_sec": round(load_sec, 2),
+        "total_sec": round(time.perf_counter() - t0, 2),
+        "models": models,
+    }
+    MANIFEST.parent.mkdir(exist_ok=True)
+    tmp = MANIFEST.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp, MANIFEST)
+    print(f"Done in {manifest['total_sec']}s; manifest: {MANIFEST}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train exercise models from one shared data pass")
+    parser.add_argument("exercises", nargs="*", help=f"Any of {', '.join(EXERCISES)} (default: all)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: one per model)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute features instead of using the feature cache")
+    parser.add_argument("--tune", action="store_true", help="Cross-validated, latency-aware model selection")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Per-frame inference budget for --tune")
+    args = parser.parse_args()
+    unknown = set(args.exercises) - set(EXERCISES)
+    if unknown:
+        parser.error(f"unknown exercise(s): {', '.join(sorted(unknown))}")
+    train_all(args.exercises or EXERCISES, args.jobs, cache=None if args.no_cache else True,
+              tune=args.tune, budget_ms=args.budget_ms)
@@ -0,0 +1,122 @@
+"""
+Latency-aware model selection. Candidates (forests of several sizes and depths
+plus lighter classifiers) are scored with stratified k-fold CV in parallel, then
+timed on single frames (what real-time detection does) and on batches. The
+chosen model is the cheapest per frame among those whose CV accuracy is within
+`tolerance` of the best candidate that fits the latency budget.
+"""
+import json
+import pickle
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+
+DEFAULT_BUDGET_MS = 2.0  # per-frame inference budget (single sample)
+DEFAULT_TOLERANCE = 0.005  # accuracy given up for a cheaper model
+REPORT_FILE = "tuning.json"
+
+
+def candidates(random_state: int = 42) -> dict:
+    c = {}
+    for n in (10, 25, 50, 100):
+        for depth in (8, 16, None):
+            c[f"rf_n{n}_d{depth or 'max'}"] = RandomForestClassifier(
+                n_estimators=n, max_depth=depth, random_state=random_state
+            )
+    for n in (25, 50):
+        c[f"et_n{n}_dmax"] = ExtraTreesClassifier(n_estimators=n, random_state=random_state)
+    for depth in (4, 8, 12):
+        c[f"tree_d{depth}"] = DecisionTreeClassifier(max_depth=depth, random_state=random_state)
+    c["logreg"] = LogisticRegression(max_iter=1000)
+    return c
+
+
+def measure_latency(model, X: np.ndarray, repeats: int = 200, batch: int = 1024) -> dict:
+    """Median single-row predict time and per-row time for a batch, in milliseconds."""
+    rows = X[:max(1, min(len(X), repeats))]
+    times = []
+    for i in range(repeats):
+        x = rows[i % len(rows)][None, :]
+        t0 = time.perf_counter()
+        model.predict(x)
+        times.append(time.perf_counter() - t0)
+    b = X[:batch]
+    t0 = time.perf_counter()
+    model.predict(b)
+    batch_s = time.perf_counter() - t0
+    return {
+        "single_ms": round(float(np.median(times)) * 1000, 4),
+        "batch_row_ms": round(batch_s / max(len(b), 1) * 1000, 5),
+    }
+
+
+def tune(
+    X: np.ndarray,
+    y: np.ndarray,
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    tolerance: float = DEFAULT_TOLERANCE,
+    folds: int = 5,
+    n_jobs: int = -1,
+) -> tuple:
+    """Returns (chosen model fitted on X, y, report dict with every candidate's scores)."""
+    folds = max(2, min(folds, int(np.unique(y, return_counts=True)[1].min())))
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    rows = []
+    for name, model in candidates().items():
+        scores = cross_val_score(model, X, y, cv=cv, n_jobs=n_jobs)
+        if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+            model.n_jobs = 1  # per-frame inference: thread pool start-up costs more than it saves
+        model.fit(X, y)
+        rows.append({
+            "name": name,
+            "cv_accuracy": round(float(scores.mean()), 4),
+            "cv_std": round(float(scores.std()), 4),
+            **measure_latency(model, X),
+            "size_kb": round(len(pickle.dumps(model)) / 1024, 1),
+            "model": model,
+        })
+
+    within = [r for r in rows if r["single_ms"] <= budget_ms] or [min(rows, key=lambda r: r["single_ms"])]
+    best = max(r["cv_accuracy"] for r in within)
+    good = [r for r in within if r["cv_accuracy"] >= best - tolerance]
+    chosen = min(good, key=lambda r: (r["single_ms"], r["size_kb"]))
+    report = {
+        "chosen": chosen["name"],
+        "budget_ms": budget_ms,
+        "tolerance": tolerance,
+        "folds": folds,
+        "samples": int(len(X)),
+        "candidates": sorted(
+            ({k: v for k, v in r.items() if k != "model"} for r in rows),
+            key=lambda r: (-r["cv_accuracy"], r["single_ms"]),
+        ),
+    }
+    return chosen["model"], report
+
+
+def fit_classifier(X, y, model_dir: Path, tune_models: bool = False, budget_ms: Optional[float] = None,
+                   n_jobs: int = -1):
+    """
+    The trainers' model: the fixed RandomForest, or with tune_models the candidate
+    picked by tune(). The tuning report is written to model_dir/tuning.json.
+    """
+    report_path = Path(model_dir) / REPORT_FILE
+    if tune_models and len(np.unique(y)) < 2:
+        print("Tuning skipped: training labels contain a single class")
+        tune_models = False
+    if not tune_models:
+        clf = RandomForestClassifier(n_estimators=100, random_state=42)
+        clf.fit(X, y)
+        report_path.unlink(missing_ok=True)
+        return clf
+    clf, report = tune(X, y, DEFAULT_BUDGET_MS if budget_ms is None else budget_ms, n_jobs=n_jobs)
+    report_path.write_text(json.dumps(report, indent=1))
+    c = next(r for r in report["candidates"] if r["name"] == report["chosen"])
+    print(f"Tuning: chose {c['name']} (cv {c['cv_accuracy']:.3f}, {c['single_ms']:.2f} ms/frame, {c['size_kb']} KB)")
+    return clf
@@ -173,3 +173,134 @@ def plank_features(row: dict) -> dict:
         "hip_shoulder_dy": dy_hip,
         "body_alignment": np.sqrt(dy_hip**2 + dx_hip**2),
     }
+
+
+# --- Vectorized pipeline (training): all frames at once as an (N, 33, 3) array ---
+
+N_LANDMARKS = 33
+LANDMARK_COLUMNS = [f"lm{i}_{a}" for i in range(N_LANDMARKS) for a in "xyz"]
+
+# Landmarks each exercise's features read; rows with any of them missing (NaN) are masked out
+FEATURE_LANDMARKS = {
+    "squat": ["left_shoulder", "right_shoulder", "left_hip", "right_hip",
+              "left_knee", "right_knee", "left_ankle", "right_ankle"],
+    "bicep": ["nose", "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+              "left_wrist", "right_wrist", "left_hip", "right_hip"],
+    "lunge": ["left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle"],
+    "plank": ["left_shoulder", "right_shoulder", "left_hip", "right_hip", "left_ankle", "right_ankle"],
+}
+
+
+def landmark_array(df, dtype=np.float32) -> np.ndarray:
+    """(N, 33, 3) array from the lm{i}_{x,y,z} columns. Missing columns are 0, as in get_point."""
+    return df.reindex(columns=LANDMARK_COLUMNS, fill_value=0).to_numpy(dtype=dtype).reshape(-1, N_LANDMARKS, 3)
+
+
+def valid_rows(lm: np.ndarray, names: list) -> np.ndarray:
+    """Boolean mask of frames whose named landmarks are all finite."""
+    idx = [LANDMARKS[n] for n in names]
+    return np.isfinite(lm[:, idx]).all(axis=(1, 2))
+
+
+def _pts(lm: np.ndarray, name: str) -> np.ndarray:
+    # Math in float64 even when landmarks are stored as float32 (ratios like hip_slope are ill-conditioned)
+    return lm[:, LANDMARKS[name]].astype(np.float64)
+
+
+def distance_v(p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
+    """Row-wise distance() for (N, 3) point arrays."""
+    return np.hypot(p1[:, 0] - p2[:, 0], p1[:, 1] - p2[:, 1])
+
+
+def angle_deg_v(p1: np.ndarray, p2: np.ndarray, p3: np.ndarray) -> np.ndarray:
+    """Row-wise angle_deg() for (N, 3) point arrays."""
+    a = np.arctan2(p1[:, 1] - p2[:, 1], p1[:, 0] - p2[:, 0]) - np.arctan2(p3[:, 1] - p2[:, 1], p3[:, 0] - p2[:, 0])
+    return np.abs(np.degrees(a)) % 360
+
+
+def squat_features_v(lm: np.ndarray) -> dict:
+    """Numeric squat_features() for every frame (stage is derived from avg_knee_angle)."""
+    ls, rs = _pts(lm, "left_shoulder"), _pts(lm, "right_shoulder")
+    lh, rh = _pts(lm, "left_hip"), _pts(lm, "right_hip")
+    lk, rk = _pts(lm, "left_knee"), _pts(lm, "right_knee")
+    la, ra = _pts(lm, "left_ankle"), _pts(lm, "right_ankle")
+    feet_dist = distance_v(la, ra)
+    l_angle = angle_deg_v(lh, lk, la)
+    r_angle = angle_deg_v(rh, rk, ra)
+    return {
+        "feet_shoulder_ratio": feet_dist / (distance_v(ls, rs) + 1e-6),
+        "knee_feet_ratio": distance_v(lk, rk) / (feet_dist + 1e-6),
+        "left_knee_angle": l_angle,
+        "right_knee_angle": r_angle,
+        "avg_knee_angle": (l_angle + r_angle) / 2,
+    }
+
+
+def bicep_features_v(lm: np.ndarray) -> dict:
+    """bicep_features() for every frame."""
+    ls, rs = _pts(lm, "left_shoulder"), _pts(lm, "right_shoulder")
+    le, re = _pts(lm, "left_elbow"), _pts(lm, "right_elbow")
+    lw, rw = _pts(lm, "left_wrist"), _pts(lm, "right_wrist")
+    torso = (ls + rs) / 2 - (_pts(lm, "left_hip") + _pts(lm, "right_hip")) / 2
+    l_elbow = angle_deg_v(ls, le, lw)
+    r_elbow = angle_deg_v(rs, re, rw)
+    return {
+        "torso_angle": np.degrees(np.arctan2(torso[:, 1], torso[:, 0] + 1e-6)),
+        "left_elbow_angle": l_elbow,
+        "right_elbow_angle": r_elbow,
+        "avg_elbow_angle": (l_elbow + r_elbow) / 2,
+        "left_peak": lw[:, 1] - ls[:, 1],
+        "right_peak": rw[:, 1] - rs[:, 1],
+    }
+
+
+def lunge_features_v(lm: np.ndarray) -> dict:
+    """lunge_features() for every frame."""
+    lk, rk = _pts(lm, "left_knee"), _pts(lm, "right_knee")
+    la, ra = _pts(lm, "left_ankle"), _pts(lm, "right_ankle")
+    l_angle = angle_deg_v(_pts(lm, "left_hip"), lk, la)
+    r_angle = angle_deg_v(_pts(lm, "right_hip"), rk, ra)
+    return {
+        "left_knee_angle": l_angle,
+        "right_knee_angle": r_angle,
+        "left_knee_over_toe": lk[:, 0] - la[:, 0],
+        "right_knee_over_toe": rk[:, 0] - ra[:, 0],
+        "bent_angle": np.maximum(l_angle, r_angle),
+        "straight_angle": np.minimum(l_angle, r_angle),
+    }
+
+
+def plank_features_v(lm: np.ndarray) -> dict:
+    """plank_features() for every frame."""
+    shoulder_mid = (_pts(lm, "left_shoulder") + _pts(lm, "right_shoulder")) / 2
+    hip_mid = (_pts(lm, "left_hip") + _pts(lm, "right_hip")) / 2
+    dy_hip = hip_mid[:, 1] - shoulder_mid[:, 1]
+    dx_hip = hip_mid[:, 0] - shoulder_mid[:, 0]
+    return {
+        "hip_slope": dy_hip / (np.abs(dx_hip) + 1e-6),
+        "hip_shoulder_dy": dy_hip,
+        "body_alignment": np.sqrt(dy_hip ** 2 + dx_hip ** 2),
+    }
+
+
+# Bump when any *_features_v changes its output; cached feature files keyed on it become stale
+FEATURE_VERSION = "1"
+
+FEATURES_V = {
+    "squat": squat_features_v,
+    "bicep": bicep_features_v,
+    "lunge": lunge_features_v,
+    "plank": plank_features_v,
+}
+
+
+def feature_matrix(lm: np.ndarray, exercise: str) -> tuple:
+    """
+    Features for every valid frame: (X (M, F), feature_cols, feats dict, mask (N,)).
+    Frames with missing landmarks are dropped via the mask instead of raising.
+    """
+    mask = valid_rows(lm, FEATURE_LANDMARKS[exercise])
+    feats = FEATURES_V[exercise](lm[mask])
+    feature_cols = list(feats)
+    X = np.column_stack([feats[c] for c in feature_cols])
+    return X, feature_cols, feats, mask
@@ -38,8 +38,11 @@ def _find_pose_model() -> Path | None:
     return None
 
 
-def get_pose_landmarker():
-    """Create PoseLandmarker (MediaPipe 0.10). Uses existing model or downloads on first use."""
+def get_pose_landmarker(video: bool = False):
+    """
+    Create PoseLandmarker (MediaPipe 0.10). Uses existing model or downloads on first use.
+    video=True uses VIDEO running mode (detect_for_video; tracks the pose between frames).
+    """
     try:
         from mediapipe.tasks.python.core import base_options as base_options_lib
         from mediapipe.tasks.python.vision import PoseLandmarker, PoseLandmarkerOptions
@@ -68,7 +71,8 @@ def get_pose_landmarker():
         base_options = base_options_lib.BaseOptions(model_asset_path=str(model_path))
         options = PoseLandmarkerOptions(
             base_options=base_options,
-            running_mode=vision_task_running_mode.VisionTaskRunningMode.IMAGE,
+            running_mode=(vision_task_running_mode.VisionTaskRunningMode.VIDEO if video
+                          else vision_task_running_mode.VisionTaskRunningMode.IMAGE),
             num_poses=1,
             min_pose_detection_confidence=0.5,
             min_pose_presence_confidence=0.5,